@@ -22,7 +22,12 @@ from .download_npgo import download_npgo
 from .download_aao import download_aao
 from .download_pdo import download_pdo
 from .download_dmi import download_dmi
-from .download_asymsam import download_asymsam_monthly, download_asymsam_daily
+from .download_asymsam import (download_asymsam_monthly, download_asymsam_daily,
+                               iter_asymsam_monthly, iter_asymsam_daily)
 from .download_enso import download_enso
+from .store import write_store, open_store, IndexStore
+from .annotate import annotate
+from .transport import set_transport, use_transport, sync, SyncError
+from .vintage import VintageStore
 
 __version__ = '0.1.0'
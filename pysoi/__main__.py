@@ -0,0 +1,48 @@
+"""Command line interface: `pysoi <command>` or `python -m pysoi <command>`."""
+
+import argparse
+
+from .serve import serve, DEFAULT_REFRESH_INTERVAL, SERVED_INDICES
+from .sources import SOURCES
+from .transport import sync, SyncError
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(prog="pysoi", description="Download and serve climate indices.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve the indices over HTTP from memory")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    serve_parser.add_argument("--refresh", type=float, default=DEFAULT_REFRESH_INTERVAL,
+                              help="Seconds between refreshes (0 to never refresh)")
+    serve_parser.add_argument("--index", action="append", dest="names", choices=list(SERVED_INDICES),
+                              help="Index to serve (repeatable, defaults to all)")
+    serve_parser.add_argument("--quiet", action="store_true", help="Do not log requests")
+
+    sync_parser = subparsers.add_parser("sync", help="Mirror every source into a directory")
+    sync_parser.add_argument("directory", help="Mirror directory (read it back with use_transport(DIRECTORY))")
+    sync_parser.add_argument("--source", action="append", dest="names", choices=list(SOURCES),
+                             metavar="NAME", help="Source to mirror (repeatable, defaults to all)")
+    sync_parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent downloads")
+    sync_parser.add_argument("--full", action="store_true", help="Download every file even if unchanged")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.names, host=args.host, port=args.port, refresh_interval=args.refresh or None,
+              verbose=not args.quiet)
+    elif args.command == "sync":
+        try:
+            paths = sync(args.directory, args.names, max_workers=args.workers, revalidate=not args.full)
+        except SyncError as e:
+            print(f"Mirrored {len(e.paths)} sources into {args.directory}")
+            parser.exit(1, f"{e}\n")
+        print(f"Mirrored {len(paths)} sources into {args.directory}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
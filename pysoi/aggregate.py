@@ -0,0 +1,271 @@
+"""Seasonal and annual aggregation and anomalies of the monthly indices."""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .parsers import frame_revision
+from .store import month_keys
+from .utils import MONTH_ABBRS
+
+
+DEFAULT_BASE_PERIOD = (1991, 2020)
+
+_MONTH_LETTERS = "JFMAMJJASOND"
+
+# (source, payload key, column, rows, base period, ddof) -> (mean, std) per calendar month
+_CLIMATOLOGY_CACHE = OrderedDict()
+_CLIMATOLOGY_CACHE_SIZE = 512
+_cache_lock = threading.Lock()
+
+
+def clear_climatology_cache():
+    """Drop every cached climatology."""
+    with _cache_lock:
+        _CLIMATOLOGY_CACHE.clear()
+
+
+def season_months(season):
+    """
+    Resolve a season into its calendar months.
+
+    Args:
+        season: Run of month initials such as "DJF", "JJA" or "NDJFM", or a
+                sequence of consecutive month numbers (wrapping past December)
+
+    Returns:
+        List of month numbers (1-12) in order
+    """
+    if isinstance(season, str):
+        position = (_MONTH_LETTERS * 2).find(season.upper())
+        if not season or len(season) > 12 or position < 0:
+            raise ValueError(f"Invalid season: {season!r}. Use consecutive month initials such as 'DJF'.")
+        return [(position + i) % 12 + 1 for i in range(len(season))]
+
+    months = [int(month) for month in season]
+    if not months or len(months) > 12 or any(month < 1 or month > 12 for month in months):
+        raise ValueError("season must contain between 1 and 12 month numbers from 1 to 12")
+    for previous, current in zip(months, months[1:]):
+        if current != previous % 12 + 1:
+            raise ValueError("season months must be consecutive")
+    return months
+
+
+def _columns(columns):
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def _series(frame, columns):
+    """Return per-row month keys and a (rows x columns) float array."""
+    keys = month_keys(frame)
+    values = np.column_stack([frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                              for column in columns])
+    return keys, values
+
+
+def _dense(keys, values):
+    """Place rows on a gap-free monthly axis starting at the first month."""
+    start = int(keys.min())
+    dense = np.full((int(keys.max()) - start + 1, values.shape[1]), np.nan)
+    dense[keys - start] = values
+    return start, dense
+
+
+def _cache_key(frame, column, base_period, ddof):
+    """Cache key of a column's climatology, or None if the frame has no revision."""
+    revision = frame_revision(frame, column)
+    if revision is None:
+        return None
+    # The row count tells a filtered frame from the download it came from
+    return revision + (column, len(frame), tuple(base_period), ddof)
+
+
+def _cached_climatology(frame, columns, base_period, ddof, series=None):
+    """Return (mean, std) of each column, reading the frame only for uncached columns."""
+    cache_keys = [_cache_key(frame, column, base_period, ddof) for column in columns]
+    with _cache_lock:
+        cached = [_CLIMATOLOGY_CACHE.get(key) if key is not None else None for key in cache_keys]
+        for key, result in zip(cache_keys, cached):
+            if result is not None:
+                _CLIMATOLOGY_CACHE.move_to_end(key)
+
+    results = []
+    for j, (key, result) in enumerate(zip(cache_keys, cached)):
+        if result is None:
+            if series is None:
+                series = _series(frame, columns)
+            keys, values = series
+            result = _climatology(keys, values[:, j], base_period, ddof)
+            if key is not None:
+                with _cache_lock:
+                    _CLIMATOLOGY_CACHE[key] = result
+                    if len(_CLIMATOLOGY_CACHE) > _CLIMATOLOGY_CACHE_SIZE:
+                        _CLIMATOLOGY_CACHE.popitem(last=False)
+        results.append(result)
+    return results
+
+
+def _climatology(keys, values, base_period, ddof):
+    """Monthly mean and standard deviation of one column."""
+    years = keys // 12 + 1970
+    month = keys % 12
+    mask = (years >= base_period[0]) & (years <= base_period[1]) & ~np.isnan(values)
+
+    count = np.bincount(month[mask], minlength=12).astype(np.float64)
+    total = np.bincount(month[mask], weights=values[mask], minlength=12)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        squares = np.bincount(month[mask], weights=(values[mask] - mean[month[mask]]) ** 2, minlength=12)
+        std = np.sqrt(squares / (count - ddof))
+    std[count - ddof <= 0] = np.nan
+    return mean, std
+
+
+def climatology(frame, columns, base_period=DEFAULT_BASE_PERIOD, ddof=1):
+    """
+    Monthly climatology of one or more index columns over a base period.
+
+    Frames returned by the download functions (and frames selected or copied
+    from them) carry the revision of the payload they were parsed from, so
+    climatologies of their downloaded columns are cached per source,
+    revision, column, base period and ddof and a repeated call is a
+    dictionary lookup. Other frames and columns are computed each time.
+    Call `clear_climatology_cache` after overwriting the values of a
+    downloaded column.
+
+    Args:
+        frame: DataFrame returned by a pysoi download function
+        columns: Column name or list of column names, e.g. "ONI"
+        base_period: Inclusive (first year, last year) of the base period
+        ddof: Delta degrees of freedom of the standard deviation
+
+    Returns:
+        DataFrame indexed by month abbreviation with "<column>_mean" and
+        "<column>_std" columns
+    """
+    columns = _columns(columns)
+    climatologies = _cached_climatology(frame, columns, base_period, ddof)
+
+    result = {}
+    for column, (mean, std) in zip(columns, climatologies):
+        result[f"{column}_mean"] = mean
+        result[f"{column}_std"] = std
+
+    return pd.DataFrame(result, index=pd.Index(MONTH_ABBRS, name="Month"))
+
+
+def anomalies(frame, columns, base_period=DEFAULT_BASE_PERIOD, standardize=False, ddof=1):
+    """
+    Anomalies (or z-scores) of index columns against a monthly climatology.
+
+    The climatology is cached as described in `climatology`, so sweeps over
+    base periods or standardization only compute each one once.
+
+    Args:
+        frame: DataFrame returned by a pysoi download function
+        columns: Column name or list of column names
+        base_period: Inclusive (first year, last year) of the base period
+        standardize: If True, divide by the monthly standard deviation
+        ddof: Delta degrees of freedom of the standard deviation
+
+    Returns:
+        DataFrame aligned with `frame` holding one column per requested column
+    """
+    columns = _columns(columns)
+    keys, values = _series(frame, columns)
+    climatologies = _cached_climatology(frame, columns, base_period, ddof, series=(keys, values))
+    month = keys % 12
+
+    result = np.empty_like(values)
+    for j, (mean, std) in enumerate(climatologies):
+        result[:, j] = values[:, j] - mean[month]
+        if standardize:
+            result[:, j] /= std[month]
+
+    return pd.DataFrame(result, index=frame.index, columns=columns)
+
+
+def window_mean(frame, columns, months, min_months=None):
+    """
+    Mean of index columns over a window of consecutive months in each year.
+
+    Windows that wrap past December (e.g. DJF) are labelled by the year of
+    their last month, so DJF 2000 is December 1999 to February 2000.
+
+    Args:
+        frame: DataFrame returned by a pysoi download function
+        columns: Column name or list of column names
+        months: Season string such as "DJF" or a list of consecutive month numbers
+        min_months: Minimum number of non-missing months for a value
+                    (defaults to the full window)
+
+    Returns:
+        DataFrame with a Year column and one column per requested column
+    """
+    columns = _columns(columns)
+    months = season_months(months)
+    min_months = len(months) if min_months is None else min_months
+
+    keys, values = _series(frame, columns)
+    start, dense = _dense(keys, values)
+
+    # Month key of the last month of each year's window
+    last_month = months[-1] - 1
+    first_year = (start // 12) + 1970
+    last_year = ((start + len(dense) - 1) // 12) + 1970
+    years = np.arange(first_year, last_year + 1)
+    ends = (years - 1970) * 12 + last_month - start
+
+    # Gather every window at once as (years x window x columns)
+    positions = ends[:, None] + np.arange(1 - len(months), 1)[None, :]
+    valid = (positions >= 0) & (positions < len(dense))
+    windows = np.where(valid[:, :, None], dense[np.clip(positions, 0, len(dense) - 1)], np.nan)
+
+    count = np.sum(~np.isnan(windows), axis=1)
+    with np.errstate(invalid="ignore"):
+        mean = np.nansum(windows, axis=1) / count
+    mean[count < max(min_months, 1)] = np.nan
+
+    keep = count.max(axis=1) > 0
+    result = pd.DataFrame(mean[keep], columns=columns)
+    result.insert(0, "Year", years[keep])
+    return result
+
+
+def seasonal_mean(frame, columns, season="DJF", min_months=None):
+    """
+    Seasonal mean of index columns, e.g. DJF or JJA.
+
+    Args:
+        frame: DataFrame returned by a pysoi download function
+        columns: Column name or list of column names
+        season: Season string such as "DJF", "MAM", "JJA" or "SON"
+        min_months: Minimum number of non-missing months for a value
+
+    Returns:
+        DataFrame with a Year column (year of the season's last month) and one
+        column per requested column
+    """
+    return window_mean(frame, columns, season, min_months=min_months)
+
+
+def annual_mean(frame, columns, start_month=1, min_months=12):
+    """
+    Annual mean of index columns for calendar or shifted (e.g. water) years.
+
+    Args:
+        frame: DataFrame returned by a pysoi download function
+        columns: Column name or list of column names
+        start_month: First month of the year. Use 10 for October-September
+                     water years, which are labelled by the year they end in.
+        min_months: Minimum number of non-missing months for a value
+
+    Returns:
+        DataFrame with a Year column and one column per requested column
+    """
+    if start_month < 1 or start_month > 12:
+        raise ValueError("start_month must be between 1 and 12")
+    months = [(start_month - 1 + i) % 12 + 1 for i in range(12)]
+    return window_mean(frame, columns, months, min_months=min_months)
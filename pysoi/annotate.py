@@ -0,0 +1,205 @@
+"""Vectorized annotation of timestamps with monthly index values and phases."""
+
+import numpy as np
+import pandas as pd
+
+from .store import MONTHLY_INDICES, IndexStore, month_keys
+
+
+ANNOTATE_METHODS = ["month", "interp", "lagged"]
+
+# Timestamps converted per block, bounding the temporary arrays
+_BLOCK_SIZE = 1 << 20
+
+_NS_PER_DAY = 86_400 * 10 ** 9
+
+
+class _MonthlySeries:
+    """An index on a gap-free month axis starting at month key `start`."""
+
+    def __init__(self, start, values, codes=None, categories=None, ordered=False):
+        self.start = int(start)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.codes = codes
+        self.categories = categories
+        self.ordered = ordered
+
+
+def _from_frame(frame, column, phase_column):
+    keys = month_keys(frame)
+    if len(keys) == 0:
+        return _MonthlySeries(0, np.empty(0))
+    start = int(keys.min())
+    values = np.full(int(keys.max()) - start + 1, np.nan)
+    values[keys - start] = frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    if phase_column is None or phase_column not in frame.columns:
+        return _MonthlySeries(start, values)
+    phase = pd.Categorical(frame[phase_column])
+    codes = np.full(len(values), -1, dtype=np.int8)
+    codes[keys - start] = phase.codes
+    return _MonthlySeries(start, values, codes, [str(c) for c in phase.categories], bool(phase.ordered))
+
+
+def _from_store(store, name):
+    start = int(np.asarray(store.dates[:1]).astype("datetime64[M]").astype(np.int64)[0]) if len(store) else 0
+    if name not in store.meta["phases"]:
+        return _MonthlySeries(start, store.column(name))
+    codes, categories = store.phase_codes(name)
+    return _MonthlySeries(start, store.column(name), np.asarray(codes), categories,
+                          store.meta["phases"][name]["ordered"])
+
+
+def _index_name(name):
+    name = name.upper()
+    if name not in MONTHLY_INDICES:
+        raise ValueError(f"Invalid index: {name}. Valid indices are: {', '.join(MONTHLY_INDICES)}")
+    return name
+
+
+def _resolve(indices, source):
+    """Return {name: _MonthlySeries} for the requested indices."""
+    if isinstance(indices, str):
+        indices = [indices]
+
+    if isinstance(source, IndexStore):
+        names = source.names if indices is None else [_index_name(name) for name in indices]
+        return {name: _from_store(source, name) for name in names}
+
+    if isinstance(source, pd.DataFrame):
+        # e.g. the merged frame returned by download_enso
+        available = [name for name in MONTHLY_INDICES if name in source.columns]
+        names = available if indices is None else [_index_name(name) for name in indices]
+        missing = [name for name in names if name not in source.columns]
+        if missing:
+            raise ValueError(f"Columns not found in frame: {', '.join(missing)}")
+        frames = {name: source for name in names}
+    elif source is None:
+        if indices is None:
+            raise ValueError("indices must be given when no source is supplied")
+        names = [_index_name(name) for name in indices]
+        frames = {name: MONTHLY_INDICES[name][0]() for name in names}
+    else:
+        frames = {_index_name(name): frame for name, frame in dict(source).items()}
+        names = list(frames) if indices is None else [_index_name(name) for name in indices]
+
+    series = {}
+    for name in names:
+        frame = frames[name]
+        _, value_column, phase_column = MONTHLY_INDICES[name]
+        column = name if name in frame.columns else value_column
+        series[name] = _from_frame(frame, column, phase_column)
+    return series
+
+
+def _as_datetime64(timestamps):
+    """Return timestamps as a naive (UTC) datetime64[ns] array."""
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == "M":
+        return timestamps.astype("datetime64[ns]", copy=False)
+    times = pd.DatetimeIndex(pd.to_datetime(timestamps))
+    if times.tz is not None:
+        times = times.tz_convert("UTC").tz_localize(None)
+    return times.to_numpy().astype("datetime64[ns]", copy=False)
+
+
+def _day_table(series, lag, how):
+    """
+    Per-day lookup tables covering a series' (lagged) months.
+
+    Mapping a timestamp to its month through a table indexed by day avoids
+    calendar arithmetic on every row: each timestamp costs one integer
+    division and one gather.
+
+    Returns:
+        (first day, daily values, daily phase codes or None). Both tables
+        end with a NaN/-1 slot that out-of-range days are pointed at.
+    """
+    n = len(series.values)
+    months = np.arange(series.start + lag, series.start + lag + n + 1, dtype=np.int64)
+    edges = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    rows = np.repeat(np.arange(n), np.diff(edges))
+
+    if how == "interp":
+        # Values sit at the middle of their month; each day takes the value at its midday
+        middles = (edges[:-1] + edges[1:]) / 2
+        days = np.arange(edges[0], edges[-1]) + 0.5
+        values = np.interp(days, middles, series.values, left=np.nan, right=np.nan) if n else np.empty(0)
+    else:
+        values = series.values[rows]
+    values = np.append(values, np.nan)
+
+    codes = None
+    if series.codes is not None:
+        codes = np.append(np.asarray(series.codes)[rows], np.int8(-1))
+    return int(edges[0]), values, codes
+
+
+def _lookup(series, times, lag, how, phases):
+    first, values, codes = _day_table(series, lag, how)
+    if not phases:
+        codes = None
+    n_days = len(values) - 1
+
+    out = np.empty(len(times), dtype=np.float64)
+    out_codes = None if codes is None else np.empty(len(times), dtype=np.int8)
+    for begin in range(0, len(times), _BLOCK_SIZE):
+        block = slice(begin, begin + _BLOCK_SIZE)
+        # NaT is the most negative int64, so it lands out of range like any early time
+        positions = times[block].view(np.int64) // _NS_PER_DAY - first
+        positions[(positions < 0) | (positions >= n_days)] = n_days
+        np.take(values, positions, out=out[block])
+        if codes is not None:
+            np.take(codes, positions, out=out_codes[block])
+    return out, out_codes
+
+
+def annotate(timestamps, indices=None, how="month", lag=None, source=None, phases=True):
+    """
+    Look up monthly index values (and phases) for arbitrary timestamps.
+
+    Timestamps are mapped to their month through a per-day lookup table, so
+    the cost is linear in the number of timestamps and nothing is merged:
+    the result is one array per index aligned with `timestamps`.
+
+    Args:
+        timestamps: Array-like of datetimes (numpy datetime64, DatetimeIndex,
+                    Series or strings). Time zone aware values are converted
+                    to UTC.
+        indices: Index names, e.g. ["ONI", "MEI"]. Defaults to every index
+                 in `source`.
+        how: "month" for the value of the month each timestamp falls in,
+             "interp" for linear interpolation between mid-month values at
+             daily resolution (the value at midday of each timestamp's day), or
+             "lagged" for the value `lag` months earlier.
+        lag: Months the index leads the timestamps by, or a list of lags to
+             annotate several at once. Defaults to 1 for "lagged" and 0 otherwise.
+        source: Where to read the indices from: an IndexStore, a DataFrame
+                with index columns (e.g. from `download_enso`) or a dict of
+                index name to the DataFrame its download function returned.
+                If None, the indices are downloaded.
+        phases: Whether to add phase arrays for indices that have one
+
+    Returns:
+        Dict mapping "<name>" (or "<name>_lag<k>" for non-zero lags) to a
+        float64 array, plus "<name>_phase" (suffixed the same way) to a
+        pandas Categorical for indices with phases. Timestamps outside an
+        index's record get NaN values and missing phases. Interpolated
+        results carry the phase of the timestamp's month.
+    """
+    if how not in ANNOTATE_METHODS:
+        raise ValueError(f"Invalid method: {how}. Valid methods are: {', '.join(ANNOTATE_METHODS)}")
+    if lag is None:
+        lag = 1 if how == "lagged" else 0
+    lags = [int(lag)] if np.isscalar(lag) else [int(k) for k in lag]
+
+    times = _as_datetime64(timestamps)
+    result = {}
+    for name, series in _resolve(indices, source).items():
+        for k in lags:
+            suffix = f"_lag{k}" if k else ""
+            values, codes = _lookup(series, times, k, how, phases)
+            result[f"{name}{suffix}"] = values
+            if codes is not None:
+                result[f"{name}_phase{suffix}"] = pd.Categorical.from_codes(
+                    codes, categories=series.categories, ordered=series.ordered)
+    return result
@@ -0,0 +1,342 @@
+"""Composites of response variables by ENSO phase with resampling significance."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+COMPOSITE_METHODS = ["bootstrap", "permutation"]
+
+# Bytes of resampling weights and resampled means held at once per chunk
+DEFAULT_CHUNK_BYTES = 64 * 2 ** 20
+
+# Bootstrap counts are drawn in fixed blocks of this many resamples, each
+# from its own seed, so results don't depend on how they are grouped
+_SEED_ROWS = 256
+
+# Resampling plan shared with worker processes (set by _init_worker)
+_worker_plan = None
+
+
+class _Plan:
+    """
+    Resampling plan shared by every chunk of response series.
+
+    The weights of each phase are float32 (resamples x rows) matrices: the
+    bootstrap counts of its members, or its indicator over every time step
+    under each permutation. They are made once per process if they fit the
+    memory budget, otherwise in blocks of `block_rows` resamples for every
+    chunk. Bootstrap counts are drawn where they are used, from `entropy`;
+    permutations are drawn once as int8 codes.
+    """
+
+    def __init__(self, codes, n_categories, method, n_resamples, quantiles, block_rows,
+                 entropy=None, permuted=None):
+        self.codes = codes
+        self.n_categories = n_categories
+        self.method = method
+        self.n_resamples = n_resamples
+        self.quantiles = quantiles
+        self.block_rows = block_rows
+        self.entropy = entropy
+        self.permuted = permuted
+        self.members = [np.flatnonzero(codes == k) for k in range(n_categories)]
+        self._weights = None
+
+    def __getstate__(self):
+        # Workers make their own weights rather than receiving a copy
+        state = self.__dict__.copy()
+        state["_weights"] = None
+        return state
+
+    def _counts(self, k, start, stop):
+        n = len(self.members[k])
+        counts = np.empty((stop - start, n), dtype=np.float32)
+        for first in range(start, stop, _SEED_ROWS):
+            rng = np.random.default_rng(np.random.SeedSequence(self.entropy, spawn_key=(k, first // _SEED_ROWS)))
+            rows = min(_SEED_ROWS, stop - first)
+            counts[first - start:first - start + rows] = rng.multinomial(n, np.full(n, 1.0 / n), size=rows)
+        return counts
+
+    def _build(self, start, stop):
+        weights = []
+        for k, members in enumerate(self.members):
+            if len(members) == 0:
+                weights.append(None)
+            elif self.method == "bootstrap":
+                weights.append(self._counts(k, start, stop))
+            else:
+                weights.append((self.permuted[start:stop] == k).astype(np.float32))
+        return weights
+
+    def weight_blocks(self):
+        """Yield (first resample, weights of each phase or None if it has no members)."""
+        if self.block_rows >= self.n_resamples:
+            if self._weights is None:
+                self._weights = self._build(0, self.n_resamples)
+            yield 0, self._weights
+            return
+        for start in range(0, self.n_resamples, self.block_rows):
+            yield start, self._build(start, min(start + self.block_rows, self.n_resamples))
+
+
+def _phase_codes(phases, categories):
+    """Return (int64 codes with -1 for missing, list of categories)."""
+    if isinstance(phases, pd.Series):
+        phases = phases.array
+    if isinstance(phases, np.ndarray) and phases.dtype.kind in "iu":
+        codes = phases.astype(np.int64)
+        if categories is None:
+            categories = list(range(int(codes.max()) + 1 if len(codes) else 0))
+        if codes.max(initial=-1) >= len(categories):
+            raise ValueError("phase codes must be below the number of categories")
+        return codes, list(categories)
+
+    phase = pd.Categorical(phases, categories=categories)
+    return phase.codes.astype(np.int64), list(phase.categories)
+
+
+def _group_means(weights, values, missing):
+    """Weighted means of `values` rows; `weights` is (resamples x rows)."""
+    if missing is None:
+        return weights @ values / weights.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (weights @ np.where(missing, 0.0, values)) / (weights @ (~missing).astype(values.dtype))
+
+
+def _resampled_means(values, missing, plan):
+    """Composite means under every resample, a (resamples x series) array per phase."""
+    # float32 like the weights, so the products don't upcast them
+    values = values.astype(np.float32)
+    samples = np.full((plan.n_categories, plan.n_resamples, values.shape[1]), np.nan)
+    for start, block in plan.weight_blocks():
+        for k, weights in enumerate(block):
+            if weights is None:
+                continue
+            if plan.method == "bootstrap":
+                members = plan.members[k]
+                means = _group_means(weights, values[members], None if missing is None else missing[members])
+            else:
+                means = _group_means(weights, values, missing)
+            samples[k, start:start + len(weights)] = means
+    return samples
+
+
+def _chunk_stats(values, plan):
+    """
+    Resampling statistics for one (time x series) chunk of responses.
+
+    Returns:
+        (lower, upper, p_value), each (categories x series)
+    """
+    codes, n_categories, quantiles = plan.codes, plan.n_categories, plan.quantiles
+    missing = np.isnan(values)
+    missing = missing if missing.any() else None
+
+    n_series = values.shape[1]
+    lower = np.full((n_categories, n_series), np.nan)
+    upper = np.full((n_categories, n_series), np.nan)
+    p_value = np.full((n_categories, n_series), np.nan)
+    overall = np.nanmean(values, axis=0) if missing is not None else values.mean(axis=0)
+    resampled = _resampled_means(values, missing, plan)
+
+    for k in range(n_categories):
+        members = plan.members[k]
+        if len(members) == 0:
+            continue
+        samples = resampled[k]
+        if plan.method == "bootstrap":
+            observed = _group_means(np.ones((1, len(members))), values[members],
+                                    None if missing is None else missing[members])[0]
+            below = np.mean(samples <= overall, axis=0)
+            above = np.mean(samples >= overall, axis=0)
+            p_value[k] = np.minimum(1.0, 2 * np.minimum(below, above))
+        else:
+            observed = _group_means((codes == k).astype(np.float64)[None, :], values, missing)[0]
+            exceed = np.sum(np.abs(samples - overall) >= np.abs(observed - overall), axis=0)
+            p_value[k] = (exceed + 1) / (len(samples) + 1)
+        quantile = np.quantile if missing is None else np.nanquantile
+        lower[k], upper[k] = quantile(samples, quantiles, axis=0)
+
+    return lower, upper, p_value
+
+
+def _init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+
+def _worker_stats(values):
+    return _chunk_stats(values, _worker_plan)
+
+
+class CompositeResult:
+    """
+    Composite means by phase with resampling intervals.
+
+    Arrays are (categories x ...) where "..." is the shape of one response
+    observation, e.g. (n_series,) or a grid's (lat, lon).
+
+    Attributes:
+        categories: Phase labels in row order
+        counts: Number of observations in each phase
+        mean: Composite mean of each phase
+        lower: Lower bound of the interval. For "bootstrap" this is the
+               percentile interval of the composite mean; for "permutation"
+               the envelope of composite means under random phase labels.
+        upper: Upper bound of the interval
+        p_value: Two-sided p-value of the composite differing from the mean
+                 of all observations
+        method: "bootstrap" or "permutation"
+        n_resamples: Number of resamples
+        confidence: Interval coverage
+    """
+
+    def __init__(self, categories, counts, mean, lower, upper, p_value, method, n_resamples,
+                 confidence, series=None):
+        self.categories = categories
+        self.counts = counts
+        self.mean = mean
+        self.lower = lower
+        self.upper = upper
+        self.p_value = p_value
+        self.method = method
+        self.n_resamples = n_resamples
+        self.confidence = confidence
+        self.series = series
+
+    def __repr__(self):
+        return (f"CompositeResult(categories={self.categories}, counts={self.counts.tolist()}, "
+                f"shape={self.mean.shape[1:]}, method={self.method!r}, n_resamples={self.n_resamples})")
+
+    def significant(self, alpha=0.05):
+        """Boolean array of the composites with p_value below `alpha`."""
+        return self.p_value < alpha
+
+    def to_frame(self):
+        """
+        Return the composites in long format.
+
+        Returns:
+            DataFrame with phase, series, count, mean, lower, upper and
+            p_value columns (series is the flat position for gridded data)
+        """
+        n_categories = len(self.categories)
+        n_series = int(np.prod(self.mean.shape[1:], dtype=np.int64))
+        series = self.series if self.series is not None else np.arange(n_series)
+        return pd.DataFrame({
+            "phase": pd.Categorical(np.repeat(self.categories, n_series), categories=self.categories),
+            "series": np.tile(np.asarray(series), n_categories),
+            "count": np.repeat(self.counts, n_series),
+            "mean": self.mean.reshape(-1),
+            "lower": self.lower.reshape(-1),
+            "upper": self.upper.reshape(-1),
+            "p_value": self.p_value.reshape(-1),
+        })
+
+
+def composite(responses, phases, categories=None, method="bootstrap", n_resamples=10000,
+              confidence=0.95, seed=None, chunk_bytes=DEFAULT_CHUNK_BYTES, processes=None):
+    """
+    Composite response variables by phase with bootstrap or permutation significance.
+
+    The resampling weights of each phase are applied to every response
+    series as matrix products, so the cost is a few BLAS calls per chunk of
+    series rather than a Python loop per resample. The weights and the
+    resampled means of a chunk together fit within `chunk_bytes`.
+
+    Args:
+        responses: (time,) or (time, ...) array or DataFrame of responses,
+                   e.g. many series or a flattened or full (time, lat, lon) grid.
+                   NaNs are skipped.
+        phases: Phase of each time step: a Categorical or Series (e.g. the
+                `phase` column of `download_oni`), labels, or integer codes
+                with -1 for missing
+        categories: Phase labels, or the labels of integer codes (defaults
+                    to the categories of `phases`)
+        method: "bootstrap" (resample observations within each phase) or
+                "permutation" (shuffle the phase labels)
+        n_resamples: Number of resamples
+        confidence: Coverage of the lower/upper interval
+        seed: Seed or numpy.random.Generator; results do not depend on
+              `processes` or `chunk_bytes`
+        chunk_bytes: Memory budget for the resampling weights and the
+                     resampled means of one chunk
+        processes: Spread chunks over this many worker processes (None to
+                   run in this process, which already uses a threaded BLAS)
+
+    Returns:
+        CompositeResult
+    """
+    if method not in COMPOSITE_METHODS:
+        raise ValueError(f"Invalid method: {method}. Valid methods are: {', '.join(COMPOSITE_METHODS)}")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+
+    series = list(responses.columns) if isinstance(responses, pd.DataFrame) else None
+    values = np.asarray(responses, dtype=np.float64)
+    shape = values.shape[1:]
+    values = values.reshape(len(values), -1)
+
+    codes, categories = _phase_codes(phases, categories)
+    if len(codes) != len(values):
+        raise ValueError(f"phases has {len(codes)} entries but responses has {len(values)} time steps")
+
+    # Only time steps with a phase take part
+    keep = codes >= 0
+    codes, values = codes[keep], values[keep]
+    n_categories = len(categories)
+    counts = np.bincount(codes, minlength=n_categories)
+
+    rng = np.random.default_rng(seed)
+    n = len(codes)
+    if method == "bootstrap":
+        entropy, permuted = int(rng.integers(2 ** 63)), None
+        # Every time step belongs to one phase, so each resample is n counts
+        row_bytes, fixed_bytes = 4 * n, 0
+    else:
+        entropy = None
+        permuted = rng.permuted(np.broadcast_to(codes.astype(np.int8), (n_resamples, n)), axis=1)
+        row_bytes, fixed_bytes = 4 * n_categories * n, permuted.nbytes
+    alpha = 1 - confidence
+
+    # The weights count against the budget: kept whole if they fit in half
+    # of it, else made in blocks of resamples for every chunk
+    n_series = values.shape[1]
+    resample_rows = max(n_resamples, 1)
+    weight_budget = (chunk_bytes - fixed_bytes) // 2
+    if row_bytes * resample_rows <= weight_budget:
+        block_rows = resample_rows
+    else:
+        block_rows = max(1, int(weight_budget // max(row_bytes, 1)))
+        if method == "bootstrap":
+            block_rows = max(_SEED_ROWS, block_rows // _SEED_ROWS * _SEED_ROWS)
+    plan = _Plan(codes, n_categories, method, n_resamples, [alpha / 2, 1 - alpha / 2], block_rows,
+                 entropy=entropy, permuted=permuted)
+    budget = chunk_bytes - fixed_bytes - row_bytes * min(block_rows, resample_rows)
+    width = max(1, int(budget // (8 * resample_rows * n_categories)))
+    chunks = [values[:, start:start + width] for start in range(0, n_series, width)]
+    if processes and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(plan,)) as executor:
+            results = list(executor.map(_worker_stats, chunks))
+    else:
+        results = [_chunk_stats(chunk, plan) for chunk in chunks]
+
+    if results:
+        lower, upper, p_value = (np.concatenate(parts, axis=1) for parts in zip(*results))
+    else:
+        lower = upper = p_value = np.empty((n_categories, 0))
+
+    mean = np.full((n_categories, n_series), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for k in range(n_categories):
+            rows = values[codes == k]
+            if len(rows):
+                present = ~np.isnan(rows)
+                mean[k] = np.where(present, rows, 0.0).sum(axis=0) / present.sum(axis=0)
+
+    reshape = (n_categories,) + shape
+    return CompositeResult(categories, counts, mean.reshape(reshape), lower.reshape(reshape),
+                           upper.reshape(reshape), p_value.reshape(reshape), method, n_resamples,
+                           confidence, series)
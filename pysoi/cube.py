@@ -0,0 +1,216 @@
+"""Dense time x level x index representation of the daily asymsam indices."""
+
+import numpy as np
+import pandas as pd
+
+from .sources import ASYMSAM_LEVELS, ASYMSAM_INDICES
+
+
+def _as_days(values):
+    return np.asarray(values).astype("datetime64[D]").astype(np.int64)
+
+
+def _day(value):
+    return int(_as_days(pd.Timestamp(value).to_datetime64()))
+
+
+class _CubeParts:
+    """
+    Compact columns of long-format chunks, scattered into a SamCube at the end.
+
+    Each chunk is kept as int32/int8 keys and float32 values (about 21 bytes
+    per row). `build` scatters the parts one by one, releasing each as it
+    goes, so no long-format frame or concatenation of the parts is needed.
+    """
+
+    def __init__(self, indices=None):
+        self.indices = ASYMSAM_INDICES if indices is None else list(indices)
+        self._parts = []
+
+    def add(self, frame):
+        """Add the rows of a frame with Lev, Date, Index, Value and R.squared columns."""
+        if len(frame) == 0:
+            return
+        index = pd.Categorical(frame['Index'], categories=self.indices)
+        keep = index.codes >= 0
+        self._parts.append((len(frame), (
+            frame['Lev'].to_numpy()[keep].astype(np.int32),
+            _as_days(frame['Date'].to_numpy()[keep]),
+            index.codes[keep].astype(np.int8),
+            frame['Value'].to_numpy()[keep].astype(np.float32),
+            frame['R.squared'].to_numpy()[keep].astype(np.float32),
+        )))
+
+    def drop(self, rows):
+        """Drop the last `rows` frame rows added (whole frames, e.g. of a level that failed)."""
+        while rows > 0 and self._parts:
+            rows -= self._parts.pop()[0]
+
+    def build(self, levels=None):
+        """Return the SamCube of every row added, or None if there are none."""
+        parts = [columns for _, columns in self._parts]
+        self._parts = []
+        if not parts:
+            return None
+
+        if levels is None:
+            levels = np.unique(np.concatenate([np.unique(lev) for lev, *_ in parts]))
+        levels = np.asarray(levels, dtype=np.int32)
+        first = min(int(days.min()) for _, days, *_ in parts)
+        n_days = max(int(days.max()) for _, days, *_ in parts) - first + 1
+
+        # Position of each level on the level axis, -1 for levels not on it
+        lookup = np.full(max(ASYMSAM_LEVELS + levels.tolist()) + 1, -1, dtype=np.int64)
+        lookup[levels] = np.arange(len(levels))
+
+        shape = (n_days, len(levels), len(self.indices))
+        values = np.full(shape, np.nan, dtype=np.float32)
+        r_squared = np.full(shape, np.nan, dtype=np.float32)
+        parts.reverse()
+        while parts:
+            lev, days, codes, value, r2 = parts.pop()
+            level_pos = lookup[lev]
+            keep = level_pos >= 0
+            rows = (days[keep] - first, level_pos[keep], codes[keep])
+            values[rows] = value[keep]
+            r_squared[rows] = r2[keep]
+
+        dates = (np.arange(n_days) + first).astype("datetime64[D]")
+        return SamCube(values, r_squared, dates, levels, self.indices)
+
+
+class SamCube:
+    """
+    Daily asymsam indices as dense float32 arrays.
+
+    `values[t, l, i]` is index `indices[i]` at level `levels[l]` on day
+    `dates[t]`, and `r_squared` holds the matching variance explained.
+    The day axis has no gaps; days missing from the source are NaN. Slices
+    along the day axis are views, so a date-range selection copies nothing.
+
+    Attributes:
+        values: (time x level x index) float32 array of index values
+        r_squared: (time x level x index) float32 array of R-squared
+        dates: datetime64[ns] array of days
+        levels: int32 array of pressure levels in hPa
+        indices: List of index names along the last axis
+    """
+
+    def __init__(self, values, r_squared, dates, levels, indices):
+        self.values = values
+        self.r_squared = r_squared
+        self.dates = np.asarray(dates).astype("datetime64[ns]")
+        self.levels = np.asarray(levels, dtype=np.int32)
+        self.indices = list(indices)
+
+    def __repr__(self):
+        span = f"{self.dates[0]:.10}..{self.dates[-1]:.10}" if len(self.dates) else "empty"
+        return (f"SamCube(days={len(self.dates)} [{span}], levels={self.levels.tolist()}, "
+                f"indices={self.indices})")
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def shape(self):
+        """(time, level, index) shape of the cubes."""
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        """Memory held by the value and R-squared cubes."""
+        return self.values.nbytes + self.r_squared.nbytes
+
+    @classmethod
+    def from_frames(cls, frames, levels=None, indices=None):
+        """
+        Build a cube from long-format frames (one row per Lev/Date/Index).
+
+        Frames are reduced to compact key and float32 columns as they are
+        consumed, so an iterator of chunks never needs to be held in full.
+
+        Args:
+            frames: Iterable of DataFrames with Lev, Date, Index, Value and
+                    R.squared columns, as returned by `download_asymsam_daily`
+            levels: Level axis (defaults to the levels present, in ascending order)
+            indices: Index axis (defaults to all of sam, ssam and asam)
+
+        Returns:
+            SamCube, or None if the frames hold no rows
+        """
+        parts = _CubeParts(indices)
+        for frame in frames:
+            parts.add(frame)
+        return parts.build(levels)
+
+    def _day_slice(self, start, end):
+        days = _as_days(self.dates)
+        first = 0 if start is None else int(np.searchsorted(days, _day(start)))
+        last = len(days) if end is None else int(np.searchsorted(days, _day(end), side="right"))
+        return slice(first, max(first, last))
+
+    def _positions(self, wanted, axis, name):
+        wanted = [wanted] if np.isscalar(wanted) else list(wanted)
+        axis = list(axis)
+        missing = [value for value in wanted if value not in axis]
+        if missing:
+            raise ValueError(f"Invalid {name}: {', '.join(map(str, missing))}\n"
+                             f"Valid {name} are: {', '.join(map(str, axis))}")
+        positions = [axis.index(value) for value in wanted]
+        # Contiguous runs stay views
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            return slice(positions[0], positions[-1] + 1)
+        return positions
+
+    def sel(self, start=None, end=None, levels=None, indices=None):
+        """
+        Select a date range, level set and index set.
+
+        Args:
+            start: First day to keep (inclusive)
+            end: Last day to keep (inclusive)
+            levels: Level or list of levels in hPa (defaults to all)
+            indices: Index name or list of names (defaults to all)
+
+        Returns:
+            SamCube. Selections of contiguous levels and indices are views.
+        """
+        days = self._day_slice(start, end)
+        level_sel = slice(None) if levels is None else self._positions(levels, self.levels.tolist(), "levels")
+        index_sel = slice(None) if indices is None else self._positions(indices, self.indices, "indices")
+
+        def take(cube):
+            return cube[days][:, level_sel][:, :, index_sel]
+
+        return SamCube(take(self.values), take(self.r_squared), self.dates[days],
+                       self.levels[level_sel], np.asarray(self.indices)[index_sel].tolist())
+
+    def series(self, level, index):
+        """Return the daily values of one index at one level as a view."""
+        cube = self.sel(levels=[level], indices=[index])
+        return cube.values[:, 0, 0]
+
+    def profile(self, date, index):
+        """Return the vertical profile (one value per level) of an index on a day."""
+        cube = self.sel(start=date, end=date, indices=[index])
+        if len(cube) == 0:
+            raise ValueError(f"{date} is outside the cube's date range")
+        return cube.values[0, :, 0]
+
+    def to_frame(self):
+        """
+        Return the cube in the long format of `download_asymsam_daily`.
+
+        Rows missing from the source (NaN in both cubes) are dropped.
+        """
+        keep = ~(np.isnan(self.values) & np.isnan(self.r_squared)).ravel()
+        frame = pd.DataFrame({
+            'Lev': np.broadcast_to(self.levels[None, :, None], self.shape).ravel()[keep],
+            'Date': np.broadcast_to(self.dates[:, None, None], self.shape).ravel()[keep],
+            'Index': pd.Categorical(
+                np.broadcast_to(np.asarray(self.indices), self.shape).ravel()[keep],
+                categories=ASYMSAM_INDICES, ordered=False),
+            'Value': self.values.ravel()[keep].astype(np.float64),
+            'R.squared': self.r_squared.ravel()[keep].astype(np.float64),
+        })
+        return frame.sort_values(['Lev', 'Date'], kind='stable').reset_index(drop=True)
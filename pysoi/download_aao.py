@@ -1,35 +1,20 @@
 """Download Antarctic Oscillation data."""
 
-import pandas as pd
 import numpy as np
-import io
-from .utils import check_response, abbr_month
+from .sources import source_url
+from .parsers import register_parser, parse_payload
+from .utils import check_response, check_output, month_dates, MONTH_ABBRS
 
 
-def download_aao():
-    """
-    Download Antarctic Oscillation data.
-    
-    Projection of the monthly 700 hPa anomaly height field south of 20°S on the first EOF obtained
-    from the monthly 700 hPa height anomaly.
-    
-    Returns:
-        DataFrame with columns:
-        - Date: Date object
-        - Year: Year of record
-        - Month: Month of record
-        - AAO: Antarctic Oscillation
-    
-    References:
-        https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/aao/aao.shtml
-    """
-    aao_link = "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/aao/monthly.aao.index.b79.current.ascii"
-    
-    # Get response
-    response_text = check_response(aao_link)
-    
-    # Create a list to store data
-    data_list = []
+_CATEGORIES = {"Month": (MONTH_ABBRS, True)}
+
+
+def _parse_aao(response_text):
+    """Parse the AAO table into column arrays."""
+    # Create lists to store data
+    years = []
+    months = []
+    values = []
     
     # Parse line by line
     for line in response_text.splitlines():
@@ -44,31 +29,60 @@ def download_aao():
             year = int(line[:5].strip())
             month = int(line[5:10].strip())
             aao_value = float(line[10:].strip())
-            
-            # Create date
-            date = f"{year}-{month:02d}-01"
-            
-            data_list.append({
-                'Year': year,
-                'Date': date,
-                'AAO': aao_value
-            })
         except (ValueError, IndexError):
             # Skip lines that can't be parsed
             continue
+        
+        years.append(year)
+        months.append(month)
+        values.append(aao_value)
     
-    # Create DataFrame
-    aao = pd.DataFrame(data_list)
-    # Create the date
-    aao['Date'] = pd.to_datetime(aao['Date'])
-
+    years = np.array(years, dtype=np.int64)
+    months = np.array(months, dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
     
-    # Convert Month to categorical
-    aao['Month'] = abbr_month(aao['Date'])
+    # Sort by date
+    order = np.lexsort((months, years))
+    years, months, values = years[order], months[order], values[order]
+    
+    # Select desired columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "Date": month_dates(years, months),
+        "AAO": values,
+    }
+
+
+register_parser("aao", _parse_aao, _CATEGORIES)
 
+
+def download_aao(output="pandas"):
+    """
+    Download Antarctic Oscillation data.
     
-    # Sort by date
-    aao = aao.sort_values('Date').reset_index(drop=True)
+    Projection of the monthly 700 hPa anomaly height field south of 20°S on the first EOF obtained
+    from the monthly 700 hPa height anomaly.
+    
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+    
+    Returns:
+        DataFrame with columns:
+        - Date: Date object
+        - Year: Year of record
+        - Month: Month of record
+        - AAO: Antarctic Oscillation
+    
+    References:
+        https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/aao/aao.shtml
+    """
+    check_output(output)
+    aao_link = source_url("aao")
+    
+    # Get response
+    response_text = check_response(aao_link)
     
-    # Select and return desired columns
-    return aao[["Year", "Month", "Date", "AAO"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("aao", response_text, output)
@@ -1,19 +1,42 @@
 """Download Arctic Oscillation data."""
 
-import pandas as pd
 import numpy as np
-import io
-import calendar
-from .utils import check_response, abbr_month
+from .sources import source_url
+from .parsers import register_parser, parse_payload
+from .utils import check_response, check_output, month_dates, parse_year_table, MONTH_ABBRS
 
 
-def download_ao():
+_CATEGORIES = {"Month": (MONTH_ABBRS, True)}
+
+
+def _parse_ao(response_text):
+    """Parse the AO table into column arrays."""
+    # Parse the year x month table, skipping the header and invalid values
+    years, months, values = parse_year_table(response_text.splitlines()[1:], skip_invalid=True)
+    
+    # Select desired columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "Date": month_dates(years, months),
+        "AO": values,
+    }
+
+
+register_parser("ao", _parse_ao, _CATEGORIES)
+
+
+def download_ao(output="pandas"):
     """
     Download Arctic Oscillation data.
     
     Projection of the daily 1000 hPa anomaly height field north of 20°N on the first EOF obtained
     from the monthly 1000 hPa height anomaly.
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+    
     Returns:
         DataFrame with columns:
         - Date: Date object
@@ -24,54 +47,11 @@ def download_ao():
     References:
         https://www.ncdc.noaa.gov/teleconnections/ao/
     """
-    ao_link = "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/monthly.ao.index.b50.current.ascii.table"
+    check_output(output)
+    ao_link = source_url("ao")
     
     # Get response
     response_text = check_response(ao_link)
     
-    # Parse the data
-    months = list(calendar.month_abbr)[1:]  # Get month abbreviations
-    
-    # Read the fixed width file
-    # This is tricky because the format isn't consistent, we'll handle line by line
-    lines = response_text.splitlines()
-    
-    # Skip the header
-    data_lines = lines[1:]
-    
-    data_list = []
-    
-    for line in data_lines:
-        parts = line.split()
-        if len(parts) < 13:  # Need year + 12 months
-            continue
-            
-        year = int(parts[0])
-        
-        for i, month_idx in enumerate(range(1, 13), 1):
-            if month_idx < len(parts):
-                try:
-                    ao_value = float(parts[month_idx])
-                    date = pd.to_datetime(f"{year}-{i}-01")
-                    
-                    data_list.append({
-                        'Year': year,
-                        'Month': months[i-1],
-                        'Date': date,
-                        'AO': ao_value
-                    })
-                except ValueError:
-                    # Skip invalid values
-                    continue
-    
-    # Create DataFrame
-    ao = pd.DataFrame(data_list)
-    
-    # Sort by date
-    ao = ao.sort_values('Date').reset_index(drop=True)
-    
-    # Create Month label as categorical
-    ao['Month'] = pd.Categorical(ao['Month'], categories=months, ordered=True)
-    
-    # Select and return desired columns
-    return ao[["Year", "Month", "Date", "AO"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("ao", response_text, output)
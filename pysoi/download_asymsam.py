@@ -2,11 +2,189 @@
 
 import pandas as pd
 import numpy as np
+import hashlib
 import io
-import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from .sources import source_url, ASYMSAM_LEVELS, ASYMSAM_INDICES
+from .parsers import register_parser, parse_payload
+from .cube import SamCube, _CubeParts
+from .utils import (check_response, check_output, open_stream, build_output, frame_to_output,
+                    carry_transport)
 
 
-def download_asymsam_monthly():
+AVAILABLE_LEVELS = ASYMSAM_LEVELS
+
+ASYMSAM_MONTHLY_LINK = source_url("asymsam_monthly")
+
+MONTHLY_COLUMNS = {
+    "lev": "Lev",
+    "index": "Index",
+    "time": "Date",
+    "mean_estimated": "Value",
+    "mean_r.squared": "Value_normalized"
+}
+
+# Rows per chunk when streaming
+DEFAULT_CHUNKSIZE = 100_000
+
+_CATEGORIES = {'Index': (ASYMSAM_INDICES, False)}
+
+
+def level_link(level):
+    """Return the URL of the daily CSV for a pressure level."""
+    return source_url(f"asymsam_daily_{level}")
+
+
+def _check_indices(indices):
+    if indices is None:
+        return None
+    if isinstance(indices, str):
+        indices = [indices]
+    bad_indices = [index for index in indices if index not in ASYMSAM_INDICES]
+    if bad_indices:
+        raise ValueError(f"Invalid indices: {', '.join(bad_indices)}\n"
+                         f"Valid indices are: {', '.join(ASYMSAM_INDICES)}")
+    return list(indices)
+
+
+def _date_bound(value):
+    # ISO dates compare correctly as strings, so rows can be filtered before parsing
+    return None if value is None else pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _filter_mask(index, dates, indices, start, end):
+    """Row mask for the requested index types and inclusive date range."""
+    mask = np.ones(len(index), dtype=bool)
+    if indices is not None:
+        mask &= np.isin(index, indices)
+    if start is not None:
+        mask &= dates >= start
+    if end is not None:
+        mask &= dates <= end
+    return mask
+
+
+def _iter_csv(link, index_column, date_column, indices, start, end, chunksize):
+    """Stream a CSV in chunks, dropping unwanted rows before any type conversion."""
+    response = open_stream(link)
+    try:
+        reader = pd.read_csv(response.raw, chunksize=chunksize, dtype=str,
+                             usecols=lambda column: column != 'dump')
+        for chunk in reader:
+            index = chunk[index_column].to_numpy()
+            dates = chunk[date_column].str[:10].to_numpy()
+            mask = _filter_mask(index, dates, indices, start, end)
+            if not mask.any():
+                continue
+            yield chunk[mask] if not mask.all() else chunk
+    finally:
+        response.close()
+
+
+def _typed_chunk(chunk, index_column, date_column, int_column, float_columns):
+    """Convert a raw string chunk into the package's column types."""
+    chunk = chunk.reset_index(drop=True)
+    chunk[int_column] = chunk[int_column].astype('int32')
+    chunk[date_column] = pd.to_datetime(chunk[date_column])
+    chunk[index_column] = pd.Categorical(chunk[index_column], categories=ASYMSAM_INDICES, ordered=False)
+    for column in float_columns:
+        chunk[column] = chunk[column].astype('float64')
+    return chunk
+
+
+class _ColumnBuffer:
+    """
+    NumPy columns that chunks are appended into.
+
+    Columns grow in place with `ndarray.resize` (a realloc, so only one
+    column is ever being moved) and capacity doubles, so appending n rows
+    costs amortised O(n). `take` trims the columns to the rows appended,
+    and they can then back the output frame without another copy.
+    """
+
+    def __init__(self, dtypes, capacity=DEFAULT_CHUNKSIZE):
+        self.size = 0
+        self._capacity = max(1, capacity)
+        self._columns = {name: np.empty(self._capacity, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * self._capacity)
+        for column in self._columns.values():
+            # No views of the buffers are kept while appending
+            column.resize(capacity, refcheck=False)
+        self._capacity = capacity
+
+    def append(self, arrays):
+        n = len(next(iter(arrays.values())))
+        needed = self.size + n
+        if needed > self._capacity:
+            self._grow(needed)
+        for name, column in self._columns.items():
+            column[self.size:needed] = arrays[name]
+        self.size = needed
+
+    def take(self):
+        """Return the columns trimmed to the rows appended. The buffer is empty afterwards."""
+        columns = self._columns
+        for column in columns.values():
+            column.resize(self.size, refcheck=False)
+        self._columns = {name: np.empty(0, dtype=column.dtype) for name, column in columns.items()}
+        self.size = self._capacity = 0
+        return columns
+
+
+def _buffer_output(chunks, key_columns, value_columns, output):
+    """Append typed chunks into a column buffer and build the requested output."""
+    dtypes = {'Lev': np.int32, 'Date': 'datetime64[ns]', 'Index': np.int8}
+    dtypes.update({column: np.float64 for column in value_columns})
+    buffer = _ColumnBuffer(dtypes)
+
+    for chunk in chunks:
+        if isinstance(chunk, _LevelFailed):
+            buffer.size -= chunk.rows
+            continue
+        buffer.append({
+            'Lev': chunk['Lev'].to_numpy(),
+            'Date': chunk['Date'].to_numpy().astype('datetime64[ns]'),
+            'Index': chunk['Index'].cat.codes.to_numpy(),
+            **{column: chunk[column].to_numpy() for column in value_columns},
+        })
+
+    if buffer.size == 0:
+        return None
+
+    columns = buffer.take()
+    ordered = {name: columns[name] for name in list(key_columns) + list(value_columns)}
+    # The trimmed buffers become the frame's columns as they are
+    return build_output(ordered, _CATEGORIES, output, copy=False)
+
+
+def iter_asymsam_monthly(indices=None, start=None, end=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Iterate over the monthly Asymmetric and Symmetric SAM indices in chunks.
+    
+    The CSV is streamed over a pooled connection and unwanted rows are dropped
+    as each chunk is read, so memory use is bounded by `chunksize`.
+    
+    Args:
+        indices: Index types to keep ("sam", "ssam" and/or "asam"). Defaults to all.
+        start: First date to keep (inclusive). Defaults to the start of the record.
+        end: Last date to keep (inclusive). Defaults to the end of the record.
+        chunksize: Number of CSV rows read per chunk
+    
+    Yields:
+        DataFrames with the columns described in `download_asymsam_monthly`
+    """
+    indices = _check_indices(indices)
+    for chunk in _iter_csv(ASYMSAM_MONTHLY_LINK, 'index', 'time', indices,
+                           _date_bound(start), _date_bound(end), chunksize):
+        chunk = chunk.rename(columns=MONTHLY_COLUMNS)[list(MONTHLY_COLUMNS.values())]
+        yield _typed_chunk(chunk, 'Index', 'Date', 'Lev', ['Value', 'Value_normalized'])
+
+
+def download_asymsam_monthly(output="pandas", indices=None, start=None, end=None, stream=False):
     """
     Download monthly Asymmetric and Symmetric SAM indices.
     
@@ -15,6 +193,16 @@ def download_asymsam_monthly():
     zonally symmetric parts of the SAM field. 
     The detailed methodology can be found in Campitelli et al. (2022).
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+        indices: Index types to keep ("sam", "ssam" and/or "asam"). Defaults to all.
+        start: First date to keep (inclusive). Defaults to the start of the record.
+        end: Last date to keep (inclusive). Defaults to the end of the record.
+        stream: If True, read the CSV in chunks, filtering rows as they arrive
+                and appending them into column buffers that become the
+                result's columns, instead of parsing the whole file at once.
+    
     Returns:
         DataFrame with columns:
         - Lev: Atmospheric level in hPa
@@ -28,32 +216,255 @@ def download_asymsam_monthly():
         and asymmetric components of the Southern Annular Mode using a novel approach. 
         Climate Dynamics, 58(1), 161–178. https://doi.org/10.1007/s00382-021-05896-5
     """
-    asymsam_monthly_link = "https://www.cima.fcen.uba.ar/~elio.campitelli/asymsam/data/sam_monthly.csv"
+    check_output(output)
+    indices = _check_indices(indices)
     
     # Read the CSV file directly
     try:
-        data = pd.read_csv(asymsam_monthly_link, 
-                                dtype={'lev': 'int32', 'index': 'category', 'mean_estimated': 'float64', 'mean_r.squared': 'float64'},
-                                parse_dates=['time'])
+        if stream:
+            chunks = iter_asymsam_monthly(indices=indices, start=start, end=end)
+            return _buffer_output(chunks, ['Lev', 'Index', 'Date'], ['Value', 'Value_normalized'], output)
         
-        data = data.rename(columns = {
-            "lev": "Lev",
-            "index": "Index",
-            "time": "Date",
-            "mean_estimated": "Value",
-            "mean_r.squared": "Value_normalized"
-        })
-
-        # Ensure Index is categorical with correct levels
-        data['Index'] = pd.Categorical(data['Index'], categories=['sam', 'ssam', 'asam'], ordered=False)
+        # Parse, reusing the stored result if this exact payload was parsed before
+        data = parse_payload("asymsam_monthly", check_response(ASYMSAM_MONTHLY_LINK))
         
-        return data
+        data = _filter_frame(data, indices, start, end)
+        
+        return frame_to_output(data, output)
     except Exception as e:
         print(f"Error downloading ASYMSAM monthly data: {e}")
         return None
 
 
-def download_asymsam_daily(levels=700):
+def _parse_monthly(text):
+    """Parse the text of the monthly CSV into column arrays."""
+    data = pd.read_csv(io.StringIO(text),
+                       dtype={'lev': 'int32', 'index': str, 'mean_estimated': 'float64', 'mean_r.squared': 'float64'},
+                       parse_dates=['time'])
+    data = data.rename(columns=MONTHLY_COLUMNS)
+    return _csv_columns(data, list(MONTHLY_COLUMNS.values()))
+
+
+def _csv_columns(data, names):
+    """Column arrays of a parsed CSV, with Index as codes of ASYMSAM_INDICES."""
+    columns = {}
+    for name in names:
+        if name == 'Index':
+            columns[name] = pd.Categorical(data[name], categories=ASYMSAM_INDICES).codes.astype(np.int8)
+        elif name == 'Date':
+            columns[name] = data[name].to_numpy().astype('datetime64[ns]')
+        else:
+            columns[name] = data[name].to_numpy()
+    return columns
+
+
+register_parser("asymsam_monthly", _parse_monthly, _CATEGORIES)
+
+
+def _filter_frame(data, indices, start, end):
+    """Apply the index type and date filters to a parsed frame."""
+    if indices is None and start is None and end is None:
+        return data
+    start, end = _date_bound(start), _date_bound(end)
+    mask = _filter_mask(data['Index'].astype(str).to_numpy(), data['Date'].to_numpy(), indices,
+                        None if start is None else np.datetime64(start),
+                        None if end is None else np.datetime64(end))
+    return data[mask].reset_index(drop=True)
+
+
+def _parse_level(text):
+    """Parse the text of a per-level daily CSV into column arrays."""
+    data = pd.read_csv(io.StringIO(text),
+                       dtype={'Lev': 'int32', 'Index': str, 'Value': 'float64', 'R.squared': 'float64'},
+                       parse_dates=['Date'], usecols=lambda column: column != 'dump')
+    return _csv_columns(data, ['Lev', 'Date', 'Index', 'Value', 'R.squared'])
+
+
+for _level in ASYMSAM_LEVELS:
+    register_parser(f"asymsam_daily_{_level}", _parse_level, _CATEGORIES)
+
+
+def _level_frame(text):
+    """Parse a per-level daily CSV into a DataFrame, bypassing the parse cache."""
+    return build_output(_parse_level(text), _CATEGORIES, "pandas")
+
+
+def _read_level(level):
+    """Download and parse a single per-level daily CSV."""
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload(f"asymsam_daily_{level}", check_response(level_link(level)))
+
+
+def _load_parsed(path, covered):
+    """
+    Return the rows stored in a level's sidecar, or None.
+
+    The sidecar is only trusted if it was parsed from exactly the bytes in
+    `covered`, so a sidecar left behind by an interrupted sync is ignored.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            if str(stored["__digest__"]) != hashlib.sha256(covered).hexdigest():
+                return None
+            columns = {name: stored[name] for name in stored.files if name != "__digest__"}
+    except (OSError, ValueError, KeyError):
+        return None
+    return build_output(columns, _CATEGORIES, "pandas")
+
+
+def _store_parsed(path, data, covered):
+    """Write a level's parsed rows and the digest of the bytes they came from."""
+    columns = {name: data[name].cat.codes.to_numpy() if name == 'Index' else data[name].to_numpy()
+               for name in data.columns}
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, __digest__=np.array(hashlib.sha256(covered).hexdigest()), **columns)
+    os.replace(tmp_path, path)
+
+
+def _sync_level(cache, level):
+    """Bring one level up to date, parsing only the rows appended since the last sync."""
+    link = level_link(level)
+    parsed_path = cache.sidecar(link, ".parsed.npz")
+    result = cache.fetch(link)
+    content = result.content.decode("utf-8", errors="replace")
+
+    existing = None
+    previous = result.content[:result.offset]
+    # Appended bytes can only be parsed on their own if the old copy ended on a row boundary
+    if not result.full and previous.endswith(b"\n"):
+        existing = _load_parsed(parsed_path, previous)
+
+    if existing is None:
+        data = _level_frame(content)
+    elif not result.appended.strip():
+        data = existing
+    else:
+        header = content[:content.index("\n") + 1]
+        appended = _level_frame(header + result.appended.decode("utf-8", errors="replace"))
+        data = pd.concat([existing, appended[existing.columns]], ignore_index=True)
+        data['Index'] = pd.Categorical(data['Index'], categories=ASYMSAM_INDICES, ordered=False)
+
+    if existing is None or result.appended:
+        _store_parsed(parsed_path, data, result.content)
+    return data
+
+
+def sync_asymsam_daily(cache, levels="all", output="pandas"):
+    """
+    Incrementally sync daily Asymmetric and Symmetric SAM indices.
+    
+    The per-level CSVs grow by appending rows, so each refresh only requests
+    the new tail of every file with an HTTP Range request (see
+    `pysoi.tailsync.TailCache`) and parses just the appended rows into the
+    locally stored data. A level whose earlier content changed is downloaded
+    and parsed in full.
+    
+    Args:
+        cache: pysoi.tailsync.TailCache holding the local copies
+        levels: Atmospheric levels in hPa. Either a list of levels or "all".
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table, "numpy" for a dict of arrays or "cube" for a SamCube.
+    
+    Returns:
+        DataFrame with the columns described in `download_asymsam_daily`, or
+        None if no level could be synced. Levels that fail are reported and
+        left out.
+    """
+    if output != "cube":
+        check_output(output)
+    levels = _check_levels(levels)
+    
+    # A failing level is reported and skipped, as in download_asymsam_daily
+    all_data = []
+    for level in levels:
+        try:
+            all_data.append(_sync_level(cache, level))
+        except Exception as e:
+            print(f"Error downloading level {level}: {e}")
+    
+    if output == "cube":
+        return SamCube.from_frames(all_data)
+    
+    if not all_data:
+        return None
+    combined_data = pd.concat(all_data, ignore_index=True)
+    combined_data['Index'] = pd.Categorical(combined_data['Index'], categories=ASYMSAM_INDICES, ordered=False)
+    
+    return frame_to_output(combined_data, output)
+
+
+def _check_levels(levels):
+    """Normalise and validate the `levels` argument."""
+    # Convert to list if single level was provided
+    if not isinstance(levels, list) and levels != "all":
+        levels = [levels]
+    
+    # Use all available levels if specified
+    if levels == "all":
+        levels = AVAILABLE_LEVELS
+    
+    # Check for invalid levels
+    bad_levels = [level for level in levels if level not in AVAILABLE_LEVELS]
+    if bad_levels:
+        raise ValueError(f"Invalid levels: {', '.join(map(str, bad_levels))}\n"
+                         f"Valid levels are: {', '.join(map(str, AVAILABLE_LEVELS))}")
+    
+    return levels
+
+
+def iter_asymsam_daily(levels=700, indices=None, start=None, end=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Iterate over the daily Asymmetric and Symmetric SAM indices in chunks.
+    
+    Levels are streamed one after another over a pooled connection and
+    unwanted rows are dropped as each chunk is read, so memory use stays
+    bounded by `chunksize` however many levels are requested.
+    
+    Args:
+        levels: Atmospheric levels in hPa. Either a list of levels or "all".
+        indices: Index types to keep ("sam", "ssam" and/or "asam"). Defaults to all.
+        start: First date to keep (inclusive). Defaults to the start of the record.
+        end: Last date to keep (inclusive). Defaults to the end of the record.
+        chunksize: Number of CSV rows read per chunk
+    
+    Yields:
+        DataFrames with the columns described in `download_asymsam_daily`
+    """
+    levels = _check_levels(levels)
+    indices = _check_indices(indices)
+    start, end = _date_bound(start), _date_bound(end)
+    
+    for level in levels:
+        for chunk in _iter_csv(level_link(level), 'Index', 'Date', indices, start, end, chunksize):
+            chunk = chunk[['Lev', 'Date', 'Index', 'Value', 'R.squared']]
+            yield _typed_chunk(chunk, 'Index', 'Date', 'Lev', ['Value', 'R.squared'])
+
+
+class _LevelFailed:
+    """Marker telling the consumer to drop the last `rows` rows, read from a level that then failed."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+def _iter_levels(levels, indices, start, end):
+    """Stream levels in chunks, reporting and skipping any level that fails."""
+    for level in levels:
+        rows = 0
+        try:
+            for chunk in iter_asymsam_daily(level, indices=indices, start=start, end=end):
+                rows += len(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"Error downloading level {level}: {e}")
+            yield _LevelFailed(rows)
+
+
+def download_asymsam_daily(levels=700, max_workers=8, output="pandas", indices=None,
+                           start=None, end=None, stream=False):
     """
     Download daily Asymmetric and Symmetric SAM indices.
     
@@ -67,6 +478,24 @@ def download_asymsam_daily(levels=700):
                Available levels are: 1, 2, 3, 5, 7, 10, 20, 30, 50, 70, 100, 125, 150, 175,
                200, 225, 250, 300, 350, 400, 450, 500, 550, 600, 650, 700, 750, 775, 800,
                825, 850, 875, 900, 925, 950, 975 and 1000.
+        max_workers: Maximum number of levels downloaded concurrently. Requests
+               are still subject to the shared per-host rate limits.
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table, "numpy" for a dict of arrays or "cube" for a
+                dense pysoi.cube.SamCube (time x level x index float32 arrays).
+        indices: Index types to keep ("sam", "ssam" and/or "asam"). Defaults to all.
+        start: First date to keep (inclusive). Defaults to the start of the record.
+        end: Last date to keep (inclusive). Defaults to the end of the record.
+        stream: If True, stream the levels one at a time in chunks, filtering
+                rows as they arrive and appending them into column buffers
+                that become the result's columns without a copy. Peak memory
+                is then the result plus one chunk, plus the buffers' spare
+                capacity while they grow (at most the rows read so far),
+                rather than the text and frame of every level. For
+                output="cube", chunks are kept as compact float32 parts and
+                scattered into the cube. `max_workers` is ignored in this
+                mode. As without streaming, a level that fails is reported
+                and left out.
     
     Returns:
         DataFrame with columns:
@@ -75,55 +504,53 @@ def download_asymsam_daily(levels=700):
         - Index: Type of index. Either "sam", "ssam" or "asam"
         - Value: Value of the index
         - R.squared: The variance explained by the index
+        
+        With output="cube", a SamCube holding the values and R-squared as
+        (time x level x index) arrays with dates, levels and indices axes.
     
     References:
         Campitelli, E., Díaz, L. B., & Vera, C. (2022). Assessment of zonally symmetric 
         and asymmetric components of the Southern Annular Mode using a novel approach. 
         Climate Dynamics, 58(1), 161–178. https://doi.org/10.1007/s00382-021-05896-5
     """
-    available_levels = [1, 2, 3, 5, 7, 10, 20, 30, 50, 70, 100, 125, 150, 
-                      175, 200, 225, 250, 300, 350, 400, 450, 500, 550, 600, 
-                      650, 700, 750, 775, 800, 825, 850, 875, 900, 925, 950, 
-                      975, 1000]
-    
-    # Convert to list if single level was provided
-    if not isinstance(levels, list) and levels != "all":
-        levels = [levels]
+    cube = output == "cube"
+    if not cube:
+        check_output(output)
+    levels = _check_levels(levels)
+    indices = _check_indices(indices)
     
-    # Use all available levels if specified
-    if levels == "all":
-        levels = available_levels
-    
-    # Check for invalid levels
-    bad_levels = [level for level in levels if level not in available_levels]
-    if bad_levels:
-        raise ValueError(f"Invalid levels: {', '.join(map(str, bad_levels))}\n"
-                         f"Valid levels are: {', '.join(map(str, available_levels))}")
-    
-    # Base URL for data
-    root_link = "https://www.cima.fcen.uba.ar/~elio.campitelli/asymsam/data/sam_level/"
+    if stream:
+        chunks = _iter_levels(levels, indices, start, end)
+        if cube:
+            parts = _CubeParts(indices)
+            for chunk in chunks:
+                if isinstance(chunk, _LevelFailed):
+                    parts.drop(chunk.rows)
+                else:
+                    parts.add(chunk)
+            return parts.build()
+        return _buffer_output(chunks, ['Lev', 'Date', 'Index'], ['Value', 'R.squared'], output)
     
     # Initialize list to store data for each level
     all_data = []
     
-    # Download data for each requested level
-    for level in levels:
-        print(f"Downloading level: {level}")
-        link = f"{root_link}sam_{level}hPa.csv"
-        
-        try:
-            # Read data
-            data = pd.read_csv(link, 
-                              dtype={'Lev': 'int32', 'Index': 'category', 'Value': 'float64', 'R.squared': 'float64'},
-                              parse_dates=['Date'])
-            
-            # Drop any extra columns
-            if 'dump' in data.columns:
-                data = data.drop(columns=['dump'])
-                
-            all_data.append(data)
-        except Exception as e:
-            print(f"Error downloading level {level}: {e}")
+    # Download the requested levels concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(levels)))) as executor:
+        futures = []
+        read_level = carry_transport(_read_level)
+        for level in levels:
+            print(f"Downloading level: {level}")
+            futures.append((level, executor.submit(read_level, level)))
+
+        for level, future in futures:
+            try:
+                all_data.append(_filter_frame(future.result(), indices, start, end))
+            except Exception as e:
+                print(f"Error downloading level {level}: {e}")
+    
+    if cube:
+        # Scatter each level straight into the cube instead of concatenating
+        return SamCube.from_frames(all_data, indices=indices)
     
     # Combine all data
     if all_data:
@@ -131,9 +558,9 @@ def download_asymsam_daily(levels=700):
         
         # Ensure Index is categorical with correct levels
         combined_data['Index'] = pd.Categorical(combined_data['Index'], 
-                                               categories=['sam', 'ssam', 'asam'], 
+                                               categories=ASYMSAM_INDICES, 
                                                ordered=False)
         
-        return combined_data
+        return frame_to_output(combined_data, output)
     else:
         return None
@@ -1,12 +1,14 @@
 """Download Southern Oscillation Index and Oceanic Nino Index data."""
 
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from .download_oni import download_oni
 from .download_soi import download_soi
 from .download_npgo import download_npgo
+from .utils import check_output, frame_to_output, carry_transport
 
 
-def download_enso(climate_idx="all", create_csv=False):
+def download_enso(climate_idx="all", create_csv=False, output="pandas"):
     """
     Download Southern Oscillation Index and Oceanic Nino Index data.
     
@@ -29,6 +31,8 @@ def download_enso(climate_idx="all", create_csv=False):
                      Pacific Gyre Oscillation) and "all". "all" outputs 
                      each supported index variable as a slimmer dataset.
         create_csv: Whether to create a local copy of the data named "ENSO_Index.csv".
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
     
     Returns:
         DataFrame with columns (depending on which indices are selected):
@@ -43,21 +47,27 @@ def download_enso(climate_idx="all", create_csv=False):
     valid_options = ["all", "soi", "oni", "npgo"]
     if climate_idx not in valid_options:
         raise ValueError(f"climate_idx must be one of {valid_options}")
+    check_output(output)
         
     if climate_idx == "soi":
-        return download_soi()
+        return download_soi(output=output)
     
     if climate_idx == "oni":
-        return download_oni()
+        return download_oni(output=output)
     
     if climate_idx == "npgo":
-        return download_npgo()
+        return download_npgo(output=output)
     
     if climate_idx == "all":
-        # Join index data
-        oni_df = download_oni()
-        soi_df = download_soi()
-        npgo_df = download_npgo()
+        # Download the indices concurrently; the shared scheduler keeps
+        # requests to each host within its rate limit
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            oni_future = executor.submit(carry_transport(download_oni))
+            soi_future = executor.submit(carry_transport(download_soi))
+            npgo_future = executor.submit(carry_transport(download_npgo))
+            oni_df = oni_future.result()
+            soi_df = soi_future.result()
+            npgo_df = npgo_future.result()
         
         # Merge data
         enso = pd.merge(oni_df, soi_df, on=["Date", "Year", "Month"], how="outer")
@@ -70,4 +80,4 @@ def download_enso(climate_idx="all", create_csv=False):
         if create_csv:
             enso.to_csv("ENSO_Index.csv", index=False)
         
-        return enso
+        return frame_to_output(enso, output)
@@ -1,13 +1,47 @@
 """Download Multivariate ENSO Index Version 2 (MEI.v2)."""
 
-import pandas as pd
 import numpy as np
-import io
-import re
-from .utils import check_response
+from .sources import source_url
+from .parsers import register_parser, register_derived, parse_payload
+from .utils import (check_response, check_output, enso_phase_codes,
+                    month_dates, parse_year_table, ENSO_PHASES)
 
 
-def download_mei():
+# Bi-monthly seasons
+MEI_SEASONS = ["DJ", "JF", "FM", "MA", "AM", "MJ", "JJ", "JA", "AS", "SO", "ON", "ND"]
+_CATEGORIES = {"Month": (MEI_SEASONS, True), "Phase": (ENSO_PHASES, True)}
+
+
+def _parse_mei(response_text):
+    """Parse the MEI table into column arrays."""
+    # Parse the year x season table. The first line holds the year range and
+    # the trailer lines are skipped because they don't have 13 fields.
+    # The date approximates each season by its position in the year.
+    years, months, values = parse_year_table(response_text.splitlines()[1:], missing=-999.00)
+    
+    # Select desired columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "Date": month_dates(years, months),
+        "MEI": values,
+    }
+
+
+def _mei_phase(values):
+    """Phase codes from the MEI value."""
+    # Missing values are not classified as warm or cool, so they fall through
+    # to the neutral phase.
+    phase = enso_phase_codes(values)
+    phase[phase < 0] = ENSO_PHASES.index("Neutral Phase")
+    return phase
+
+
+register_parser("mei", _parse_mei, _CATEGORIES)
+register_derived("mei", "Phase", _mei_phase, ["MEI"])
+
+
+def download_mei(output="pandas", derived=True):
     """
     Download Multivariate ENSO Index Version 2 (MEI.v2).
     
@@ -18,6 +52,12 @@ def download_mei():
     Warm phase is defined as MEI index greater or equal to 0.5. Cold phase is 
     defined as MEI index lesser or equal to -0.5.
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+        derived: True (default) to include Phase, False to skip it. A skipped
+                 column can be added later with `frame.pysoi.derive()`.
+    
     Returns:
         DataFrame with columns:
         - Date: Date object
@@ -29,98 +69,11 @@ def download_mei():
     References:
         https://psl.noaa.gov/enso/mei/
     """
-    mei_link = "https://www.esrl.noaa.gov/psd/enso/mei/data/meiv2.data"
+    check_output(output)
+    mei_link = source_url("mei")
     
     # Get response
     response_text = check_response(mei_link)
     
-    # Parse the header to get years range
-    lines = response_text.splitlines()
-    header = lines[0].strip()
-    years_match = re.findall(r'\d{4}', header)
-    
-    if len(years_match) >= 2:
-        start_year = int(years_match[0])
-        end_year = int(years_match[1])
-    else:
-        # If can't parse header, use a reasonable default
-        # This is a fallback and shouldn't normally be triggered
-        start_year = 1979
-        end_year = 2023
-    
-    # Define bi-monthly seasons
-    months = ["DJ", "JF", "FM", "MA", "AM", "MJ", "JJ", "JA", "AS", "SO", "ON", "ND"]
-    
-    # Create a list to store data
-    data_list = []
-    
-    # Process each data line
-    for line in lines[1:]:
-        if not line.strip():
-            continue
-            
-        values = line.split()
-        if len(values) < 13:  # Year + 12 bi-monthly values
-            continue
-            
-        try:
-            year = int(values[0])
-            
-            for i, month_idx in enumerate(range(1, 13)):
-                if month_idx < len(values):
-                    mei_value = values[month_idx]
-                    
-                    # Convert to float, handle missing values
-                    try:
-                        mei_value = float(mei_value)
-                        if mei_value == -999.00:  # Missing value indicator
-                            mei_value = np.nan
-                    except ValueError:
-                        mei_value = np.nan
-                    
-                    # Determine the month number based on bi-monthly code
-                    # This approximates the date by using the first month
-                    month_num = i + 1
-                    if month_num > 12:
-                        month_num = 12  # Max is December
-                        
-                    # Create a record
-                    date = pd.to_datetime(f"{year}-{month_num}-01")
-                    
-                    # Determine phase based on MEI value
-                    if mei_value <= -0.5:
-                        phase = "Cool Phase/La Nina"
-                    elif mei_value >= 0.5:
-                        phase = "Warm Phase/El Nino"
-                    else:
-                        phase = "Neutral Phase"
-                    
-                    data_list.append({
-                        'Year': year,
-                        'Month': months[i],
-                        'Date': date,
-                        'MEI': mei_value,
-                        'Phase': phase
-                    })
-        except (ValueError, IndexError):
-            # Skip lines that can't be parsed
-            continue
-    
-    # Create DataFrame
-    mei = pd.DataFrame(data_list)
-    
-    # Convert Month to categorical
-    mei['Month'] = pd.Categorical(mei['Month'], categories=months, ordered=True)
-    
-    # Convert Phase to categorical
-    mei['Phase'] = pd.Categorical(
-        mei['Phase'], 
-        categories=["Cool Phase/La Nina", "Neutral Phase", "Warm Phase/El Nino"], 
-        ordered=True
-    )
-    
-    # Sort by date
-    mei = mei.sort_values('Date').reset_index(drop=True)
-    
-    # Select and return desired columns
-    return mei[["Year", "Month", "Date", "MEI", "Phase"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("mei", response_text, output, derived=derived)
@@ -1,18 +1,40 @@
 """Download North Atlantic Oscillation data."""
 
-import pandas as pd
 import numpy as np
-import io
-import calendar
-from .utils import check_response, abbr_month
+from .sources import source_url
+from .parsers import register_parser, parse_payload
+from .utils import check_response, check_output, parse_year_table, MONTH_ABBRS
 
 
-def download_nao():
+_CATEGORIES = {"Month": (MONTH_ABBRS, True)}
+
+
+def _parse_nao(response_text):
+    """Parse the NAO table into column arrays."""
+    # Parse the year x month table, skipping the header and invalid values
+    years, months, values = parse_year_table(response_text.splitlines()[1:], skip_invalid=True)
+    
+    # Select desired columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "NAO": values,
+    }
+
+
+register_parser("nao", _parse_nao, _CATEGORIES)
+
+
+def download_nao(output="pandas"):
     """
     Download North Atlantic Oscillation data.
     
     Surface sea-level pressure difference between the Subtropical (Azores) High and the Subpolar Low.
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+    
     Returns:
         DataFrame with columns:
         - Year: Year of record
@@ -22,54 +44,11 @@ def download_nao():
     References:
         https://www.ncdc.noaa.gov/teleconnections/nao/
     """
-    nao_link = "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/norm.nao.monthly.b5001.current.ascii.table"
+    check_output(output)
+    nao_link = source_url("nao")
     
     # Get response
     response_text = check_response(nao_link)
     
-    # Parse the data
-    months = list(calendar.month_abbr)[1:]  # Get month abbreviations
-    
-    # Read the fixed width file
-    # This is tricky because the format isn't consistent, we'll handle line by line
-    lines = response_text.splitlines()
-    
-    # Skip the header
-    data_lines = lines[1:]
-    
-    data_list = []
-    
-    for line in data_lines:
-        parts = line.split()
-        if len(parts) < 13:  # Need year + 12 months
-            continue
-            
-        year = int(parts[0])
-        
-        for i, month_idx in enumerate(range(1, 13), 1):
-            if month_idx < len(parts):
-                try:
-                    nao_value = float(parts[month_idx])
-                    date = pd.to_datetime(f"{year}-{i}-01")
-                    
-                    data_list.append({
-                        'Year': year,
-                        'Month': months[i-1],
-                        'Date': date,
-                        'NAO': nao_value
-                    })
-                except ValueError:
-                    # Skip invalid values
-                    continue
-    
-    # Create DataFrame
-    nao = pd.DataFrame(data_list)
-    
-    # Sort by date
-    nao = nao.sort_values('Date').reset_index(drop=True)
-    
-    # Create Month label as categorical
-    nao['Month'] = pd.Categorical(nao['Month'], categories=months, ordered=True)
-    
-    # Select and return desired columns
-    return nao[["Year", "Month", "NAO"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("nao", response_text, output)
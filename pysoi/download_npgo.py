@@ -1,16 +1,55 @@
 """Download North Pacific Gyre Oscillation data."""
 
-import pandas as pd
-import io
-from .utils import check_response, abbr_month
+import numpy as np
+from .sources import source_url
+from .parsers import register_parser, parse_payload
+from .utils import check_response, check_output, month_dates, MONTH_ABBRS
 
 
-def download_npgo():
+_CATEGORIES = {"Month": (MONTH_ABBRS, True)}
+
+
+def _parse_npgo(response_text):
+    """Parse the NPGO table into column arrays."""
+    # Remove comment lines and read the whitespace separated table
+    years = []
+    months = []
+    values = []
+    for line in response_text.splitlines():
+        fields = line.split()
+        # Skip comments, blank lines and truncated rows
+        if line.startswith('#') or len(fields) < 3:
+            continue
+        year, month, value = fields[:3]
+        years.append(int(float(year)))
+        months.append(int(float(month)))
+        values.append(float(value))
+    
+    years = np.array(years, dtype=np.int64)
+    months = np.array(months, dtype=np.int64)
+    
+    # Select desired columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "Date": month_dates(years, months),
+        "NPGO": np.array(values, dtype=np.float64),
+    }
+
+
+register_parser("npgo", _parse_npgo, _CATEGORIES)
+
+
+def download_npgo(output="pandas"):
     """
     Download North Pacific Gyre Oscillation data.
     
     North Pacific Gyre Oscillation data also known as the Victoria mode.
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+    
     Returns:
         DataFrame with columns:
         - Date: Date object
@@ -21,31 +60,11 @@ def download_npgo():
     References:
         http://www.oces.us/npgo/
     """
-    npgo_link = "http://www.oces.us/npgo/data/NPGO.txt"
+    check_output(output)
+    npgo_link = source_url("npgo")
     
     # Get response
     response_text = check_response(npgo_link)
     
-    # Remove comment lines
-    data_lines = [line for line in response_text.splitlines() if not line.startswith('#')]
-    clean_text = '\n'.join(data_lines)
-    
-    # Read table using sep instead of delim_whitespace to avoid deprecation warning
-    npgo = pd.read_csv(io.StringIO(clean_text), 
-                       sep=r'\s+',
-                       names=["Year", "Month", "NPGO"])
-    
-    # Ensure Year and Month are integers
-    npgo['Year'] = npgo['Year'].astype(int)
-    npgo['Month'] = npgo['Month'].astype(int)
-    
-    # Create Date column with proper formatting
-    npgo['Date'] = pd.to_datetime(
-        pd.Series([f"{year}-{month:02d}-01" for year, month in zip(npgo['Year'], npgo['Month'])])
-    )
-    
-    # Create Month label
-    npgo['Month'] = abbr_month(npgo['Date'])
-    
-    # Select and return desired columns
-    return npgo[["Year", "Month", "Date", "NPGO"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("npgo", response_text, output)
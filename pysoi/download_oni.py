@@ -1,12 +1,71 @@
 """Download Oceanic Nino Index data."""
 
-import pandas as pd
 import numpy as np
-import io
-from .utils import check_response, abbr_month
+from .sources import source_url
+from .parsers import register_parser, register_derived, parse_payload
+from .utils import (check_response, check_output, centered_mean,
+                    enso_phase_codes, month_dates, MONTH_ABBRS, ENSO_PHASES)
 
 
-def download_oni():
+# Rows whose ONI can't be computed (the first and last month) get an empty phase
+ONI_PHASES = [""] + ENSO_PHASES
+_CATEGORIES = {"Month": (MONTH_ABBRS, True), "phase": (ONI_PHASES, False)}
+
+
+def _parse_oni(response_text):
+    """Parse the ONI table into column arrays."""
+    # Read the whitespace separated table: YEAR MONTH TOTAL ClimAdjust dSST3.4
+    years = []
+    months = []
+    anomalies = []
+    for line in response_text.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        years.append(int(parts[0]))
+        months.append(int(parts[1]))
+        anomalies.append(float(parts[4]))
+    
+    years = np.array(years, dtype=np.int64)
+    months = np.array(months, dtype=np.int64)
+    anomalies = np.array(anomalies, dtype=np.float64)
+    
+    # Select desired columns; ONI and what follows from it are derived columns
+    return {
+        "Year": years,
+        "Month": (months - 1).astype(np.int8),
+        "Date": month_dates(years, months),
+        "dSST3.4": anomalies,
+    }
+
+
+def _oni(anomalies):
+    """3 month average of the Nino 3.4 anomalies."""
+    return centered_mean(anomalies, window=3)
+
+
+def _month_window(month_codes):
+    """Three month window labels, e.g. "DJF", from the first letter of each month."""
+    month_letters = np.array([abbr[0] for abbr in MONTH_ABBRS])[np.asarray(month_codes, dtype=np.int64)]
+    month_window = np.full(len(month_letters), "", dtype="<U3")
+    if len(month_letters) > 2:
+        month_window[1:-1] = np.char.add(np.char.add(month_letters[:-2], month_letters[1:-1]),
+                                          month_letters[2:])
+    return month_window
+
+
+def _oni_phase(oni):
+    """Phase codes, shifted past the empty category used where ONI is missing."""
+    return enso_phase_codes(oni) + 1
+
+
+register_parser("oni", _parse_oni, _CATEGORIES)
+register_derived("oni", "ONI", _oni, ["dSST3.4"])
+register_derived("oni", "ONI_month_window", _month_window, ["Month"])
+register_derived("oni", "phase", _oni_phase, ["ONI"])
+
+
+def download_oni(output="pandas", derived=True):
     """
     Download Oceanic Nino Index data.
     
@@ -20,6 +79,14 @@ def download_oni():
     - Neutral phase is defined as when the three month temperature average 
       is between +0.5 and -0.5 degC
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+        derived: True (default) to include ONI, ONI_month_window and phase,
+                 False for only the raw columns, or a list of those names.
+                 Skipped columns of a DataFrame can be added later with
+                 `frame.pysoi.derive()` or `frame.pysoi["phase"]`.
+    
     Returns:
         DataFrame with columns:
         - Date: Date object 
@@ -32,56 +99,11 @@ def download_oni():
     References:
         https://www.cpc.ncep.noaa.gov/products/precip/CWlink/MJO/enso.shtml
     """
-    oni_link = "http://www.cpc.ncep.noaa.gov/products/analysis_monitoring/ensostuff/detrend.nino34.ascii.txt"
+    check_output(output)
+    oni_link = source_url("oni")
     
     # Get response
     response_text = check_response(oni_link)
     
-    # Read table - use sep='\s+' instead of delim_whitespace to avoid deprecation warning
-    oni = pd.read_csv(io.StringIO(response_text), 
-                      sep=r'\s+',
-                      names=["Year", "Month", "TOTAL", "ClimAdjust", "dSST3.4"],
-                      skiprows=1)
-    
-    # Keep only relevant columns
-    oni = oni[["Year", "Month", "dSST3.4"]]
-    
-    # Create Date column from Year and Month
-    oni['Date'] = pd.to_datetime(oni['Year'].astype(str) + '-' + oni['Month'].astype(str) + '-01')
-    
-    # Create Month label
-    oni['Month'] = abbr_month(oni['Date'])
-    
-    # Create 3 month average window
-    oni['ONI'] = oni['dSST3.4'].rolling(window=3, center=True).mean()
-    
-    # Create ONI month window - initialize as string type to avoid dtype issues
-    oni['ONI_month_window'] = pd.Series(np.nan, index=oni.index, dtype='object')
-    
-    # Get first letter of each month
-    month_abbrs = oni['Month'].astype(str).str[0]
-    
-    # Fill in the ONI month window values
-    for i in range(1, len(oni) - 1):
-        oni.loc[i, 'ONI_month_window'] = month_abbrs.iloc[i-1] + month_abbrs.iloc[i] + month_abbrs.iloc[i+1]
-    
-    # Assign phase - ensure all elements are strings to avoid dtype issues
-    conditions = [
-        (oni['ONI'] <= -0.5),
-        (oni['ONI'] >= 0.5),
-        (oni['ONI'] > -0.5) & (oni['ONI'] < 0.5)
-    ]
-    choices = ['Cool Phase/La Nina', 'Warm Phase/El Nino', 'Neutral Phase']
-    
-    # Use Series.mask method to avoid numpy select dtype issues
-    oni['phase'] = pd.Series('', index=oni.index, dtype='object')
-    
-    # Apply conditions one by one
-    for condition, choice in zip(conditions, choices):
-        oni.loc[condition, 'phase'] = choice
-    
-    # Convert to categorical
-    oni['phase'] = pd.Categorical(oni['phase'])
-    
-    # Select and return desired columns
-    return oni[["Year", "Month", "Date", "dSST3.4", "ONI", "ONI_month_window", "phase"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("oni", response_text, output, derived=derived)
@@ -1,13 +1,45 @@
 """Download Pacific Decadal Oscillation Data."""
 
-import pandas as pd
 import numpy as np
-import io
 from datetime import datetime
-from .utils import check_response, abbr_month
+from .sources import source_url
+from .parsers import register_parser, parse_payload
+from .utils import check_response, check_output, MONTH_ABBRS
 
 
-def download_pdo():
+_CATEGORIES = {"Month": (MONTH_ABBRS, True)}
+
+
+def _parse_pdo(response_text):
+    """Parse the ERDDAP PDO CSV into column arrays."""
+    # Parse CSV
+    # Skip the first two lines which contain metadata
+    times = []
+    values = []
+    for line in response_text.splitlines()[2:]:
+        if not line.strip():
+            continue
+        time, value = line.split(',')[:2]
+        times.append(time.rstrip('Z'))
+        values.append(float(value) if value.strip() else np.nan)
+    
+    # Timestamps are UTC
+    dates = np.array(times, dtype="datetime64[ns]")
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    
+    # Select desired columns
+    return {
+        "Year": months // 12 + 1970,
+        "Month": (months % 12).astype(np.int8),
+        "Date": dates,
+        "PDO": np.array(values, dtype=np.float64),
+    }
+
+
+register_parser("pdo", _parse_pdo, _CATEGORIES, tz="UTC")
+
+
+def download_pdo(output="pandas"):
     """
     Download Pacific Decadal Oscillation Data.
     
@@ -21,6 +53,10 @@ def download_pdo():
     The ERSST anomalies are then projected onto that map to compute the NCEI index. 
     The NCEI PDO index closely follows the Mantua PDO index.
     
+    Args:
+        output: Output format. "pandas" (default) for a DataFrame, "arrow" for a
+                pyarrow.Table or "numpy" for a dict of arrays.
+    
     Returns:
         DataFrame with columns:
         - Date: Date object
@@ -31,29 +67,13 @@ def download_pdo():
     References:
         Original PDO: https://oceanview.pfeg.noaa.gov/erddap/info/cciea_OC_PDO/index.html
     """
+    check_output(output)
+    
     # Construct the URL with current date
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    pdo_link = f"https://oceanview.pfeg.noaa.gov/erddap/tabledap/cciea_OC_PDO.csv?time%2CPDO&time%3E=1900-01-01&time%3C={current_date}"
+    pdo_link = source_url("pdo", today=datetime.now())
     
     # Get response
     response_text = check_response(pdo_link)
     
-    # Read CSV
-    # Skip the first two lines which contain metadata
-    lines = response_text.splitlines()[2:]
-    csv_text = '\n'.join(lines)
-    
-    # Parse CSV
-    pdo = pd.read_csv(io.StringIO(csv_text), names=["Date", "PDO"])
-    
-    # Convert date string to datetime
-    pdo['Date'] = pd.to_datetime(pdo['Date'])
-    
-    # Extract year
-    pdo['Year'] = pdo['Date'].dt.year
-    
-    # Create Month as categorical from Date
-    pdo['Month'] = abbr_month(pdo['Date'])
-    
-    # Select and return desired columns
-    return pdo[["Year", "Month", "Date", "PDO"]]
+    # Parse, reusing the stored result if this exact payload was parsed before
+    return parse_payload("pdo", response_text, output)
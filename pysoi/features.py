@@ -0,0 +1,216 @@
+"""Lagged feature matrices of the monthly indices for statistical and ML models."""
+
+import numpy as np
+import pandas as pd
+
+from .annotate import _resolve
+
+
+def _base_matrix(series):
+    """Align every index on one gap-free month axis as a read-only (time x index) matrix."""
+    names = list(series)
+    spans = [(s.start, s.start + len(s.values)) for s in series.values() if len(s.values)]
+    start = min(first for first, _ in spans) if spans else 0
+    stop = max(last for _, last in spans) if spans else 0
+    base = np.full((stop - start, len(names)), np.nan)
+    for j, name in enumerate(names):
+        s = series[name]
+        base[s.start - start:s.start - start + len(s.values), j] = s.values
+    base.flags.writeable = False
+    return start, base, names
+
+
+def _per_index(spec, names, label):
+    """Expand a lag or window spec into {name: sorted list of ints}."""
+    if isinstance(spec, dict):
+        unknown = [name for name in spec if name.upper() not in names]
+        if unknown:
+            raise ValueError(f"{label} given for indices not requested: {', '.join(unknown)}")
+        spec = {name.upper(): value for name, value in spec.items()}
+        return {name: _as_ints(spec.get(name, []), label) for name in names}
+    values = _as_ints(spec, label)
+    return {name: values for name in names}
+
+
+def _as_ints(spec, label):
+    if spec is None:
+        return []
+    if np.isscalar(spec):
+        # A single number n means 0..n for lags and just n for windows
+        spec = range(int(spec) + 1) if label == "lags" else [int(spec)]
+    values = sorted({int(value) for value in spec})
+    low = 0 if label == "lags" else 1
+    if values and values[0] < low:
+        raise ValueError(f"{label} must be integers >= {low}")
+    return values
+
+
+def _shift_into(out, column, lag, first_row):
+    """Write `column` lagged by `lag` months, for rows from `first_row`, into `out`."""
+    source = first_row - lag
+    missing = min(max(0, -source), len(out))
+    out[:missing] = np.nan
+    out[missing:] = column[source + missing:source + len(out)]
+
+
+def _window_into(out, totals, counts, window, first_row):
+    """Write trailing `window`-month means (complete windows only) into `out`."""
+    ends = np.arange(first_row + 1, first_row + len(out) + 1)
+    starts = ends - window
+    complete = starts >= 0
+    starts = np.maximum(starts, 0)
+    complete &= (counts[ends] - counts[starts]) == window
+    np.divide(totals[ends] - totals[starts], window, out=out)
+    out[~complete] = np.nan
+
+
+class FeatureMatrix:
+    """
+    A lagged feature matrix.
+
+    Attributes:
+        values: (time x feature) array, written in place without per-feature copies
+        columns: Feature names: "<NAME>" (lag 0), "<NAME>_lag<k>" and "<NAME>_mean<w>"
+        dates: datetime64[ns] month of each row
+        valid: Boolean mask of the rows with no missing feature
+    """
+
+    def __init__(self, values, columns, dates, valid):
+        self.values = values
+        self.columns = columns
+        self.dates = dates
+        self.valid = valid
+
+    def __repr__(self):
+        return (f"FeatureMatrix(rows={self.values.shape[0]}, features={self.values.shape[1]}, "
+                f"valid_rows={int(self.valid.sum())})")
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def to_frame(self, valid_only=False):
+        """
+        Return the features as a DataFrame indexed by Date.
+
+        Args:
+            valid_only: Keep only the rows with every feature present
+
+        Returns:
+            DataFrame (backed by `values` without a copy unless valid_only)
+        """
+        values, dates = self.values, self.dates
+        if valid_only:
+            values, dates = values[self.valid], dates[self.valid]
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name="Date"),
+                            columns=self.columns, copy=False)
+
+
+class FeatureBuilder:
+    """
+    Builds lagged feature matrices from one aligned base matrix.
+
+    The indices are resolved and aligned once; each `build` call only fills
+    a new preallocated output, so sweeps over lag and window settings do not
+    redo the alignment or create intermediate frames.
+
+    Args:
+        indices: Index names, e.g. ["ONI", "SOI", "PDO"] (defaults to every
+                 index in `source`)
+        source: IndexStore, DataFrame (e.g. from `download_enso`), dict of
+                index name to DataFrame, or None to download the indices
+    """
+
+    def __init__(self, indices=None, source=None):
+        self.start, self.base, self.names = _base_matrix(_resolve(indices, source))
+
+    def __repr__(self):
+        return f"FeatureBuilder(names={self.names}, months={len(self.base)})"
+
+    def _rows(self, start, end):
+        first = 0
+        last = len(self.base)
+        if start is not None:
+            first = max(first, int(np.datetime64(pd.Timestamp(start).to_datetime64(), "M").astype(np.int64))
+                        - self.start)
+        if end is not None:
+            last = min(last, int(np.datetime64(pd.Timestamp(end).to_datetime64(), "M").astype(np.int64))
+                       - self.start + 1)
+        return first, max(first, last)
+
+    def build(self, lags=0, windows=None, start=None, end=None, dtype=np.float64):
+        """
+        Build a feature matrix.
+
+        Lags are taken from the full history, so the first rows of a
+        `start`-restricted matrix still have their lagged values.
+
+        Args:
+            lags: Lags in months: an int n for lags 0..n, a list of lags, or a
+                  dict of index name to either
+            windows: Trailing rolling-mean lengths in months: an int, a list,
+                     or a dict of index name to either. A mean needs every
+                     month of its window.
+            start: First month of the output (defaults to the first month of data)
+            end: Last month of the output (defaults to the last month of data)
+            dtype: Output dtype, e.g. numpy.float32 for ML libraries
+
+        Returns:
+            FeatureMatrix
+        """
+        lags = _per_index(lags, self.names, "lags")
+        windows = _per_index(windows, self.names, "windows")
+        first, last = self._rows(start, end)
+        n_rows = last - first
+
+        columns = []
+        for name in self.names:
+            columns += [name if lag == 0 else f"{name}_lag{lag}" for lag in lags[name]]
+            columns += [f"{name}_mean{window}" for window in windows[name]]
+
+        values = np.empty((n_rows, len(columns)), dtype=dtype)
+        j = 0
+        for k, name in enumerate(self.names):
+            column = self.base[:, k]
+            for lag in lags[name]:
+                _shift_into(values[:, j], column, lag, first)
+                j += 1
+            if windows[name]:
+                missing = np.isnan(column)
+                totals = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, column))])
+                counts = np.concatenate([[0], np.cumsum(~missing)])
+                for window in windows[name]:
+                    _window_into(values[:, j], totals, counts, window, first)
+                    j += 1
+
+        valid = ~np.isnan(values).any(axis=1)
+        dates = (np.arange(first, last, dtype=np.int64) + self.start).astype("datetime64[M]").astype("datetime64[ns]")
+        return FeatureMatrix(values, columns, dates, valid)
+
+
+def build_features(indices=None, lags=0, windows=None, source=None, start=None, end=None, dtype=np.float64):
+    """
+    Build a lagged feature matrix of monthly indices.
+
+    Equivalent to `FeatureBuilder(indices, source).build(...)`, so each call
+    resolves and aligns the indices again. For sweeps over lag and window
+    settings, create one FeatureBuilder and call `build` on it instead.
+
+    Args:
+        indices: Index names (defaults to every index in `source`)
+        lags: Lags in months: an int n for lags 0..n, a list, or a dict per index
+        windows: Trailing rolling-mean lengths in months (int, list or dict per index)
+        source: IndexStore, DataFrame, dict of frames, or None to download
+        start: First month of the output
+        end: Last month of the output
+        dtype: Output dtype
+
+    Returns:
+        FeatureMatrix
+
+    Example:
+        features = build_features(["ONI", "SOI", "PDO"], lags=24, windows=[3, 12],
+                                  source=open_store("indices"))
+        X = features.values[features.valid]
+    """
+    return FeatureBuilder(indices, source).build(lags, windows, start=start, end=end, dtype=dtype)
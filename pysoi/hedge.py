@@ -0,0 +1,228 @@
+"""Hedged requests across mirrors of the same file."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+
+# Seconds to wait on a URL before also asking the next mirror
+DEFAULT_BUDGET = 2.0
+
+# Latency charged to an origin for a failed request
+FAILURE_PENALTY = 30.0
+
+# Statuses that count as an answer; anything else lets the other mirrors win
+_GOOD_STATUS = (200, 206, 304)
+
+# Seconds between checks on whether a queued attempt has been admitted
+_ADMIT_POLL = 0.05
+
+
+def origin(url):
+    """Return "scheme://host[:port]" of a URL, the unit latencies are tracked per."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted moving average of response latency per origin.
+
+    Origins are "scheme://host", so http and https on the same server are
+    tracked separately.
+
+    Args:
+        alpha: Weight of the newest observation (0-1)
+    """
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def record(self, url, seconds):
+        """Add a latency observation for the origin of `url`."""
+        key = origin(url)
+        with self._lock:
+            previous = self._latency.get(key)
+            self._latency[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def failure(self, url, penalty=FAILURE_PENALTY):
+        """Record a failed request as a slow one."""
+        self.record(url, penalty)
+
+    def estimate(self, url):
+        """Return the average latency of the origin of `url`, or None if unseen."""
+        with self._lock:
+            return self._latency.get(origin(url))
+
+    def order(self, urls):
+        """
+        Sort URLs fastest first.
+
+        Origins without observations sort as if instant, so every mirror
+        gets measured, and ties keep the given order.
+        """
+        return sorted(urls, key=lambda url: self.estimate(url) or 0.0)
+
+    def snapshot(self):
+        """Return a copy of the per-origin averages."""
+        with self._lock:
+            return dict(self._latency)
+
+
+class _Attempt:
+    """Admission time of one request, set once the per-host limiter lets it through."""
+
+    def __init__(self):
+        self.admitted = threading.Event()
+        self.start = None
+
+    def admit(self):
+        self.start = time.monotonic()
+        self.admitted.set()
+
+
+class HedgePolicy:
+    """
+    Send a request to the fastest known mirror, and to the next one as well
+    if no response has arrived within `budget` seconds.
+
+    The budget and the latency statistics start when the per-host limiter
+    admits the request, so time queued behind pysoi's own rate limits never
+    counts as a slow mirror. Mirrors on the host of an earlier URL are
+    skipped, as hedging to them would only add load to the same server.
+
+    The first good response (200, 206 or 304) wins. Requests that are still
+    running are cancelled if they have not started, or closed as soon as
+    they return, so a losing download never transfers its body. If no
+    mirror answers successfully, the primary's response (or the first
+    error) is returned.
+
+    Args:
+        budget: Seconds to wait on each URL before hedging to the next
+        tracker: LatencyTracker choosing the primary (a new one by default)
+        max_workers: Threads available for concurrent attempts
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, tracker=None, max_workers=16):
+        self.budget = budget
+        self.tracker = tracker or LatencyTracker()
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.hedged = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="pysoi-hedge")
+            return self._executor
+
+    def _attempt(self, send, url, attempt):
+        try:
+            response = send(url, attempt.admit)
+        except Exception:
+            self.tracker.failure(url)
+            raise
+        if response.status_code in _GOOD_STATUS:
+            if attempt.start is not None:
+                self.tracker.record(url, time.monotonic() - attempt.start)
+        else:
+            self.tracker.failure(url)
+        return response
+
+    @staticmethod
+    def _discard(future):
+        """Cancel a losing attempt, or close its response once it arrives."""
+        def close(future):
+            if not future.cancelled() and future.exception() is None:
+                future.result().close()
+
+        if not future.cancel():
+            future.add_done_callback(close)
+
+    def request(self, urls, send):
+        """
+        Send a request to mirrored URLs with hedging.
+
+        Args:
+            urls: URLs serving the same file, primary first
+            send: Function `send(url, on_admit)` issuing the request for one
+                  URL and returning its response. It calls `on_admit()` when
+                  the rate limiter lets the request through, and should
+                  stream the body, so that closing a loser stops the transfer.
+
+        Returns:
+            The winning response
+        """
+        urls = self.tracker.order(urls)
+        primary = urls[0]
+        hosts = set()
+        waiting = []
+        for url in urls:
+            if urlsplit(url).hostname not in hosts:
+                hosts.add(urlsplit(url).hostname)
+                waiting.append(url)
+        pending = {}
+        fallback = None
+        error = None
+        latest = None
+
+        def launch():
+            nonlocal latest
+            url = waiting.pop(0)
+            latest = _Attempt()
+            pending[self._pool().submit(self._attempt, send, url, latest)] = url
+
+        launch()
+        while pending:
+            if not waiting:
+                timeout = None
+            elif latest.admitted.is_set():
+                timeout = max(0.0, self.budget - (time.monotonic() - latest.start))
+            else:
+                # Still queued behind the limiter: the budget hasn't started
+                timeout = _ADMIT_POLL
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if not latest.admitted.is_set() or time.monotonic() - latest.start < self.budget:
+                    continue
+                # Over budget: ask the next mirror as well
+                with self._lock:
+                    self.hedged += 1
+                launch()
+                continue
+
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    if error is None or url == primary:
+                        error = e
+                    response = None
+
+                if response is not None and response.status_code in _GOOD_STATUS:
+                    for loser in pending:
+                        self._discard(loser)
+                    if fallback is not None:
+                        fallback.close()
+                    return response
+
+                if response is not None:
+                    if fallback is None or url == primary:
+                        if fallback is not None:
+                            fallback.close()
+                        fallback = response
+                    else:
+                        response.close()
+                # Failed quickly: no reason to wait out the budget
+                if waiting and not pending:
+                    launch()
+
+        if fallback is not None:
+            return fallback
+        raise error
@@ -0,0 +1,168 @@
+"""Content-hash keyed cache of parsed download results."""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Bump when any parser changes its output so stale entries are never reused
+PARSER_VERSION = 2
+
+
+class ParseCache:
+    """
+    Cache of parsed column arrays keyed by a hash of the raw payload.
+
+    The key combines the source name, parser version, parser options and a
+    SHA-256 of the payload, so a byte-identical download skips parsing
+    entirely. Entries are kept in a small in-memory LRU and, if `path` is
+    given, on disk as uncompressed .npz files (one NumPy array per column).
+
+    Args:
+        path: Directory for on-disk entries (None for memory only)
+        memory_entries: Number of entries kept in memory
+    """
+
+    def __init__(self, path=None, memory_entries=32):
+        self.path = None if path is None else os.path.abspath(path)
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name, payload, version=PARSER_VERSION, options=None):
+        """
+        Build the cache key for a payload.
+
+        Args:
+            name: Source name, e.g. "oni"
+            payload: Raw payload as str or bytes
+            version: Parser version
+            options: Dict of parser options that change the output
+
+        Returns:
+            Hex digest string
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        digest = hashlib.sha256()
+        digest.update(f"{name}\0{version}\0{sorted((options or {}).items())!r}\0".encode("utf-8"))
+        digest.update(payload)
+        return digest.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+    def get(self, key):
+        """Return a copy of the cached columns for `key`, or None."""
+        with self._lock:
+            columns = self._memory.get(key)
+            if columns is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return {name: values.copy() for name, values in columns.items()}
+
+        if self.path is not None and os.path.exists(self._file(key)):
+            with np.load(self._file(key), allow_pickle=False) as stored:
+                columns = {name: stored[name] for name in stored.files}
+            self._remember(key, columns)
+            with self._lock:
+                self.hits += 1
+            return {name: values.copy() for name, values in columns.items()}
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, columns):
+        """Store parsed columns under `key`."""
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        self._remember(key, columns)
+
+        if self.path is not None:
+            tmp_path = os.path.join(self.path, f".{key}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **columns)
+            os.replace(tmp_path, self._file(key))
+
+    def _remember(self, key, columns):
+        with self._lock:
+            self._memory[key] = columns
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+        if self.path is not None:
+            for filename in os.listdir(self.path):
+                if filename.endswith(".npz"):
+                    os.remove(os.path.join(self.path, filename))
+
+
+_parse_cache = None
+
+
+def enable_parse_cache(path=None, memory_entries=32):
+    """
+    Cache parsed results of every download function.
+
+    Args:
+        path: Directory for on-disk entries (None for memory only)
+        memory_entries: Number of entries kept in memory
+
+    Returns:
+        The installed ParseCache
+    """
+    global _parse_cache
+    _parse_cache = ParseCache(path, memory_entries=memory_entries)
+    return _parse_cache
+
+
+def disable_parse_cache():
+    """Stop caching parsed results."""
+    global _parse_cache
+    _parse_cache = None
+
+
+def get_parse_cache():
+    """Return the installed ParseCache, or None."""
+    return _parse_cache
+
+
+def cached_parse(name, payload, parse, version=PARSER_VERSION, options=None, key=None):
+    """
+    Parse a payload, reusing the cached result for identical payloads.
+
+    Args:
+        name: Source name, e.g. "oni"
+        payload: Raw payload passed to `parse`
+        parse: Function mapping the payload to a dict of column arrays
+        version: Parser version
+        options: Dict of parser options that change the output
+        key: `ParseCache.key` of the payload if the caller already computed it
+
+    Returns:
+        Dict of column name to numpy array
+    """
+    cache = _parse_cache
+    if cache is None:
+        return parse(payload)
+
+    if key is None:
+        key = cache.key(name, payload, version=version, options=options)
+    columns = cache.get(key)
+    if columns is None:
+        columns = parse(payload)
+        cache.put(key, columns)
+    return columns
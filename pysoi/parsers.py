@@ -0,0 +1,329 @@
+"""Registry of the functions turning a source's raw payload into a table."""
+
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .parsecache import ParseCache, cached_parse
+from .utils import build_output, check_output, frame_to_output, pandas_column
+
+
+class Parser:
+    """
+    How to parse the payload of one source.
+
+    Attributes:
+        name: Source name, e.g. "oni"
+        parse: Function mapping the payload text to a dict of raw column
+               arrays, or to a DataFrame if `columns` is False
+        categories: Categorical columns passed to `build_output`
+        tz: Time zone of the Date column passed to `build_output`
+        columns: True if `parse` returns column arrays (which can be cached)
+    """
+
+    def __init__(self, name, parse, categories=None, tz=None, columns=True):
+        self.name = name
+        self.parse = parse
+        self.categories = categories
+        self.tz = tz
+        self.columns = columns
+
+    def __call__(self, payload, output="pandas", derived=True):
+        # Identifies this exact payload, for the parse cache and for caches of
+        # results computed from the frame (see `frame_revision`)
+        key = ParseCache.key(self.name, payload)
+        if not self.columns:
+            result = frame_to_output(self.parse(payload), output)
+            if output == "pandas":
+                result.attrs["pysoi_revision"] = _Revision(self.name, key, result.columns)
+            return result
+        # Parse, reusing the stored result if this exact payload was parsed before
+        columns = LazyColumns(cached_parse(self.name, payload, self.parse, key=key), DERIVED.get(self.name))
+        selected = columns.select(derived)
+        result = build_output(selected, self.categories, output, tz=self.tz)
+        if output == "pandas":
+            result.attrs["pysoi_revision"] = _Revision(self.name, key, columns)
+            if len(selected) < len(columns):
+                # Lets frame.pysoi compute the skipped derived columns later
+                result.attrs["pysoi_parse"] = _ParsedColumns(self, columns)
+        return result
+
+
+class _Revision:
+    """The payload a frame was parsed from and the columns parsing produced."""
+
+    def __init__(self, source, key, columns):
+        self.source = source
+        self.key = key
+        self.columns = frozenset(columns)
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def frame_revision(frame, column):
+    """
+    Return the (source, payload key) a downloaded column was parsed from.
+
+    Frames derived from a download (selections, copies) carry the same
+    revision, so results that depend only on the downloaded values can be
+    cached by it in O(1) instead of hashing the data. Columns added to the
+    frame later have no revision.
+
+    Args:
+        frame: DataFrame returned by a download function
+        column: Column name
+
+    Returns:
+        Tuple of source name and payload key, or None
+    """
+    revision = frame.attrs.get("pysoi_revision")
+    if revision is None or column not in revision.columns:
+        return None
+    return revision.source, revision.key
+
+
+class _ParsedColumns:
+    """
+    The full parse a frame was built from.
+
+    pandas deep-copies `attrs` onto every frame derived from another one;
+    returning self keeps one shared parse instead of copying its arrays.
+    """
+
+    def __init__(self, parser, columns):
+        self.parser = parser
+        self.columns = columns
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class Derived:
+    """
+    A column computed from other columns of a source.
+
+    Attributes:
+        name: Column name, e.g. "phase"
+        compute: Function taking the `depends` arrays and returning the new
+                 array (category codes for categorical columns, "" for
+                 missing strings, as the parsers return)
+        depends: Names of the raw or derived columns `compute` takes
+    """
+
+    def __init__(self, name, compute, depends):
+        self.name = name
+        self.compute = compute
+        self.depends = list(depends)
+
+
+PARSERS = {}
+
+# Source name -> {column name: Derived}, in output order
+DERIVED = {}
+
+
+def register_parser(name, parse, categories=None, tz=None, columns=True):
+    """
+    Register the parser of a source.
+
+    Args:
+        name: Source name, e.g. "oni"
+        parse: Function mapping the payload text to a dict of column arrays
+               (or a DataFrame if `columns` is False)
+        categories: Categorical columns passed to `build_output`
+        tz: Time zone of the Date column
+        columns: True if `parse` returns column arrays
+    """
+    PARSERS[name] = Parser(name, parse, categories=categories, tz=tz, columns=columns)
+
+
+def register_derived(source, name, compute, depends):
+    """
+    Register a derived column of a source.
+
+    Derived columns follow the raw columns in registration order and are
+    only computed when selected or accessed.
+
+    Args:
+        source: Source name, e.g. "oni"
+        name: Column name
+        compute: Function of the `depends` arrays returning the column array
+        depends: Names of the columns `compute` takes
+    """
+    DERIVED.setdefault(source, {})[name] = Derived(name, compute, depends)
+
+
+class LazyColumns(Mapping):
+    """
+    Raw column arrays plus derived columns computed on first access and cached.
+
+    Args:
+        columns: Mapping of raw column name to array
+        derived: Dict of column name to Derived
+    """
+
+    def __init__(self, columns, derived=None):
+        self._raw = columns
+        self._derived = dict(derived or {})
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name in self._cache:
+            return self._cache[name]
+        if name in self._derived:
+            spec = self._derived[name]
+            values = spec.compute(*[self[depend] for depend in spec.depends])
+        else:
+            values = self._raw[name]
+        self._cache[name] = values
+        return values
+
+    def __iter__(self):
+        yield from self._raw
+        yield from (name for name in self._derived if name not in self._raw)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def computed(self):
+        """Names of the derived columns computed so far."""
+        return [name for name in self._derived if name in self._cache]
+
+    def select(self, derived=True):
+        """
+        Return the raw columns and the requested derived columns as a dict.
+
+        Args:
+            derived: True for every derived column, False for none, or a
+                     list of derived column names
+
+        Returns:
+            Dict of column name to array, in output order
+        """
+        if derived is True:
+            wanted = list(self._derived)
+        elif not derived:
+            wanted = []
+        else:
+            wanted = [derived] if isinstance(derived, str) else list(derived)
+            unknown = [name for name in wanted if name not in self._derived]
+            if unknown:
+                raise ValueError(f"Invalid derived columns: {', '.join(unknown)}\n"
+                                 f"Valid derived columns are: {', '.join(self._derived) or 'none'}")
+        return {name: self[name] for name in self if name in self._raw or name in wanted}
+
+
+def parse_payload(name, payload, output="pandas", derived=True):
+    """
+    Parse a downloaded payload with the source's registered parser.
+
+    Args:
+        name: Source name, e.g. "oni"
+        payload: Payload text as returned by `check_response`
+        output: "pandas", "arrow" or "numpy"
+        derived: True to add every derived column, False for only the raw
+                 columns, or a list of derived column names
+
+    Returns:
+        DataFrame, pyarrow.Table or dict of numpy arrays
+    """
+    check_output(output)
+    try:
+        parser = PARSERS[name]
+    except KeyError:
+        raise ValueError(f"No parser registered for source: {name}")
+    return parser(payload, output, derived=derived)
+
+
+@pd.api.extensions.register_dataframe_accessor("pysoi")
+class DerivedColumnsAccessor:
+    """
+    `frame.pysoi`: derived columns of a frame downloaded with `derived=False`.
+
+    Derived columns are computed from the full parse the frame came from and
+    then taken at the frame's rows, so moving windows such as ONI stay
+    correct on filtered frames.
+
+    Example:
+        oni = download_oni(derived=False)   # raw columns only
+        oni.pysoi["phase"]                  # computes ONI and phase, adds phase to oni
+    """
+
+    def __init__(self, frame):
+        self._frame = frame
+
+    def _parsed(self):
+        parsed = self._frame.attrs.get("pysoi_parse")
+        if parsed is None:
+            raise ValueError("This frame was not downloaded with derived=False, so there is "
+                             "no parse to derive columns from")
+        return parsed
+
+    @property
+    def source(self):
+        """Source the frame was parsed from."""
+        return self._parsed().parser.name
+
+    def available(self):
+        """Names of the derived columns registered for the frame's source."""
+        return list(DERIVED.get(self.source, {}))
+
+    def _positions(self, parsed):
+        """Rows of the full parse held by the frame, in frame order."""
+        raw = parsed.columns
+        n_rows = len(raw[next(iter(raw))])
+        index = self._frame.index
+        if not pd.api.types.is_integer_dtype(index.dtype) or (
+                len(index) and (index.min() < 0 or index.max() >= n_rows)):
+            raise ValueError("The frame's index no longer refers to rows of the download it came "
+                             "from; derive columns before changing the index")
+        positions = index.to_numpy()
+
+        # A reset index also looks like row numbers, so check the dates agree
+        if "Date" in self._frame.columns and "Date" in raw:
+            dates = self._frame["Date"]
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_localize(None)
+            if not np.array_equal(dates.to_numpy(), raw["Date"][positions]):
+                raise ValueError("The frame's rows no longer match the download it came from; "
+                                 "derive columns before changing the index")
+        return positions
+
+    def derive(self, *names):
+        """
+        Compute derived columns missing from the frame and add them in place.
+
+        Args:
+            *names: Derived column names (defaults to all of them)
+
+        Returns:
+            The frame
+        """
+        parsed = self._parsed()
+        derived = DERIVED.get(parsed.parser.name, {})
+        names = list(names) or list(derived)
+        unknown = [name for name in names if name not in derived]
+        if unknown:
+            raise ValueError(f"Invalid derived columns: {', '.join(unknown)}\n"
+                             f"Valid derived columns are: {', '.join(derived) or 'none'}")
+        missing = [name for name in names if name not in self._frame.columns]
+        if not missing:
+            return self._frame
+
+        positions = self._positions(parsed)
+        categories = parsed.parser.categories or {}
+        for name in missing:
+            # Computed once on the full parse and cached there for later calls
+            values = parsed.columns[name][positions]
+            column = pandas_column(values, categories.get(name), parsed.parser.tz)
+            if isinstance(column, pd.Series):
+                column = column.set_axis(self._frame.index)
+            else:
+                column = pd.Series(column, index=self._frame.index)
+            self._frame[name] = column
+        return self._frame
+
+    def __getitem__(self, name):
+        return self.derive(name)[name]
@@ -0,0 +1,330 @@
+"""Publication-aware polling of the sources with change callbacks."""
+
+import hashlib
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from . import utils
+from .parsers import parse_payload
+from .sources import SOURCES, get_source
+
+
+# Sources polled by default: every index except the per-level daily asymsam files
+DEFAULT_SOURCES = [name for name in SOURCES if not name.startswith("asymsam_daily_")]
+
+# Columns identifying a row, most specific first
+_KEY_COLUMNS = [("Lev", "Index", "Date"), ("Date",), ("Year", "Month")]
+
+
+def new_rows(frame, previous):
+    """
+    Rows of `frame` that were not in `previous`.
+
+    Rows are matched on their key columns (Date, or Year and Month, plus Lev
+    and Index for the asymsam tables), so revised values of existing rows
+    are not reported as new.
+
+    Args:
+        frame: Newly parsed DataFrame
+        previous: Previously parsed DataFrame, or None
+
+    Returns:
+        DataFrame with a fresh RangeIndex
+    """
+    if previous is None:
+        return frame.reset_index(drop=True)
+
+    for columns in _KEY_COLUMNS:
+        if all(column in frame.columns and column in previous.columns for column in columns):
+            keys = list(columns)
+            break
+    else:
+        raise ValueError("Frames have no key columns to match rows on")
+
+    old = previous[keys].drop_duplicates()
+    matched = frame[keys].merge(old, on=keys, how="left", indicator=True)["_merge"] == "both"
+    return frame[~matched.to_numpy()].reset_index(drop=True)
+
+
+class ChangeEvent:
+    """
+    A change detected in a source.
+
+    Attributes:
+        name: Source name, e.g. "oni"
+        frame: Newly parsed DataFrame
+        new_rows: Rows of `frame` that were not in the previous version
+                  (the whole frame on the first poll)
+        previous: Previous DataFrame, or None on the first poll
+        detected: Time the change was detected (UTC datetime)
+    """
+
+    def __init__(self, name, frame, new_rows, previous, detected):
+        self.name = name
+        self.frame = frame
+        self.new_rows = new_rows
+        self.previous = previous
+        self.detected = detected
+
+    def __repr__(self):
+        return f"ChangeEvent({self.name!r}, rows={len(self.frame)}, new_rows={len(self.new_rows)})"
+
+
+class _SourceState:
+    def __init__(self, name, interval, next_poll):
+        self.name = name
+        self.interval = interval
+        self.next_poll = next_poll
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.frame = None
+        self.last_change = None
+        self.error = None
+        self.polls = 0
+        self.changes = 0
+
+
+class Poller:
+    """
+    Poll sources with conditional requests at intervals that follow their
+    publication cadence, and notify subscribers when data changes.
+
+    Each poll sends If-None-Match/If-Modified-Since with the validators of
+    the last response, so an unchanged file costs a 304 and no body. Servers
+    that ignore validators are detected by hashing the payload.
+
+    Scheduling per source, with `cadence` from its Source definition:
+        - After a change the next poll is `expected_fraction * cadence`
+          later, since nothing new is expected before then.
+        - Polling then starts at `min_fraction * cadence` and the interval
+          grows by `backoff` after every unchanged poll or error, up to
+          `max_fraction * cadence`.
+
+    Args:
+        names: Source names to poll (defaults to DEFAULT_SOURCES)
+        min_fraction: Shortest poll interval as a fraction of the cadence
+        max_fraction: Longest poll interval as a fraction of the cadence
+        expected_fraction: Quiet period after a change as a fraction of the cadence
+        backoff: Factor the interval grows by after each unchanged poll
+        max_workers: Number of sources polled concurrently
+        clock: Function returning the current time in seconds
+    """
+
+    def __init__(self, names=None, min_fraction=1 / 30, max_fraction=1 / 2, expected_fraction=0.8,
+                 backoff=2.0, max_workers=4, clock=time.time):
+        names = DEFAULT_SOURCES if names is None else list(names)
+        self.sources = {name: get_source(name) for name in names}
+        self.min_fraction = min_fraction
+        self.max_fraction = max_fraction
+        self.expected_fraction = expected_fraction
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.clock = clock
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        now = clock()
+        self._states = {name: _SourceState(name, self._min_interval(name), now) for name in names}
+
+    def _min_interval(self, name):
+        return self.sources[name].cadence * self.min_fraction
+
+    def _max_interval(self, name):
+        return self.sources[name].cadence * self.max_fraction
+
+    def subscribe(self, callback, names=None):
+        """
+        Register a callback fired with a ChangeEvent whenever a source changes.
+
+        Args:
+            callback: Function taking a ChangeEvent
+            names: Source names the callback is interested in (defaults to all)
+
+        Returns:
+            The callback, so this can be used as a decorator
+        """
+        with self._lock:
+            self._callbacks.append((callback, None if names is None else set(names)))
+        return callback
+
+    def unsubscribe(self, callback):
+        """Remove a registered callback."""
+        with self._lock:
+            self._callbacks = [entry for entry in self._callbacks if entry[0] is not callback]
+
+    def state(self, name):
+        """
+        Return the polling state of a source.
+
+        Returns:
+            Dict with next_poll, interval, last_change, polls, changes, error,
+            etag and last_modified
+        """
+        state = self._states[name]
+        with self._lock:
+            return {
+                "next_poll": state.next_poll,
+                "interval": state.interval,
+                "last_change": state.last_change,
+                "polls": state.polls,
+                "changes": state.changes,
+                "error": state.error,
+                "etag": state.etag,
+                "last_modified": state.last_modified,
+            }
+
+    def frame(self, name):
+        """Return the last parsed frame of a source, or None."""
+        return self._states[name].frame
+
+    def due(self):
+        """Return the names of the sources due for a poll."""
+        now = self.clock()
+        return [name for name, state in self._states.items() if state.next_poll <= now]
+
+    def seconds_until_next(self):
+        """Seconds until the next source is due (0 if one is due now)."""
+        now = self.clock()
+        return max(0.0, min(state.next_poll for state in self._states.values()) - now)
+
+    def _request(self, state, url):
+        headers = {}
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+        try:
+            return utils.fetch(url, headers=headers)
+        except requests.ConnectionError:
+            raise ConnectionError("A working internet connection is required to download and import the climate indices.")
+
+    def _unchanged(self, state, now):
+        state.interval = min(state.interval * self.backoff, self._max_interval(state.name))
+        state.next_poll = now + state.interval
+
+    def poll(self, name):
+        """
+        Poll one source now.
+
+        Args:
+            name: Source name
+
+        Returns:
+            ChangeEvent if the data changed, otherwise None
+        """
+        state = self._states[name]
+        url = self.sources[name].resolve()
+        # The request and parse run unlocked; state changes are made under the lock
+        with self._lock:
+            state.polls += 1
+
+        try:
+            response = self._request(state, url)
+            if response.status_code == 304:
+                with self._lock:
+                    state.error = None
+                    self._unchanged(state, self.clock())
+                return None
+            if response.status_code != 200:
+                raise ValueError(f"Non successful http request. Target server returning a {response.status_code} error code")
+            if "shutdown" in response.url:
+                raise RuntimeError("Data source is currently unavailable due to a US government shutdown")
+
+            digest = hashlib.sha256(response.content).hexdigest()
+            if digest == state.digest:
+                # The server ignored our validators but the content is the same
+                with self._lock:
+                    state.etag = response.headers.get("ETag")
+                    state.last_modified = response.headers.get("Last-Modified")
+                    state.error = None
+                    self._unchanged(state, self.clock())
+                return None
+
+            frame = parse_payload(name, response.text)
+        except Exception as e:
+            with self._lock:
+                state.error = str(e)
+                self._unchanged(state, self.clock())
+            return None
+
+        now = self.clock()
+        previous = state.frame
+        event = ChangeEvent(name, frame, new_rows(frame, previous), previous, datetime.now(timezone.utc))
+        with self._lock:
+            # Only keep the validators once the payload has been parsed
+            state.etag = response.headers.get("ETag")
+            state.last_modified = response.headers.get("Last-Modified")
+            state.digest = digest
+            state.frame = frame
+            state.error = None
+            state.changes += 1
+            state.interval = self._min_interval(name)
+            if previous is None:
+                # Where we are in the publication cycle is unknown, so keep polling
+                state.next_poll = now + state.interval
+            else:
+                state.last_change = now
+                state.next_poll = now + self.sources[name].cadence * self.expected_fraction
+
+        self._notify(event)
+        return event
+
+    def _notify(self, event):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback, names in callbacks:
+            if names is not None and event.name not in names:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                # One failing subscriber must not stop the others or the poll
+                warnings.warn(f"Error in callback for {event.name}: {e}", RuntimeWarning)
+
+    def run_pending(self):
+        """
+        Poll every source that is due.
+
+        Returns:
+            List of ChangeEvents for the sources that changed
+        """
+        names = self.due()
+        if not names:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            events = list(executor.map(utils.carry_transport(self.poll), names))
+        return [event for event in events if event is not None]
+
+    def run(self, max_sleep=3600):
+        """
+        Poll due sources until `stop` is called.
+
+        Args:
+            max_sleep: Longest wait between checks for due sources, in seconds
+        """
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(min(self.seconds_until_next(), max_sleep))
+
+    def start(self, max_sleep=3600):
+        """Run the poller in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, kwargs={"max_sleep": max_sleep}, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,243 @@
+"""Per-host rate limiting and concurrency caps for the source servers."""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+# Conservative defaults. The CPC server serves five of the indices and is the
+# one that throttles aggressively, so it gets the tightest budget.
+DEFAULT_LIMITS = {
+    "www.cpc.ncep.noaa.gov": {"rate": 2.0, "burst": 2, "max_in_flight": 2},
+}
+FALLBACK_LIMITS = {"rate": 5.0, "burst": 5, "max_in_flight": 4}
+
+# Status codes that signal the server wants us to slow down
+THROTTLE_STATUS = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a Retry-After header value into a number of seconds.
+
+    Args:
+        value: Header value, either delta-seconds or an HTTP date
+        now: Current time as an aware datetime (defaults to utcnow)
+
+    Returns:
+        Seconds to wait as a float, or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `burst`. Each request
+    takes one token; when the bucket is empty the caller sleeps until a token
+    is available.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def block(self, seconds):
+        """Stop handing out tokens for `seconds` (used for Retry-After)."""
+        with self._lock:
+            until = self._clock() + seconds
+            if until > self._updated:
+                # One request may go as soon as the pause ends, the rest queue
+                self._updated = until
+                self._tokens = 1.0
+
+    def reserve(self):
+        """
+        Take a token, returning how long the caller must wait before using it.
+
+        Returns:
+            Seconds to wait (0.0 if a token was immediately available)
+        """
+        with self._lock:
+            now = self._clock()
+            paused = max(0.0, self._updated - now)
+            if not paused:
+                elapsed = now - self._updated
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+
+            # Going negative queues the caller behind earlier reservations
+            self._tokens -= 1.0
+            return paused + max(0.0, -self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            self._sleep(delay)
+
+
+class HostLimiter:
+    """Token bucket plus an in-flight cap for a single host."""
+
+    def __init__(self, rate, burst, max_in_flight, clock=time.monotonic, sleep=time.sleep):
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self.bucket.acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+class RequestScheduler:
+    """
+    Transport-level scheduler shared by every downloader.
+
+    Each host gets its own token bucket and in-flight cap. Throttling responses
+    (429/503) with a Retry-After header pause the whole host rather than just
+    the request that received them, so concurrent callers back off together.
+    """
+
+    def __init__(self, limits=None, default=None, max_retries=3, max_retry_after=300.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        self._limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._default = dict(FALLBACK_LIMITS if default is None else default)
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self._clock = clock
+        self._sleep = sleep
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host, rate=None, burst=None, max_in_flight=None):
+        """
+        Set the limits for a host. Unspecified values keep their current setting.
+
+        Args:
+            host: Host name, e.g. "www.cpc.ncep.noaa.gov"
+            rate: Sustained requests per second
+            burst: Maximum number of requests allowed back to back
+            max_in_flight: Maximum number of concurrent requests
+        """
+        with self._lock:
+            limits = dict(self._limits.get(host, self._default))
+            for key, value in (("rate", rate), ("burst", burst), ("max_in_flight", max_in_flight)):
+                if value is not None:
+                    limits[key] = value
+            self._limits[host] = limits
+            # Rebuild lazily on next use
+            self._hosts.pop(host, None)
+
+    def limits(self, host):
+        """Return the limits that apply to `host`."""
+        with self._lock:
+            return dict(self._limits.get(host, self._default))
+
+    def limiter(self, host):
+        """Return the HostLimiter for `host`, creating it on first use."""
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limits = self._limits.get(host, self._default)
+                limiter = HostLimiter(limits["rate"], limits["burst"], limits["max_in_flight"],
+                                      clock=self._clock, sleep=self._sleep)
+                self._hosts[host] = limiter
+            return limiter
+
+    def request(self, session, method, url, host=None, on_admit=None, **kwargs):
+        """
+        Issue a request through the per-host limiter.
+
+        Args:
+            session: requests.Session (or anything with a compatible `request` method)
+            method: HTTP method
+            url: URL to request
+            host: Host whose limits apply (defaults to the host of `url`).
+                  Lets a request keep its origin's limits when it is sent
+                  somewhere else, e.g. to a local replay server.
+            on_admit: Called with no arguments each time the limiter lets an
+                      attempt through, so callers can time the request
+                      itself rather than the wait in the queue
+            **kwargs: Passed through to `session.request`
+
+        Returns:
+            The final response. A throttling response is returned as-is once
+            retries are exhausted so the caller can report the status code.
+        """
+        limiter = self.limiter(host or urlsplit(url).hostname or "")
+
+        for attempt in range(self.max_retries + 1):
+            with limiter:
+                if on_admit is not None:
+                    on_admit()
+                response = session.request(method, url, **kwargs)
+
+            if response.status_code not in THROTTLE_STATUS or attempt == self.max_retries:
+                return response
+
+            wait = parse_retry_after(response.headers.get("Retry-After"))
+            if wait is None:
+                # No hint from the server: exponential backoff from one second
+                wait = 2.0 ** attempt
+            wait = min(wait, self.max_retry_after)
+            limiter.bucket.block(wait)
+            response.close()
+
+        return response
+
+
+_scheduler = RequestScheduler()
+
+
+def get_scheduler():
+    """Return the process-wide RequestScheduler."""
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replace the process-wide RequestScheduler, returning the previous one."""
+    global _scheduler
+    previous = _scheduler
+    _scheduler = scheduler
+    return previous
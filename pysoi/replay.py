@@ -0,0 +1,350 @@
+"""Local replay server and latency injection for network benchmarks."""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from . import utils
+from .sources import url_path
+from .transport import _not_modified, sync
+
+
+def record(directory, names=None, max_workers=8):
+    """
+    Record a copy of every source into a directory for replaying.
+
+    Files are laid out as "<directory>/<host>/<path>" (see
+    `pysoi.sources.url_path`), the same layout `pysoi.transport.sync`
+    mirrors to, which this uses without revalidation.
+
+    Args:
+        directory: Directory to write the recordings to
+        names: Source names to record (defaults to every source, including
+               each asymsam level)
+        max_workers: Maximum number of concurrent downloads
+
+    Returns:
+        List of the recorded file paths
+    """
+    return list(sync(directory, names, max_workers=max_workers, revalidate=False).values())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection pooling on the client side is measurable
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.replay._handle(self, send_body=True)
+
+    def do_HEAD(self):
+        self.server.replay._handle(self, send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """
+    Local HTTP stand-in for the source servers.
+
+    Serves files recorded with `record` with configurable latency, bandwidth
+    and error injection, and implements the parts of HTTP the download path
+    relies on: ETag/Last-Modified validators with 304 responses and single
+    byte ranges with If-Range.
+
+    Args:
+        directory: Directory of recordings laid out as "<host>/<path>"
+        latency: Seconds to wait before answering each request
+        jitter: Extra random delay of up to this many seconds
+        bandwidth: Maximum bytes per second per response (None for unlimited)
+        error_rate: Probability of answering with `error_status` instead
+        error_status: Status code used for injected errors
+        retry_after: Retry-After value sent with injected errors (None to omit)
+        seed: Seed for the random jitter and error injection
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+    """
+
+    def __init__(self, directory, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0,
+                 error_status=503, retry_after=None, seed=None, host="127.0.0.1", port=0):
+        self.directory = os.path.abspath(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.replay = self
+        self._thread = None
+        self.reset_stats()
+
+    @property
+    def url(self):
+        """Base URL of the running server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        """Zero the request, byte and status counters."""
+        with self._lock:
+            self.stats = {"requests": 0, "bytes": 0, "status": {}}
+
+    def start(self):
+        """Start serving in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and release its socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _load(self, path):
+        """Return (content, etag, mtime) for a recorded file, cached by mtime."""
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[2] == mtime:
+                return cached
+        with open(path, "rb") as f:
+            content = f.read()
+        entry = (content, '"' + hashlib.sha1(content).hexdigest()[:16] + '"', mtime)
+        with self._lock:
+            self._files[path] = entry
+        return entry
+
+    def _count(self, status, sent):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += sent
+            self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+
+    def _send(self, handler, status, headers, body, send_body):
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+
+        sent = 0
+        if send_body and body:
+            chunk_size = 16384
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                handler.wfile.write(chunk)
+                sent += len(chunk)
+                if self.bandwidth:
+                    time.sleep(len(chunk) / self.bandwidth)
+        self._count(status, sent)
+
+    def _delay(self):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if self.latency or jitter:
+            time.sleep(self.latency + jitter)
+        return fail
+
+    def _handle(self, handler, send_body):
+        fail = self._delay()
+        if fail:
+            headers = {}
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            self._send(handler, self.error_status, headers, b"", send_body)
+            return
+
+        relative = urlsplit(handler.path).path.lstrip("/")
+        path = os.path.normpath(os.path.join(self.directory, *relative.split("/")))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            self._send(handler, 404, {}, b"", send_body)
+            return
+
+        content, etag, mtime = self._load(path)
+        last_modified = formatdate(mtime, usegmt=True)
+        headers = {"ETag": etag, "Last-Modified": last_modified, "Accept-Ranges": "bytes"}
+
+        if _not_modified(handler.headers, etag, mtime):
+            self._send(handler, 304, headers, b"", send_body)
+            return
+
+        byte_range = self._byte_range(handler.headers, etag, last_modified, len(content))
+        if byte_range == "unsatisfiable":
+            headers["Content-Range"] = f"bytes */{len(content)}"
+            self._send(handler, 416, headers, b"", send_body)
+        elif byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            self._send(handler, 206, headers, content[start:end + 1], send_body)
+        else:
+            self._send(handler, 200, headers, content, send_body)
+
+    @staticmethod
+    def _byte_range(request_headers, etag, last_modified, length):
+        """Parse a single-range Range header, honouring If-Range."""
+        range_header = request_headers.get("Range")
+        if not range_header or not range_header.startswith("bytes="):
+            return None
+
+        if_range = request_headers.get("If-Range")
+        if if_range is not None and if_range not in (etag, last_modified):
+            return None
+
+        spec = range_header[len("bytes="):].strip()
+        if "," in spec or "-" not in spec:
+            return None
+        first, last = spec.split("-", 1)
+        try:
+            if first == "":
+                # Suffix range: the last N bytes
+                start = max(0, length - int(last))
+                end = length - 1
+            else:
+                start = int(first)
+                end = min(int(last), length - 1) if last else length - 1
+        except ValueError:
+            return None
+
+        if start >= length or start > end:
+            return "unsatisfiable"
+        return start, end
+
+
+@contextlib.contextmanager
+def redirect(server):
+    """
+    Send every download to a ReplayServer for the duration of the block.
+
+    Per-host rate limits keep applying to the original hosts, so the
+    scheduler behaves as it would against the real servers.
+
+    Args:
+        server: Running ReplayServer (or anything with a `url` attribute)
+    """
+    def rewrite(url):
+        query = urlsplit(url).query
+        return f"{server.url}/{url_path(url)}" + (f"?{query}" if query else "")
+
+    previous = utils.set_url_rewriter(rewrite)
+    try:
+        yield server
+    finally:
+        utils.set_url_rewriter(previous)
+
+
+def benchmark_cases():
+    """
+    Return the end-to-end cases measured by `benchmark`.
+
+    Returns:
+        Dict of case name to a callable performing the download
+    """
+    # Imported here so the server can be used without importing every downloader
+    import pysoi
+
+    cases = {name: getattr(pysoi, name) for name in [
+        "download_oni", "download_soi", "download_npgo", "download_nao", "download_ao",
+        "download_aao", "download_mei", "download_pdo", "download_dmi",
+        "download_asymsam_monthly",
+    ]}
+    cases['download_enso("all")'] = lambda: pysoi.download_enso("all")
+    cases['download_asymsam_daily("all")'] = lambda: pysoi.download_asymsam_daily("all")
+    return cases
+
+
+def benchmark(directory, repeat=3, cases=None, **server_options):
+    """
+    Measure end-to-end download throughput against a local ReplayServer.
+
+    Args:
+        directory: Directory of recordings made with `record`
+        repeat: Number of timed runs per case
+        cases: Case names to run (defaults to all of `benchmark_cases()`)
+        **server_options: Passed to ReplayServer (latency, bandwidth, ...)
+
+    Returns:
+        DataFrame with one row per case: runs, mean/min/max seconds, calls per
+        second, and the requests and bytes served per run
+    """
+    all_cases = benchmark_cases()
+    names = list(all_cases) if cases is None else list(cases)
+
+    rows = []
+    with ReplayServer(directory, **server_options) as server, redirect(server):
+        for name in names:
+            timings = []
+            server.reset_stats()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                # Silence per-level progress output from the asymsam downloader
+                with contextlib.redirect_stdout(io.StringIO()):
+                    all_cases[name]()
+                timings.append(time.perf_counter() - start)
+
+            mean = sum(timings) / len(timings)
+            rows.append({
+                "case": name,
+                "runs": repeat,
+                "mean_s": mean,
+                "min_s": min(timings),
+                "max_s": max(timings),
+                "calls_per_s": 1.0 / mean if mean > 0 else float("inf"),
+                "requests_per_run": server.stats["requests"] / repeat,
+                "bytes_per_run": server.stats["bytes"] / repeat,
+            })
+
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    """Command line entry point: `python -m pysoi.replay DIRECTORY [options]`."""
+    parser = argparse.ArgumentParser(description="Benchmark pysoi downloads against a local replay server.")
+    parser.add_argument("directory", help="Directory of recorded sources")
+    parser.add_argument("--record", action="store_true", help="Record every source into DIRECTORY first")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency of up to this many seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected error")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for jitter and error injection")
+    parser.add_argument("--case", action="append", dest="cases", help="Case to run (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record(args.directory)
+
+    result = benchmark(args.directory, repeat=args.repeat, cases=args.cases, latency=args.latency,
+                       jitter=args.jitter, bandwidth=args.bandwidth, error_rate=args.error_rate,
+                       retry_after=0, seed=args.seed)
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
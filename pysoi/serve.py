@@ -0,0 +1,442 @@
+"""
+Local HTTP server that keeps the indices parsed in memory.
+
+Every monthly index is served, plus the ASYMSAM monthly indices and the
+daily ASYMSAM indices at the 700 hPa level (the default level of
+`download_asymsam_daily`).
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from .download_asymsam import download_asymsam_monthly, download_asymsam_daily
+from .store import MONTHLY_INDICES, month_keys
+from .utils import frame_to_output, carry_transport
+
+
+# Index name used in URLs -> downloader
+SERVED_INDICES = {name.lower(): downloader for name, (downloader, _, _) in MONTHLY_INDICES.items()}
+SERVED_INDICES["asymsam_monthly"] = download_asymsam_monthly
+SERVED_INDICES["asymsam_daily"] = download_asymsam_daily
+
+# Indices whose date ranges are resolved to the day rather than the month
+DAILY_INDICES = {"asymsam_daily"}
+
+SERVE_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Seconds between refreshes of every index
+DEFAULT_REFRESH_INTERVAL = 6 * 3600
+
+# Smaller bodies are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# Rendered responses kept per index (format and date range combinations)
+_BODY_CACHE_SIZE = 64
+
+
+def parse_month(value, unit="M"):
+    """
+    Parse a date query parameter into a month key (months since 1970-01).
+
+    Args:
+        value: "YYYY", "YYYY-MM" or "YYYY-MM-DD"
+        unit: "M" for a month key, or "D" for a day key (days since 1970-01-01)
+
+    Returns:
+        int month (or day) key
+    """
+    try:
+        return int(np.datetime64(value).astype(f"datetime64[{unit}]").astype(np.int64))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}. Use YYYY, YYYY-MM or YYYY-MM-DD.")
+
+
+def date_keys(frame, unit="M"):
+    """
+    Return the dates of an index frame as integer keys.
+
+    Args:
+        frame: DataFrame returned by a download function
+        unit: "M" for months since 1970-01, or "D" for days since 1970-01-01
+              (the frame needs a Date column)
+
+    Returns:
+        numpy.ndarray of int64 keys
+    """
+    if unit == "M":
+        return month_keys(frame)
+    return frame["Date"].to_numpy().astype(f"datetime64[{unit}]").astype(np.int64)
+
+
+def filter_months(frame, start=None, end=None, unit="M"):
+    """
+    Select the rows of an index frame within an inclusive date range.
+
+    Args:
+        frame: DataFrame returned by a download function
+        start: First month ("YYYY", "YYYY-MM" or "YYYY-MM-DD"), or None
+        end: Last month, or None
+        unit: "M" to compare whole months, or "D" to compare days (daily
+              frames, where "YYYY" and "YYYY-MM" mean their first day)
+
+    Returns:
+        DataFrame with a fresh RangeIndex
+    """
+    if start is None and end is None:
+        return frame
+    keys = date_keys(frame, unit)
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= keys >= parse_month(start, unit)
+    if end is not None:
+        mask &= keys <= parse_month(end, unit)
+    return frame[mask].reset_index(drop=True)
+
+
+def encode_frame(frame, fmt):
+    """
+    Serialize a frame for an HTTP response.
+
+    Args:
+        frame: DataFrame
+        fmt: "json" (list of records), "csv" or "arrow" (IPC stream)
+
+    Returns:
+        bytes
+    """
+    if fmt == "json":
+        return frame.to_json(orient="records", date_format="iso").encode("utf-8")
+    if fmt == "csv":
+        return frame.to_csv(index=False).encode("utf-8")
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        table = frame_to_output(frame, "arrow")
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    raise ValueError(f"Invalid format: {fmt}. Valid formats are: {', '.join(SERVE_FORMATS)}")
+
+
+class _Entry:
+    """An index frame plus the responses already rendered from it."""
+
+    def __init__(self, frame, updated, unit="M"):
+        self.frame = frame
+        self.updated = updated
+        self.unit = unit
+        self.bodies = OrderedDict()
+        self.lock = threading.Lock()
+
+    def body(self, fmt, start, end):
+        """Return (body, etag, gzipped body or None) for a query, rendering once."""
+        key = (fmt, start, end)
+        with self.lock:
+            if key in self.bodies:
+                self.bodies.move_to_end(key)
+                return self.bodies[key]
+
+        body = encode_frame(filter_months(self.frame, start, end, self.unit), fmt)
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        rendered = [body, etag, None]
+        with self.lock:
+            self.bodies[key] = rendered
+            while len(self.bodies) > _BODY_CACHE_SIZE:
+                self.bodies.popitem(last=False)
+        return rendered
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.index_server._handle(self, send_body=True)
+
+    def do_HEAD(self):
+        self.server.index_server._handle(self, send_body=False)
+
+    def log_message(self, format, *args):
+        if self.server.index_server.verbose:
+            super().log_message(format, *args)
+
+
+class IndexServer:
+    """
+    HTTP server answering index queries from frames held in memory.
+
+    Every index is downloaded once through the regular download functions
+    and refreshed on a schedule in the background. Requests never touch the
+    source servers: they are answered from the in-memory frame, with the
+    rendered body cached per format and date range.
+
+    Endpoints:
+        GET /                  JSON summary of every index
+        GET /<index>[.<fmt>]   Index data; fmt is json (default), csv or arrow
+
+    Query parameters:
+        start, end: Inclusive date range ("YYYY", "YYYY-MM" or "YYYY-MM-DD"),
+                    matched by month, or by day for asymsam_daily
+        format: Alternative to the path suffix
+
+    Responses carry an ETag (If-None-Match answers 304) and are gzipped
+    when the client accepts it.
+
+    Args:
+        names: Index names to serve, e.g. ["oni", "soi", "asymsam_daily"]
+               (defaults to all)
+        refresh_interval: Seconds between refreshes (None to never refresh)
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        max_workers: Number of indices downloaded concurrently on refresh
+        gzip_min_size: Smallest body, in bytes, that is compressed
+        verbose: If True, log every request to stderr
+    """
+
+    def __init__(self, names=None, refresh_interval=DEFAULT_REFRESH_INTERVAL, host="127.0.0.1",
+                 port=8000, max_workers=4, gzip_min_size=GZIP_MIN_SIZE, verbose=False):
+        names = list(SERVED_INDICES) if names is None else [name.lower() for name in names]
+        for name in names:
+            if name not in SERVED_INDICES:
+                raise ValueError(f"Invalid index: {name}. Valid indices are: {', '.join(SERVED_INDICES)}")
+        self.names = names
+        self.refresh_interval = refresh_interval
+        self.max_workers = max_workers
+        self.gzip_min_size = gzip_min_size
+        self.verbose = verbose
+        self._entries = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.index_server = self
+
+    @property
+    def url(self):
+        """Base URL of the server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_frame(self, name, frame):
+        """Replace the frame served for `name`."""
+        entry = _Entry(frame, datetime.now(timezone.utc), "D" if name in DAILY_INDICES else "M")
+        with self._lock:
+            self._entries[name] = entry
+            self._errors.pop(name, None)
+
+    def refresh(self, names=None):
+        """
+        Download indices and swap them in. A failed download keeps the
+        previous frame and is reported on the summary endpoint.
+
+        Args:
+            names: Index names to refresh (defaults to every served index)
+
+        Returns:
+            Dict of index name to error message for failed downloads
+        """
+        names = self.names if names is None else names
+
+        def _refresh(name):
+            try:
+                frame = SERVED_INDICES[name]()
+            except Exception as e:
+                return name, str(e)
+            if frame is None:
+                return name, "download returned no data"
+            self.set_frame(name, frame)
+            return name, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(executor.map(carry_transport(_refresh), names))
+
+        errors = {name: error for name, error in results.items() if error is not None}
+        with self._lock:
+            self._errors.update(errors)
+        return errors
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self, refresh=True):
+        """
+        Start serving in background threads.
+
+        Args:
+            refresh: If True, download every index before returning
+        """
+        if refresh:
+            self.refresh()
+        self._stop.clear()
+        if self.refresh_interval and self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and refreshing and release the socket."""
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        # A server already started, e.g. with start(refresh=False), is used as is
+        if self._thread is not None:
+            return self
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def summary(self):
+        """Return the per-index status reported by the "/" endpoint."""
+        with self._lock:
+            entries = dict(self._entries)
+            errors = dict(self._errors)
+
+        summary = {}
+        for name in self.names:
+            entry = entries.get(name)
+            status = {"rows": None, "first": None, "last": None, "updated": None, "error": errors.get(name)}
+            if entry is not None and len(entry.frame):
+                keys = date_keys(entry.frame, entry.unit)
+                status.update({
+                    "rows": len(entry.frame),
+                    "first": str(np.datetime64(int(keys.min()), entry.unit)),
+                    "last": str(np.datetime64(int(keys.max()), entry.unit)),
+                    "updated": entry.updated.isoformat(),
+                })
+            summary[name] = status
+        return summary
+
+    def _send(self, handler, status, headers, body, send_body):
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if send_body and body:
+            handler.wfile.write(body)
+
+    def _error(self, handler, status, message, send_body):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self._send(handler, status, {"Content-Type": SERVE_FORMATS["json"]}, body, send_body)
+
+    def _handle(self, handler, send_body):
+        parts = urlsplit(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        path = parts.path.strip("/")
+
+        if path == "":
+            body = json.dumps({"indices": self.summary()}).encode("utf-8")
+            self._send(handler, 200, {"Content-Type": SERVE_FORMATS["json"], "Cache-Control": "no-cache"},
+                       body, send_body)
+            return
+
+        name, _, fmt = path.partition(".")
+        fmt = query.get("format", fmt or "json")
+        if name not in self.names:
+            self._error(handler, 404, f"Unknown index: {name}", send_body)
+            return
+        if fmt not in SERVE_FORMATS:
+            self._error(handler, 400, f"Invalid format: {fmt}. Valid formats are: {', '.join(SERVE_FORMATS)}",
+                        send_body)
+            return
+
+        with self._lock:
+            entry = self._entries.get(name)
+            error = self._errors.get(name)
+        if entry is None:
+            self._error(handler, 503, error or f"{name} has not been downloaded yet", send_body)
+            return
+
+        try:
+            rendered = entry.body(fmt, query.get("start"), query.get("end"))
+        except ImportError:
+            self._error(handler, 501, "Arrow output requires pyarrow to be installed", send_body)
+            return
+        except ValueError as e:
+            self._error(handler, 400, str(e), send_body)
+            return
+
+        body, etag, gzipped = rendered
+        headers = {
+            "Content-Type": SERVE_FORMATS[fmt],
+            "Cache-Control": "no-cache",
+            "Last-Modified": formatdate(entry.updated.timestamp(), usegmt=True),
+            "Vary": "Accept-Encoding",
+        }
+
+        use_gzip = len(body) >= self.gzip_min_size and "gzip" in handler.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            if gzipped is None:
+                gzipped = rendered[2] = gzip.compress(body, compresslevel=6)
+            body = gzipped
+            # A distinct validator for the compressed representation
+            etag = etag[:-1] + '-gz"'
+            headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = etag
+
+        if_none_match = handler.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            if etag in tags or "*" in tags:
+                self._send(handler, 304, headers, b"", send_body)
+                return
+
+        self._send(handler, 200, headers, body, send_body)
+
+    def serve_forever(self):
+        """Download every index, then serve until interrupted."""
+        self.start()
+        try:
+            self._stop.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def serve(names=None, host="127.0.0.1", port=8000, refresh_interval=DEFAULT_REFRESH_INTERVAL, verbose=True):
+    """
+    Serve the indices over HTTP until interrupted.
+
+    Args:
+        names: Index names to serve (defaults to all)
+        host: Interface to listen on
+        port: Port to listen on
+        refresh_interval: Seconds between refreshes (None to never refresh)
+        verbose: If True, log every request to stderr
+    """
+    server = IndexServer(names, refresh_interval=refresh_interval, host=host, port=port, verbose=verbose)
+    print(f"Serving {', '.join(server.names)} on {server.url}")
+    server.serve_forever()
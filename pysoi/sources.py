@@ -0,0 +1,146 @@
+"""Definitions of the remote sources the download functions read from."""
+
+from datetime import datetime
+from urllib.parse import urlsplit
+
+
+# Typical publication cadences in seconds
+DAILY = 24 * 3600
+MONTHLY = 30 * DAILY
+
+
+class Source:
+    """
+    A remote file one of the download functions reads.
+
+    Attributes:
+        name: Short name used throughout the package, e.g. "oni"
+        url: URL of the file. May contain a "{today}" placeholder which is
+             filled with the current date (YYYY-MM-DD) when resolved.
+        cadence: Typical number of seconds between updates of the file
+        mirrors: Other URLs serving the same file, tried when `url` is slow
+    """
+
+    def __init__(self, name, url, cadence=MONTHLY, mirrors=()):
+        self.name = name
+        self.url = url
+        self.cadence = cadence
+        self.mirrors = list(mirrors)
+
+    def __repr__(self):
+        return f"Source({self.name!r}, {self.url!r}, cadence={self.cadence}, mirrors={self.mirrors!r})"
+
+    def resolve(self, today=None):
+        """
+        Return the URL to request.
+
+        Args:
+            today: Date used for the "{today}" placeholder (defaults to now)
+
+        Returns:
+            URL string
+        """
+        return self._fill(self.url, today)
+
+    def resolve_all(self, today=None):
+        """Return the URL followed by the URLs of every mirror."""
+        return [self._fill(url, today) for url in [self.url] + self.mirrors]
+
+    @staticmethod
+    def _fill(url, today):
+        if "{today}" not in url:
+            return url
+        today = today or datetime.now()
+        return url.format(today=today.strftime("%Y-%m-%d"))
+
+
+ASYMSAM_LEVELS = [1, 2, 3, 5, 7, 10, 20, 30, 50, 70, 100, 125, 150,
+                  175, 200, 225, 250, 300, 350, 400, 450, 500, 550, 600,
+                  650, 700, 750, 775, 800, 825, 850, 875, 900, 925, 950,
+                  975, 1000]
+
+ASYMSAM_INDICES = ['sam', 'ssam', 'asam']
+
+_ASYMSAM_ROOT = "https://www.cima.fcen.uba.ar/~elio.campitelli/asymsam/data/"
+
+_SOURCES = [
+    Source("oni", "http://www.cpc.ncep.noaa.gov/products/analysis_monitoring/ensostuff/detrend.nino34.ascii.txt"),
+    Source("soi", "https://www.cpc.ncep.noaa.gov/data/indices/soi"),
+    Source("npgo", "http://www.oces.us/npgo/data/NPGO.txt"),
+    Source("nao", "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/norm.nao.monthly.b5001.current.ascii.table"),
+    Source("ao", "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/monthly.ao.index.b50.current.ascii.table"),
+    Source("aao", "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/aao/monthly.aao.index.b79.current.ascii"),
+    Source("mei", "https://psl.noaa.gov/enso/mei/data/meiv2.data",
+           mirrors=["https://www.esrl.noaa.gov/psd/enso/mei/data/meiv2.data"]),
+    Source("pdo", "https://oceanview.pfeg.noaa.gov/erddap/tabledap/cciea_OC_PDO.csv?time%2CPDO&time%3E=1900-01-01&time%3C={today}"),
+    Source("dmi", "https://psl.noaa.gov/gcos_wgsp/Timeseries/Data/dmi.had.long.data"),
+    Source("asymsam_monthly", f"{_ASYMSAM_ROOT}sam_monthly.csv", cadence=DAILY),
+] + [
+    Source(f"asymsam_daily_{level}", f"{_ASYMSAM_ROOT}sam_level/sam_{level}hPa.csv", cadence=DAILY)
+    for level in ASYMSAM_LEVELS
+]
+
+SOURCES = {source.name: source for source in _SOURCES}
+
+
+def get_source(name):
+    """
+    Look up a source by name.
+
+    Args:
+        name: Source name, e.g. "oni" or "asymsam_daily_700"
+
+    Returns:
+        Source
+    """
+    try:
+        return SOURCES[name]
+    except KeyError:
+        raise ValueError(f"Unknown source: {name}. Valid sources are: {', '.join(SOURCES)}")
+
+
+def source_url(name, today=None):
+    """Return the URL to request for the named source."""
+    return get_source(name).resolve(today)
+
+
+def mirror_urls(url, today=None):
+    """
+    Return `url` followed by the other URLs serving the same file.
+
+    Args:
+        url: URL of a source or of one of its mirrors
+        today: Date used for "{today}" placeholders
+
+    Returns:
+        List of URLs, just `[url]` if the URL has no mirrors
+    """
+    for source in SOURCES.values():
+        if source.mirrors:
+            urls = source.resolve_all(today)
+            if url in urls:
+                return [url] + [other for other in urls if other != url]
+    return [url]
+
+
+def all_urls(today=None):
+    """Return the URL of every source, including each asymsam level."""
+    return [source.resolve(today) for source in SOURCES.values()]
+
+
+def url_path(url):
+    """
+    Relative path under which a URL is recorded or mirrored: "<host>/<path>".
+
+    The query string is not part of the path, so sources whose query changes
+    from day to day (PDO) map onto a single file.
+
+    Args:
+        url: Source URL
+
+    Returns:
+        Relative path using forward slashes
+    """
+    parts = urlsplit(url)
+    path = parts.path.lstrip("/") or "index"
+    return f"{parts.hostname}/{path}"
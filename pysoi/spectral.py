@@ -0,0 +1,378 @@
+"""Batched spectral and wavelet analysis of aligned index series."""
+
+import functools
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .features import FeatureBuilder
+
+
+DETREND_METHODS = [None, "constant", "linear"]
+
+# Bytes of complex wavelet coefficients held at once per chunk of series
+DEFAULT_CHUNK_BYTES = 256 * 2 ** 20
+
+
+def chi2_quantile(level, dof):
+    """
+    Quantile of the chi-squared distribution.
+
+    Exact for 2 degrees of freedom, otherwise the Wilson-Hilferty
+    approximation (within about 1% for dof >= 2), so no SciPy is needed.
+
+    Args:
+        level: Probability, e.g. 0.95
+        dof: Degrees of freedom (scalar or array)
+
+    Returns:
+        Quantile (same shape as `dof`)
+    """
+    dof = np.asarray(dof, dtype=np.float64)
+    z = NormalDist().inv_cdf(level)
+    approx = dof * (1 - 2 / (9 * dof) + z * np.sqrt(2 / (9 * dof))) ** 3
+    return np.where(dof == 2, -2 * np.log1p(-level), approx)
+
+
+def index_matrix(indices=None, source=None, start=None, end=None):
+    """
+    Stack monthly indices into a gap-free (time x index) matrix.
+
+    The matrix covers the months where every requested index is present;
+    isolated missing months inside that span are left as NaN (the spectral
+    functions fill them with the series mean).
+
+    Args:
+        indices: Index names (defaults to every index in `source`)
+        source: IndexStore, DataFrame, dict of frames, or None to download
+        start: First month to include
+        end: Last month to include
+
+    Returns:
+        DataFrame indexed by Date with one column per index
+    """
+    frame = FeatureBuilder(indices, source).build(start=start, end=end).to_frame()
+    present = frame.notna().all(axis=1).to_numpy()
+    if not present.any():
+        raise ValueError("The requested indices have no months in common")
+    first = int(np.argmax(present))
+    last = len(present) - int(np.argmax(present[::-1]))
+    return frame.iloc[first:last]
+
+
+def _prepare(values, detrend):
+    """
+    Return (data, names, variance, lag-1 autocorrelation) for a stack of series.
+
+    Missing values are filled with the series mean and each series is
+    detrended; `data` is a new (time x series) float64 array.
+    """
+    if detrend not in DETREND_METHODS:
+        raise ValueError(f"Invalid detrend: {detrend}. Use None, 'constant' or 'linear'")
+
+    names = list(values.columns) if isinstance(values, pd.DataFrame) else None
+    data = np.array(values, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.ndim != 2 or len(data) < 4:
+        raise ValueError("values must be a (time x series) array with at least 4 time steps")
+    if names is None:
+        names = list(range(data.shape[1]))
+
+    missing = np.isnan(data)
+    if missing.any():
+        if missing.all(axis=0).any():
+            raise ValueError("every series needs at least one value")
+        data[missing] = np.broadcast_to(np.nanmean(data, axis=0), data.shape)[missing]
+
+    if detrend == "linear":
+        t = np.column_stack([np.ones(len(data)), np.arange(len(data), dtype=np.float64)])
+        data -= t @ np.linalg.lstsq(t, data, rcond=None)[0]
+    elif detrend == "constant":
+        data -= data.mean(axis=0)
+
+    centred = data - data.mean(axis=0)
+    variance = np.mean(centred ** 2, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        autocorrelation = np.sum(centred[1:] * centred[:-1], axis=0) / np.sum(centred ** 2, axis=0)
+    return data, names, variance, np.nan_to_num(autocorrelation)
+
+
+def _window(window, n):
+    if window is None:
+        return np.ones(n)
+    if window == "hann":
+        return np.hanning(n + 1)[:-1] if n > 1 else np.ones(n)
+    raise ValueError(f"Invalid window: {window}. Use None or 'hann'")
+
+
+def red_noise_spectrum(frequencies, autocorrelation, variance, dt=1.0):
+    """
+    One-sided power spectral density of AR(1) processes.
+
+    Normalised like `periodogram`, so it integrates to `variance` over
+    0..1/(2 dt).
+
+    Args:
+        frequencies: (frequency,) array in cycles per unit of `dt`
+        autocorrelation: Lag-1 autocorrelation of each series
+        variance: Variance of each series
+        dt: Sampling interval
+
+    Returns:
+        (frequency x series) array
+    """
+    alpha = np.atleast_1d(autocorrelation)[None, :]
+    cosine = np.cos(2 * np.pi * np.asarray(frequencies) * dt)[:, None]
+    return 2 * dt * np.atleast_1d(variance)[None, :] * (1 - alpha ** 2) / (1 + alpha ** 2 - 2 * alpha * cosine)
+
+
+class Spectrum:
+    """
+    Power spectral densities of several series.
+
+    Attributes:
+        frequencies: Frequencies in cycles per unit of `dt`
+        power: (frequency x series) one-sided power spectral density
+        dof: Degrees of freedom of each spectral estimate
+        dt: Sampling interval
+        names: Series names
+        variance: Variance of each series
+        autocorrelation: Lag-1 autocorrelation of each series (the red-noise null)
+    """
+
+    def __init__(self, frequencies, power, dof, dt, names, variance, autocorrelation):
+        self.frequencies = frequencies
+        self.power = power
+        self.dof = dof
+        self.dt = dt
+        self.names = names
+        self.variance = variance
+        self.autocorrelation = autocorrelation
+
+    def __repr__(self):
+        return f"Spectrum(frequencies={len(self.frequencies)}, names={self.names}, dof={self.dof:.1f})"
+
+    @property
+    def periods(self):
+        """Periods (1 / frequency; inf for the mean)."""
+        with np.errstate(divide="ignore"):
+            return 1 / self.frequencies
+
+    def red_noise(self):
+        """Expected spectrum of AR(1) noise with each series' variance and autocorrelation."""
+        return red_noise_spectrum(self.frequencies, self.autocorrelation, self.variance, self.dt)
+
+    def significance(self, level=0.95):
+        """Power each estimate must exceed to be significant against red noise at `level`."""
+        return self.red_noise() * chi2_quantile(level, self.dof) / self.dof
+
+    def to_frame(self):
+        """Return the power as a DataFrame indexed by frequency, one column per series."""
+        return pd.DataFrame(self.power, index=pd.Index(self.frequencies, name="frequency"),
+                            columns=self.names)
+
+
+def periodogram(values, dt=1.0, detrend="linear", window=None):
+    """
+    Periodograms of many series with one batched FFT.
+
+    Args:
+        values: (time x series) array or DataFrame, e.g. from `index_matrix`
+        dt: Sampling interval; frequencies are in cycles per unit of `dt`
+            (use dt=1/12 for monthly series in years, 1/365.25 for daily)
+        detrend: None, "constant" or "linear"
+        window: None or "hann" taper
+
+    Returns:
+        Spectrum (2 degrees of freedom per estimate)
+    """
+    data, names, variance, autocorrelation = _prepare(values, detrend)
+    n = len(data)
+    taper = _window(window, n)
+
+    power = np.abs(np.fft.rfft(data * taper[:, None], axis=0)) ** 2
+    power *= dt / np.sum(taper ** 2)
+    # One-sided: fold in the negative frequencies (not the mean or Nyquist)
+    power[1:(n + 1) // 2] *= 2
+    return Spectrum(np.fft.rfftfreq(n, dt), power, 2.0, dt, names, variance, autocorrelation)
+
+
+def welch(values, dt=1.0, segment_length=None, overlap=0.5, window="hann", detrend="constant"):
+    """
+    Welch spectra of many series: averaged periodograms of overlapping segments.
+
+    Segments are strided views of the stacked series and every segment of
+    every series is transformed in one FFT call.
+
+    Args:
+        values: (time x series) array or DataFrame
+        dt: Sampling interval
+        segment_length: Samples per segment (defaults to a quarter of the series)
+        overlap: Fraction of each segment shared with the next
+        window: None or "hann"
+        detrend: Detrending applied to each segment (None, "constant" or "linear")
+
+    Returns:
+        Spectrum, with the equivalent degrees of freedom of the average
+    """
+    data, names, variance, autocorrelation = _prepare(values, None)
+    n = len(data)
+    segment_length = max(4, n // 4) if segment_length is None else int(segment_length)
+    if not 4 <= segment_length <= n:
+        raise ValueError(f"segment_length must be between 4 and the series length ({n})")
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+    step = max(1, int(round(segment_length * (1 - overlap))))
+
+    # (segment, series, sample) views into `data`
+    segments = sliding_window_view(data, segment_length, axis=0)[::step]
+    n_segments = len(segments)
+    if detrend == "linear":
+        t = np.arange(segment_length) - (segment_length - 1) / 2
+        slope = (segments @ t) / np.sum(t ** 2)
+        segments = segments - segments.mean(axis=-1, keepdims=True) - slope[..., None] * t
+    elif detrend == "constant":
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+    elif detrend is not None:
+        raise ValueError(f"Invalid detrend: {detrend}. Use None, 'constant' or 'linear'")
+
+    taper = _window(window, segment_length)
+    power = np.mean(np.abs(np.fft.rfft(segments * taper, axis=-1)) ** 2, axis=0).T
+    power *= dt / np.sum(taper ** 2)
+    power[1:(segment_length + 1) // 2] *= 2
+
+    # Equivalent degrees of freedom for overlapping tapered segments
+    # (Percival & Walden 1993, eq. 292b)
+    correlation = np.array([np.sum(taper[:segment_length - j * step] * taper[j * step:])
+                            for j in range(1, n_segments) if j * step < segment_length])
+    correlation = correlation / np.sum(taper ** 2)
+    lags = np.arange(1, len(correlation) + 1)
+    dof = 2 * n_segments / (1 + 2 * np.sum((1 - lags / n_segments) * correlation ** 2))
+
+    return Spectrum(np.fft.rfftfreq(segment_length, dt), power, float(dof), dt, names,
+                    variance, autocorrelation)
+
+
+@functools.lru_cache(maxsize=16)
+def _morlet_kernels(n_pad, dt, scales, omega0):
+    """
+    Fourier transforms of Morlet wavelets at each scale, (scale x frequency).
+
+    Shared by every series of the same padded length, and cached across calls.
+    """
+    omega = 2 * np.pi * np.fft.fftfreq(n_pad, dt)
+    scales = np.asarray(scales)[:, None]
+    kernels = (np.sqrt(2 * np.pi * scales / dt) * np.pi ** -0.25
+               * np.exp(-0.5 * (scales * omega - omega0) ** 2) * (omega > 0))
+    kernels.flags.writeable = False
+    return kernels
+
+
+class WaveletPower:
+    """
+    Continuous Morlet wavelet power of several series.
+
+    Attributes:
+        power: (scale x time x series) wavelet power |W|^2
+        scales: Wavelet scales
+        periods: Equivalent Fourier period of each scale
+        coi: Cone of influence: the period at each time beyond which edge
+             effects matter
+        dt: Sampling interval
+        names: Series names
+        variance: Variance of each series
+        autocorrelation: Lag-1 autocorrelation of each series
+    """
+
+    def __init__(self, power, scales, periods, coi, dt, names, variance, autocorrelation):
+        self.power = power
+        self.scales = scales
+        self.periods = periods
+        self.coi = coi
+        self.dt = dt
+        self.names = names
+        self.variance = variance
+        self.autocorrelation = autocorrelation
+
+    def __repr__(self):
+        return (f"WaveletPower(scales={len(self.scales)}, times={self.power.shape[1]}, "
+                f"names={self.names})")
+
+    def significance(self, level=0.95):
+        """
+        Power each coefficient must exceed to be significant against red noise.
+
+        Returns:
+            (scale x series) array, to compare with `power[:, t, :]`
+        """
+        alpha = self.autocorrelation[None, :]
+        cosine = np.cos(2 * np.pi * self.dt / self.periods)[:, None]
+        expected = self.variance[None, :] * (1 - alpha ** 2) / (1 + alpha ** 2 - 2 * alpha * cosine)
+        return expected * chi2_quantile(level, 2) / 2
+
+    def in_coi(self):
+        """Boolean (scale x time) mask of the coefficients inside the cone of influence."""
+        return self.periods[:, None] <= self.coi[None, :]
+
+    def global_spectrum(self, inside_coi=False):
+        """
+        Time-averaged wavelet power, (scale x series).
+
+        Args:
+            inside_coi: Average only the coefficients free of edge effects
+        """
+        if not inside_coi:
+            return self.power.mean(axis=1)
+        mask = self.in_coi()[:, :, None]
+        with np.errstate(invalid="ignore"):
+            return np.where(mask, self.power, 0).sum(axis=1) / mask.sum(axis=1)
+
+
+def cwt(values, dt=1.0, dj=0.125, s0=None, n_scales=None, omega0=6.0, detrend="constant",
+        chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Continuous Morlet wavelet power of many series (Torrence & Compo 1998).
+
+    Each series is transformed once; the wavelet kernels for all scales are
+    computed once per padded length and shared by every series, and the
+    inverse transforms of a chunk of series run as one batched FFT.
+
+    Args:
+        values: (time x series) array or DataFrame
+        dt: Sampling interval
+        dj: Spacing between scales in octaves
+        s0: Smallest scale (defaults to 2 dt)
+        n_scales: Number of scales (defaults to reaching the series length)
+        omega0: Morlet non-dimensional frequency
+        detrend: None, "constant" or "linear"
+        chunk_bytes: Memory budget for the complex coefficients of one chunk
+
+    Returns:
+        WaveletPower
+    """
+    data, names, variance, autocorrelation = _prepare(values, detrend)
+    n, n_series = data.shape
+    s0 = 2 * dt if s0 is None else s0
+    if n_scales is None:
+        n_scales = int(np.log2(n * dt / s0) / dj) + 1
+    scales = s0 * 2 ** (dj * np.arange(n_scales))
+
+    # Zero-pad to a power of two to limit wrap-around and speed up the FFTs
+    n_pad = 1 << int(np.ceil(np.log2(n)))
+    kernels = _morlet_kernels(n_pad, float(dt), tuple(scales.tolist()), float(omega0))
+
+    power = np.empty((n_scales, n, n_series))
+    width = max(1, int(chunk_bytes // (16 * n_scales * n_pad)))
+    for start in range(0, n_series, width):
+        stop = min(start + width, n_series)
+        transform = np.fft.fft(data[:, start:stop], n=n_pad, axis=0)
+        coefficients = np.fft.ifft(kernels[:, :, None] * transform[None, :, :], axis=1)[:, :n]
+        power[:, :, start:stop] = coefficients.real ** 2 + coefficients.imag ** 2
+
+    fourier_factor = 4 * np.pi / (omega0 + np.sqrt(2 + omega0 ** 2))
+    edge = np.minimum(np.arange(1, n + 1), np.arange(n, 0, -1)) * dt
+    coi = fourier_factor / np.sqrt(2) * edge
+    return WaveletPower(power, scales, scales * fourier_factor, coi, dt, names, variance, autocorrelation)
@@ -0,0 +1,332 @@
+"""Memory-mapped consolidated store of the monthly indices."""
+
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .download_oni import download_oni
+from .download_soi import download_soi
+from .download_npgo import download_npgo
+from .download_nao import download_nao
+from .download_ao import download_ao
+from .download_aao import download_aao
+from .download_mei import download_mei
+from .download_pdo import download_pdo
+from .download_dmi import download_dmi
+
+
+STORE_VERSION = 1
+
+# Index name -> (downloader, value column, phase column or None)
+MONTHLY_INDICES = {
+    "ONI": (download_oni, "ONI", "phase"),
+    "SOI": (download_soi, "SOI", None),
+    "NPGO": (download_npgo, "NPGO", None),
+    "NAO": (download_nao, "NAO", None),
+    "AO": (download_ao, "AO", None),
+    "AAO": (download_aao, "AAO", None),
+    "MEI": (download_mei, "MEI", "Phase"),
+    "PDO": (download_pdo, "PDO", None),
+    "DMI": (download_dmi, "DMI", None),
+}
+
+_VALUES_FILE = "values.npy"
+_DATES_FILE = "dates.npy"
+_PHASES_FILE = "phases.npy"
+_META_FILE = "meta.json"
+
+# File in the store directory naming the version subdirectory to read
+_CURRENT_FILE = "CURRENT"
+
+
+def month_keys(frame):
+    """
+    Return the months of a pysoi frame as integer months since 1970-01.
+
+    Frames without a Date column (e.g. NAO) are keyed from Year and Month.
+
+    Args:
+        frame: DataFrame returned by one of the monthly download functions
+
+    Returns:
+        numpy.ndarray of int64 month keys
+    """
+    if "Date" in frame.columns:
+        dates = pd.to_datetime(frame["Date"])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+        return dates.to_numpy().astype("datetime64[M]").astype(np.int64)
+
+    month = frame["Month"]
+    if isinstance(month.dtype, pd.CategoricalDtype):
+        month_num = month.cat.codes.to_numpy().astype(np.int64) + 1
+    else:
+        month_num = month.to_numpy().astype(np.int64)
+    return (frame["Year"].to_numpy().astype(np.int64) - 1970) * 12 + month_num - 1
+
+
+def _download_frames(names):
+    frames = {}
+    for name in names:
+        downloader, _, _ = MONTHLY_INDICES[name]
+        frames[name] = downloader()
+    return frames
+
+
+def write_store(path, frames=None, names=None):
+    """
+    Write the monthly indices to a consolidated memory-mappable store.
+
+    The store is a directory holding a single time x index float64 array, the
+    shared month axis, integer-coded phase categories and a small JSON header.
+    Each write goes to a new version subdirectory and is published by
+    atomically replacing the CURRENT file naming it, so readers never see a
+    partially written store. Older versions are then removed; stores already
+    opened on them keep their memory maps.
+
+    Args:
+        path: Directory to write the store to
+        frames: Optional dict mapping index name to the DataFrame returned by
+                its download function. Indices not supplied are downloaded.
+        names: Index names to include. Defaults to the keys of `frames`, or to
+               every monthly index if `frames` is not given.
+
+    Returns:
+        IndexStore opened on the newly written store
+    """
+    frames = dict(frames or {})
+    if names is None:
+        names = list(frames) if frames else list(MONTHLY_INDICES)
+
+    bad_names = [name for name in names if name not in MONTHLY_INDICES]
+    if bad_names:
+        raise ValueError(f"Invalid indices: {', '.join(bad_names)}\n"
+                         f"Valid indices are: {', '.join(MONTHLY_INDICES)}")
+
+    missing = [name for name in names if name not in frames]
+    frames.update(_download_frames(missing))
+
+    # Shared month axis covering every index
+    keys = {name: month_keys(frames[name]) for name in names}
+    all_keys = np.unique(np.concatenate([keys[name] for name in names]))
+    start = all_keys[0] if len(all_keys) else 0
+    n_time = int(all_keys[-1] - start + 1) if len(all_keys) else 0
+
+    values = np.full((n_time, len(names)), np.nan, dtype=np.float64)
+    phase_names = [name for name in names if MONTHLY_INDICES[name][2] is not None]
+    phases = np.full((n_time, len(phase_names)), -1, dtype=np.int8)
+    phase_meta = {}
+
+    for j, name in enumerate(names):
+        _, value_col, phase_col = MONTHLY_INDICES[name]
+        rows = keys[name] - start
+        values[rows, j] = frames[name][value_col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        if phase_col is not None:
+            phase = pd.Categorical(frames[name][phase_col])
+            k = phase_names.index(name)
+            phases[rows, k] = phase.codes
+            phase_meta[name] = {
+                "column": k,
+                "field": phase_col,
+                "categories": [str(c) for c in phase.categories],
+                "ordered": bool(phase.ordered),
+            }
+
+    dates = (np.arange(n_time, dtype=np.int64) + start).astype("datetime64[M]").astype("datetime64[ns]")
+
+    meta = {
+        "version": STORE_VERSION,
+        "names": list(names),
+        "phases": phase_meta,
+        "created": datetime.now(timezone.utc).isoformat(),
+    }
+
+    path = os.path.abspath(path)
+    os.makedirs(path, exist_ok=True)
+    version = f"v-{uuid.uuid4().hex}"
+    version_path = os.path.join(path, version)
+    tmp_current = os.path.join(path, f".{_CURRENT_FILE}.{uuid.uuid4().hex}.tmp")
+    os.makedirs(version_path)
+    try:
+        np.save(os.path.join(version_path, _VALUES_FILE), values)
+        np.save(os.path.join(version_path, _DATES_FILE), dates)
+        np.save(os.path.join(version_path, _PHASES_FILE), phases)
+        with open(os.path.join(version_path, _META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        with open(tmp_current, "w") as f:
+            f.write(version)
+        os.replace(tmp_current, os.path.join(path, _CURRENT_FILE))
+    except BaseException:
+        shutil.rmtree(version_path, ignore_errors=True)
+        if os.path.exists(tmp_current):
+            os.remove(tmp_current)
+        raise
+
+    _remove_old_versions(path, version)
+    return open_store(path)
+
+
+def _remove_old_versions(path, current):
+    """Remove store versions other than `current`, and files of the unversioned layout."""
+    for entry in os.listdir(path):
+        entry_path = os.path.join(path, entry)
+        if entry.startswith("v-") and entry != current:
+            shutil.rmtree(entry_path, ignore_errors=True)
+        elif entry in (_VALUES_FILE, _DATES_FILE, _PHASES_FILE, _META_FILE):
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+
+
+def _current_version(path):
+    """Return the directory holding the current version of the store at `path`."""
+    try:
+        with open(os.path.join(path, _CURRENT_FILE)) as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        # Stores written before versioning hold the files directly
+        return path
+
+
+def open_store(path):
+    """
+    Open a store written by `write_store`.
+
+    The arrays are memory-mapped read-only, so any number of processes can
+    open the same store and share a single page-cache copy of the data.
+
+    Args:
+        path: Directory containing the store
+
+    Returns:
+        IndexStore
+    """
+    return IndexStore(path)
+
+
+class IndexStore:
+    """
+    Read-only view over a consolidated store of monthly indices.
+
+    Attributes:
+        values: Memory-mapped (time x index) float64 array
+        dates: Memory-mapped datetime64[ns] month axis
+        names: Index names in column order
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        while True:
+            data_path = _current_version(self.path)
+            try:
+                self._load(data_path)
+                break
+            except FileNotFoundError:
+                # A newer version was published and this one removed meanwhile
+                if _current_version(self.path) == data_path:
+                    raise
+        self.names = list(self.meta["names"])
+        self._columns = {name: j for j, name in enumerate(self.names)}
+
+    def _load(self, data_path):
+        with open(os.path.join(data_path, _META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported store version: {self.meta.get('version')}")
+
+        self.values = np.load(os.path.join(data_path, _VALUES_FILE), mmap_mode="r")
+        self.dates = np.load(os.path.join(data_path, _DATES_FILE), mmap_mode="r")
+        self._phases = np.load(os.path.join(data_path, _PHASES_FILE), mmap_mode="r")
+
+    def __repr__(self):
+        return f"IndexStore({self.path!r}, names={self.names}, n_time={len(self.dates)})"
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def _check_name(self, name):
+        if name not in self._columns:
+            raise KeyError(f"{name} is not in the store. Available indices: {', '.join(self.names)}")
+
+    def column(self, name):
+        """
+        Return the values of one index as a read-only view (no copy).
+
+        Args:
+            name: Index name, e.g. "ONI"
+
+        Returns:
+            numpy.ndarray view into the memory-mapped array
+        """
+        self._check_name(name)
+        return self.values[:, self._columns[name]]
+
+    def phase_codes(self, name):
+        """
+        Return the integer phase codes and categories for an index.
+
+        Args:
+            name: Index name with phase information ("ONI" or "MEI")
+
+        Returns:
+            Tuple of (codes view, list of categories). Missing phases are -1.
+        """
+        self._check_name(name)
+        if name not in self.meta["phases"]:
+            raise KeyError(f"{name} has no phase information")
+        info = self.meta["phases"][name]
+        return self._phases[:, info["column"]], list(info["categories"])
+
+    def phase(self, name):
+        """Return the phase of an index as a pandas Categorical."""
+        codes, categories = self.phase_codes(name)
+        ordered = self.meta["phases"][name]["ordered"]
+        return pd.Categorical.from_codes(codes, categories=categories, ordered=ordered)
+
+    def to_frame(self, names=None, phases=False):
+        """
+        Return the store as a DataFrame indexed by Date.
+
+        The value columns are backed by the memory-mapped array where pandas
+        allows it, so no data is copied.
+
+        Args:
+            names: Index names to include (defaults to all)
+            phases: Whether to add a "<name>_phase" column for indices that have one
+
+        Returns:
+            DataFrame with a Date index and one column per index
+        """
+        names = self.names if names is None else list(names)
+        for name in names:
+            self._check_name(name)
+
+        columns = [self._columns[name] for name in names]
+        if columns == list(range(len(self.names))):
+            block = self.values
+        elif columns and columns == list(range(columns[0], columns[-1] + 1)):
+            block = self.values[:, columns[0]:columns[-1] + 1]
+        else:
+            # Non-contiguous selections can't be expressed as a single view
+            block = self.values[:, columns]
+
+        frame = pd.DataFrame(block, index=pd.DatetimeIndex(self.dates, name="Date"),
+                             columns=names, copy=False)
+
+        if phases:
+            for name in names:
+                if name in self.meta["phases"]:
+                    frame[f"{name}_phase"] = self.phase(name)
+
+        return frame
@@ -0,0 +1,383 @@
+"""Batched surrogate realizations of the monthly indices for Monte Carlo studies."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .composite import _phase_codes
+from .spectral import index_matrix
+
+
+SURROGATE_METHODS = ["block_bootstrap", "phase_randomize", "markov"]
+
+# Realizations generated per RNG stream; each chunk gets its own spawned seed
+DEFAULT_CHUNK_SIZE = 1000
+
+# Inputs shared with worker processes (set by _init_worker)
+_worker_job = None
+
+
+def spawn_seeds(seed, n):
+    """
+    Split a seed into independent, reproducible child seeds.
+
+    Use the children to run parts of a study in separate processes or jobs;
+    each child seeds the same streams wherever it is used.
+
+    Args:
+        seed: None, int or numpy.random.SeedSequence
+        n: Number of child seeds
+
+    Returns:
+        List of numpy.random.SeedSequence
+    """
+    return _children(_seed_sequence(seed), n)
+
+
+def _children(root, n):
+    # Derived from the root's key rather than root.spawn(), so a SeedSequence
+    # passed in twice gives the same children both times
+    return [np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (i,), pool_size=root.pool_size)
+            for i in range(n)]
+
+
+def _seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        raise ValueError("seed must be None, an int or a SeedSequence so it can be split into streams")
+    return np.random.SeedSequence(seed)
+
+
+def _series(values, indices):
+    """Return (time x index float64 array, names, dates or None)."""
+    if values is None or (isinstance(values, pd.DataFrame) and "Date" in values.columns):
+        # e.g. the merged frame returned by download_enso("all")
+        values = index_matrix(indices, source=values)
+    elif indices is not None:
+        values = values[list(indices)]
+
+    names = list(values.columns) if isinstance(values, pd.DataFrame) else None
+    dates = None
+    if isinstance(values, pd.DataFrame) and isinstance(values.index, pd.DatetimeIndex):
+        dates = values.index.to_numpy()
+    data = np.array(values, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.ndim != 2 or len(data) < 2:
+        raise ValueError("values must be a (time x index) array with at least 2 time steps")
+    if names is None:
+        names = list(range(data.shape[1]))
+    return data, names, dates
+
+
+def _block_bootstrap(data, n, rng, params):
+    block_length, by_year, length = params
+    n_starts = len(data) - block_length + 1
+    n_blocks = -(-length // block_length)
+    if by_year:
+        # Block b starts on the calendar month it takes in the output, so it
+        # is drawn from the starts in that month: offset + 12 * k
+        offsets = np.arange(n_blocks) * block_length % 12
+        starts = offsets + 12 * rng.integers((n_starts - offsets + 11) // 12, size=(n, n_blocks))
+    else:
+        starts = rng.integers(n_starts, size=(n, n_blocks))
+    # Row numbers of every block of every realization, cut to the length
+    rows = (starts[:, :, None] + np.arange(block_length)).reshape(n, -1)[:, :length]
+    return data[rows], None
+
+
+def _phase_randomize(data, n, rng, params):
+    mean = data.mean(axis=0)
+    spectrum = np.fft.rfft(data - mean, axis=0)
+    n_time = len(data)
+    # One set of phases per realization, shared by every index so the
+    # cross-spectra (and so the lagged cross-correlations) are kept
+    angles = rng.uniform(0, 2 * np.pi, size=(n, spectrum.shape[0], 1))
+    angles[:, 0] = 0
+    if n_time % 2 == 0:
+        angles[:, -1] = 0
+    return np.fft.irfft(spectrum * np.exp(1j * angles), n=n_time, axis=1) + mean, None
+
+
+def _markov(data, n, rng, params):
+    codes, cumulative, initial, positions, length = params
+    n_states = cumulative.shape[-1]
+
+    # Walk the chain one month at a time, all realizations at once
+    draws = rng.random((n, length))
+    states = np.empty((n, length), dtype=np.int8)
+    states[:, 0] = (draws[:, 0, None] >= initial).sum(axis=1)
+    for t in range(1, length):
+        thresholds = cumulative[positions[t], states[:, t - 1]]
+        states[:, t] = (draws[:, t, None] >= thresholds).sum(axis=1)
+
+    # Draw each month from the observed months in the same phase
+    rows = np.empty((n, length), dtype=np.int64)
+    for k in range(n_states):
+        members = np.flatnonzero(codes == k)
+        selected = states == k
+        rows[selected] = members[rng.integers(len(members), size=int(selected.sum()))]
+    return data[rows], states
+
+
+_GENERATORS = {
+    "block_bootstrap": _block_bootstrap,
+    "phase_randomize": _phase_randomize,
+    "markov": _markov,
+}
+
+
+def _chunk(job, n, seed):
+    method, data, params, dtype = job
+    values, states = _GENERATORS[method](data, n, np.random.default_rng(seed), params)
+    return values.astype(dtype, copy=False), states
+
+
+def _init_worker(job):
+    global _worker_job
+    _worker_job = job
+
+
+def _worker_chunk(n, seed):
+    return _chunk(_worker_job, n, seed)
+
+
+class Surrogates:
+    """
+    Synthetic realizations of one or more aligned indices.
+
+    Attributes:
+        values: (realization x time x index) array
+        names: Index names in the last axis
+        dates: datetime64[ns] month of each time step, or None
+        method: "block_bootstrap", "phase_randomize" or "markov"
+        seed: Root numpy.random.SeedSequence; passing it back as `seed`
+              reproduces the realizations
+        phases: (realization x time) int8 phase codes for "markov", else None
+        categories: Phase labels of the codes, or None
+    """
+
+    def __init__(self, values, names, dates, method, seed, phases=None, categories=None):
+        self.values = values
+        self.names = names
+        self.dates = dates
+        self.method = method
+        self.seed = seed
+        self.phases = phases
+        self.categories = categories
+
+    def __repr__(self):
+        n_realizations, n_time, n_indices = self.values.shape
+        return (f"Surrogates(method={self.method!r}, realizations={n_realizations}, "
+                f"time={n_time}, indices={self.names})")
+
+    def __len__(self):
+        return len(self.values)
+
+    def realization(self, i):
+        """
+        Return one realization as a DataFrame.
+
+        Args:
+            i: Realization number
+
+        Returns:
+            DataFrame with one column per index (and phase for "markov"),
+            indexed by Date when the dates are known
+        """
+        index = pd.DatetimeIndex(self.dates, name="Date") if self.dates is not None else None
+        frame = pd.DataFrame(self.values[i], index=index, columns=self.names)
+        if self.phases is not None:
+            frame["phase"] = pd.Categorical.from_codes(self.phases[i], categories=self.categories)
+        return frame
+
+
+def _generate(method, data, names, dates, params, n_realizations, seed, chunk_size, processes,
+              dtype, length, categories=None):
+    if n_realizations < 1:
+        raise ValueError("n_realizations must be at least 1")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    root = _seed_sequence(seed)
+    sizes = [min(chunk_size, n_realizations - start) for start in range(0, n_realizations, chunk_size)]
+    seeds = _children(root, len(sizes))
+    job = (method, data, params, np.dtype(dtype))
+    if processes and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(job,)) as executor:
+            results = list(executor.map(_worker_chunk, sizes, seeds))
+    else:
+        results = [_chunk(job, size, child) for size, child in zip(sizes, seeds)]
+
+    values = np.concatenate([values for values, _ in results])
+    phases = np.concatenate([states for _, states in results]) if method == "markov" else None
+    if length != len(data):
+        dates = None
+    return Surrogates(values, names, dates, method, root, phases, categories)
+
+
+def block_bootstrap(values, n_realizations, block_length=12, by_year=True, length=None, seed=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE, processes=None, dtype=np.float64, indices=None):
+    """
+    Resample the indices in blocks of consecutive months.
+
+    Every index takes the same blocks, so the correlation between indices is
+    kept; within-block persistence is kept up to `block_length` months.
+
+    Args:
+        values: (time x index) array or DataFrame of monthly values, a frame
+                with a Date column (e.g. `download_enso("all")`), or None to
+                download `indices`
+        n_realizations: Number of realizations
+        block_length: Months per block
+        by_year: Start each block on the calendar month it takes in the
+                 realization, so every realization keeps the seasonal cycle
+                 (whole years with the default `block_length`)
+        length: Months per realization (defaults to the input length)
+        seed: None, int or numpy.random.SeedSequence
+        chunk_size: Realizations drawn per RNG stream
+        processes: Spread chunks over this many worker processes
+        dtype: dtype of the returned values
+        indices: Index names to use from `values`
+
+    Returns:
+        Surrogates
+    """
+    data, names, dates = _series(values, indices)
+    length = len(data) if length is None else int(length)
+    if not 1 <= block_length <= len(data):
+        raise ValueError(f"block_length must be between 1 and the number of months ({len(data)})")
+    offsets = np.arange(-(-length // block_length)) * block_length % 12
+    if by_year and offsets.max() > len(data) - block_length:
+        # Some block's calendar month has no observed block starting in it
+        raise ValueError(f"by_year needs at least {block_length + int(offsets.max())} months of data")
+    params = (int(block_length), bool(by_year), length)
+    return _generate("block_bootstrap", data, names, dates, params, n_realizations, seed,
+                     chunk_size, processes, dtype, length)
+
+
+def phase_randomize(values, n_realizations, seed=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    processes=None, dtype=np.float64, indices=None):
+    """
+    Fourier phase-randomized surrogates.
+
+    Each realization keeps the power spectrum of every index and, since the
+    same random phases are applied to all indices, their cross-spectra.
+    Missing months are filled with the index mean first.
+
+    Args:
+        values: (time x index) array or DataFrame of monthly values, a frame
+                with a Date column (e.g. `download_enso("all")`), or None to
+                download `indices`
+        n_realizations: Number of realizations
+        seed: None, int or numpy.random.SeedSequence
+        chunk_size: Realizations drawn per RNG stream
+        processes: Spread chunks over this many worker processes
+        dtype: dtype of the returned values
+        indices: Index names to use from `values`
+
+    Returns:
+        Surrogates
+    """
+    data, names, dates = _series(values, indices)
+    missing = np.isnan(data)
+    if missing.any():
+        if missing.all(axis=0).any():
+            raise ValueError("every index needs at least one value")
+        data[missing] = np.broadcast_to(np.nanmean(data, axis=0), data.shape)[missing]
+    return _generate("phase_randomize", data, names, dates, None, n_realizations, seed,
+                     chunk_size, processes, dtype, len(data))
+
+
+def _transitions(codes, n_states, positions, cycle):
+    """Cumulative transition probabilities, (cycle x from x to)."""
+    counts = np.zeros((cycle, n_states, n_states))
+    valid = (codes[:-1] >= 0) & (codes[1:] >= 0)
+    np.add.at(counts, (positions[1:][valid], codes[:-1][valid], codes[1:][valid]), 1)
+
+    # Months without observed transitions use the pooled ones, then persistence
+    pooled = counts.sum(axis=0)
+    pooled[pooled.sum(axis=1) == 0] = np.eye(n_states)[pooled.sum(axis=1) == 0]
+    empty = counts.sum(axis=2) == 0
+    counts[empty] = np.broadcast_to(pooled, counts.shape)[empty]
+    return _cumulative(counts / counts.sum(axis=2, keepdims=True))
+
+
+def _cumulative(probabilities):
+    """
+    Cumulative probabilities along the last axis for drawing by comparison.
+
+    A uniform draw lands in the state equal to the number of entries it
+    reaches; entries that are already 1 can't be reached, so rounding never
+    selects a state past the last one with any probability.
+    """
+    cumulative = np.cumsum(probabilities, axis=-1)
+    cumulative[cumulative >= 1 - 1e-12] = np.inf
+    return cumulative
+
+
+def markov(values, n_realizations, phases=None, categories=None, seasonal=True, length=None,
+           seed=None, chunk_size=DEFAULT_CHUNK_SIZE, processes=None, dtype=np.float64, indices=None):
+    """
+    Markov-chain resampling of ENSO phases.
+
+    A phase sequence is simulated from the observed month-to-month phase
+    transitions, and each month of every index is drawn from the observed
+    months in the simulated phase. All indices take the same month, which
+    keeps their correlation within each phase.
+
+    Args:
+        values: (time x index) array or DataFrame of monthly values, a frame
+                with a Date column (e.g. `download_enso("all")`), or None to
+                download `indices`
+        n_realizations: Number of realizations
+        phases: Phase of each month: a Categorical, labels or integer codes
+                (-1 for missing). Defaults to the `phase` column of `values`.
+        categories: Phase labels, or the labels of integer codes
+        seasonal: Estimate separate transitions for each calendar month
+        length: Months per realization (defaults to the input length)
+        seed: None, int or numpy.random.SeedSequence
+        chunk_size: Realizations drawn per RNG stream
+        processes: Spread chunks over this many worker processes
+        dtype: dtype of the returned values
+        indices: Index names to use from `values`
+
+    Returns:
+        Surrogates with the simulated phases
+    """
+    data, names, dates = _series(values, indices)
+    if phases is None:
+        if not (isinstance(values, pd.DataFrame) and "phase" in values.columns):
+            raise ValueError("phases must be given unless values has a phase column")
+        if "Date" in values.columns:
+            phases = values.drop_duplicates("Date").set_index("Date")["phase"].reindex(dates)
+        else:
+            phases = values["phase"]
+
+    codes, categories = _phase_codes(phases, categories)
+    if len(codes) != len(data):
+        raise ValueError(f"phases has {len(codes)} entries but values has {len(data)} months")
+    if "" in categories:
+        # The empty phase marks months where it couldn't be computed
+        empty = categories.index("")
+        codes = np.where(codes == empty, -1, codes - (codes > empty))
+        categories = [label for label in categories if label != ""]
+    if not (codes >= 0).any():
+        raise ValueError("phases has no classified months")
+
+    # Position of each month in the calendar cycle the transitions depend on
+    length = len(data) if length is None else int(length)
+    cycle = 12 if seasonal else 1
+    first = pd.Timestamp(dates[0]).month - 1 if dates is not None else 0
+    observed = (first + np.arange(len(data))) % cycle
+    cumulative = _transitions(codes, len(categories), observed, cycle)
+
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    initial = _cumulative(counts / counts.sum())
+    positions = (first + np.arange(length)) % cycle
+
+    params = (codes, cumulative, initial, positions, length)
+    return _generate("markov", data, names, dates, params, n_realizations, seed, chunk_size,
+                     processes, dtype, length, list(categories))
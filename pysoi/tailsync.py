@@ -0,0 +1,207 @@
+"""Byte-range tail fetching for append-only source files."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+
+import requests
+
+from . import utils
+
+
+# Bytes re-requested before the stored end to check the prefix is unchanged
+OVERLAP = 512
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class TailResult:
+    """
+    Outcome of a tail fetch.
+
+    Attributes:
+        content: Full current content as bytes
+        offset: Byte offset where the newly fetched data starts. Everything
+                before it was already stored locally.
+        full: True if the whole file was downloaded (first sync, changed
+              prefix or a server without range support)
+        transferred: Number of body bytes received from the server
+    """
+
+    def __init__(self, content, offset, full, transferred):
+        self.content = content
+        self.offset = offset
+        self.full = full
+        self.transferred = transferred
+
+    @property
+    def appended(self):
+        """Bytes added since the previous sync (the whole file if `full`)."""
+        return self.content[self.offset:]
+
+    def __repr__(self):
+        return (f"TailResult(length={len(self.content)}, offset={self.offset}, "
+                f"full={self.full}, transferred={self.transferred})")
+
+
+class TailCache:
+    """
+    Local copy of remote files that is refreshed by fetching only the new tail.
+
+    For each URL the cache keeps the bytes last seen plus the server's
+    validator (ETag or Last-Modified). A refresh asks for
+    `Range: bytes=<length - OVERLAP>-` guarded by `If-Range`, checks the
+    overlapping bytes against the stored copy and appends the rest. If the
+    server ignores the range, the validator no longer matches or the
+    overlap differs, the file is downloaded in full instead.
+    """
+
+    def __init__(self, path, overlap=OVERLAP):
+        self.path = os.path.abspath(path)
+        self.overlap = overlap
+        os.makedirs(self.path, exist_ok=True)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def sidecar(self, url, suffix):
+        """Path for auxiliary data stored alongside `url` (e.g. parsed rows)."""
+        return os.path.join(self.path, f"{self._key(url)}{suffix}")
+
+    def _paths(self, url):
+        key = self._key(url)
+        return os.path.join(self.path, f"{key}.data"), os.path.join(self.path, f"{key}.json")
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def state(self, url):
+        """
+        Return the stored sync state for `url`.
+
+        Returns:
+            Dict with url, length, etag and last_modified, or None if the URL
+            has never been synced
+        """
+        data_path, state_path = self._paths(url)
+        if not (os.path.exists(data_path) and os.path.exists(state_path)):
+            return None
+        with open(state_path) as f:
+            state = json.load(f)
+        if os.path.getsize(data_path) != state.get("length"):
+            return None
+        return state
+
+    def content(self, url):
+        """Return the stored bytes for `url`, or None if not synced."""
+        if self.state(url) is None:
+            return None
+        data_path, _ = self._paths(url)
+        with open(data_path, "rb") as f:
+            return f.read()
+
+    def _write(self, url, content, response):
+        data_path, state_path = self._paths(url)
+        suffix = uuid.uuid4().hex
+
+        # Replaced whole, so an interrupted sync leaves the previous copy
+        tmp_data = f"{data_path}.{suffix}.tmp"
+        with open(tmp_data, "wb") as f:
+            f.write(content)
+        os.replace(tmp_data, data_path)
+
+        state = {
+            "url": url,
+            "length": len(content),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        tmp_state = f"{state_path}.{suffix}.tmp"
+        with open(tmp_state, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_state, state_path)
+
+    def _get(self, url, headers=None):
+        # Byte offsets must refer to the file itself, not a gzip-encoded body
+        headers = {"Accept-Encoding": "identity", **(headers or {})}
+        try:
+            return utils.fetch(url, headers=headers)
+        except requests.ConnectionError:
+            raise ConnectionError("A working internet connection is required to download and import the climate indices.")
+
+    def _full(self, url, response=None):
+        if response is None or response.status_code != 200:
+            response = self._get(url)
+        if response.status_code != 200:
+            raise ValueError(f"Non successful http request. Target server returning a {response.status_code} error code")
+        if "shutdown" in response.url:
+            raise RuntimeError("Data source is currently unavailable due to a US government shutdown")
+        content = response.content
+        self._write(url, content, response)
+        return TailResult(content, 0, True, len(content))
+
+    def fetch(self, url):
+        """
+        Bring the local copy of `url` up to date and return it.
+
+        Args:
+            url: URL of an append-only file
+
+        Returns:
+            TailResult with the full content and the offset of the new data
+        """
+        with self._url_lock(url):
+            state = self.state(url)
+            if state is None or state["length"] == 0:
+                return self._full(url)
+
+            old = self.content(url)
+            start = max(0, state["length"] - self.overlap)
+            headers = {"Range": f"bytes={start}-"}
+            validator = state.get("etag") or state.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+
+            response = self._get(url, headers=headers)
+
+            if response.status_code != 206:
+                # 200: range unsupported or validator changed. 416: the file
+                # shrank below our offset. Either way, start again.
+                return self._full(url, response)
+
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            body = response.content
+            if match is None or int(match.group(1)) != start or body[:len(old) - start] != old[start:]:
+                # The prefix changed under us (e.g. a rewritten table row)
+                return self._full(url)
+
+            content = old + body[len(old) - start:]
+            self._write(url, content, response)
+            return TailResult(content, len(old), False, len(body))
+
+
+def enable_tail_cache(path, overlap=OVERLAP):
+    """
+    Route every `check_response` download through a TailCache.
+
+    Args:
+        path: Directory for the cached files
+        overlap: Bytes re-requested to check the stored prefix is unchanged
+
+    Returns:
+        The installed TailCache
+    """
+    cache = TailCache(path, overlap=overlap)
+    utils.set_tail_cache(cache)
+    return cache
+
+
+def disable_tail_cache():
+    """Stop routing downloads through a TailCache."""
+    utils.set_tail_cache(None)
@@ -0,0 +1,331 @@
+"""Pluggable transports: HTTP, local mirror directories and in-memory files."""
+
+import contextlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+
+import requests
+
+from . import utils
+from .sources import SOURCES, get_source, mirror_urls, url_path
+
+
+class SyncError(RuntimeError):
+    """
+    Raised by `sync` when some sources could not be mirrored.
+
+    The sources that did succeed are already written to the mirror.
+
+    Attributes:
+        paths: Dict of source name to mirrored file path for the sources that succeeded
+        errors: Dict of source name to the exception raised while mirroring it
+    """
+
+    def __init__(self, paths, errors):
+        self.paths = paths
+        self.errors = errors
+        failures = "\n".join(f"  {name}: {error}" for name, error in errors.items())
+        super().__init__(f"Failed to mirror {len(errors)} of {len(paths) + len(errors)} sources:\n{failures}")
+
+
+def _write_atomic(path, content, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(tmp_path, (mtime, mtime))
+    os.replace(tmp_path, path)
+
+
+def _response(url, status_code, content=b"", raw=None, headers=None):
+    """Build a requests.Response for a locally served file."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = HTTPStatus(status_code).phrase
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers.update(headers or {})
+    if raw is not None:
+        # Streamed: the body is read from `raw` on demand
+        response.raw = raw
+    else:
+        response._content = content
+        response.raw = io.BytesIO(content)
+    return response
+
+
+def _not_modified(request_headers, etag, mtime):
+    """True if If-None-Match or If-Modified-Since shows the client copy is current."""
+    if_none_match = request_headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request_headers.get("If-Modified-Since")
+    if if_modified_since is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class Transport:
+    """
+    Serves the requests made by every download function.
+
+    Subclasses implement `send`, returning a requests.Response (or an object
+    with the same `status_code`, `url`, `headers`, `text`, `content`, `raw`
+    and `close` members).
+    """
+
+    def send(self, url, method="GET", **kwargs):
+        """
+        Answer a request for `url`.
+
+        Args:
+            url: Source URL
+            method: HTTP method ("GET" or "HEAD")
+            **kwargs: requests keyword arguments (`headers` and `stream` are honoured)
+
+        Returns:
+            requests.Response
+        """
+        raise NotImplementedError
+
+
+class HTTPTransport(Transport):
+    """Request sources from their servers (the default)."""
+
+    def __repr__(self):
+        return "HTTPTransport()"
+
+    def send(self, url, method="GET", **kwargs):
+        return utils.fetch_http(url, method, **kwargs)
+
+
+class DirectoryTransport(Transport):
+    """
+    Read sources from a local mirror directory, e.g. one kept up to date by `sync`.
+
+    Files are looked up as "<root>/<host>/<path>" (see `pysoi.sources.url_path`),
+    falling back to the paths of the source's mirrors. Missing files answer
+    404. Responses carry ETag and Last-Modified validators and answer
+    conditional requests with 304; Range requests get the full file.
+
+    Args:
+        root: Mirror directory, or a "file://" URL of one
+    """
+
+    def __init__(self, root):
+        root = os.fspath(root)
+        if root.startswith("file://"):
+            root = root[len("file://"):]
+        self.root = os.path.abspath(root)
+
+    def __repr__(self):
+        return f"DirectoryTransport({self.root!r})"
+
+    def path(self, url):
+        """Return the local path mirroring `url`, or None if no copy exists."""
+        for candidate in mirror_urls(url):
+            path = os.path.join(self.root, *url_path(candidate).split("/"))
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def send(self, url, method="GET", **kwargs):
+        path = self.path(url)
+        if path is None:
+            return _response(url, 404)
+
+        stat = os.stat(path)
+        headers = {
+            "ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Content-Length": str(stat.st_size),
+        }
+        if _not_modified(kwargs.get("headers") or {}, headers["ETag"], stat.st_mtime):
+            return _response(url, 304, headers=headers)
+        if method == "HEAD":
+            return _response(url, 200, headers=headers)
+
+        if kwargs.get("stream"):
+            return _response(url, 200, raw=open(path, "rb"), headers=headers)
+        with open(path, "rb") as f:
+            return _response(url, 200, f.read(), headers=headers)
+
+
+class MemoryTransport(Transport):
+    """
+    Serve sources from a dict held in memory, for tests and notebooks.
+
+    Args:
+        files: Dict mapping a source name, URL or `url_path` to its content
+               (str or bytes)
+    """
+
+    def __init__(self, files=None):
+        self._files = {}
+        self._lock = threading.Lock()
+        for key, content in (files or {}).items():
+            self.put(key, content)
+
+    def __repr__(self):
+        return f"MemoryTransport({len(self._files)} files)"
+
+    @staticmethod
+    def _key(key):
+        if key in SOURCES:
+            key = SOURCES[key].resolve()
+        return url_path(key) if "://" in key else key
+
+    def put(self, key, content):
+        """Store the content of a source name, URL or `url_path`."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        with self._lock:
+            self._files[self._key(key)] = content
+
+    def send(self, url, method="GET", **kwargs):
+        with self._lock:
+            content = next((self._files[url_path(candidate)] for candidate in mirror_urls(url)
+                            if url_path(candidate) in self._files), None)
+        if content is None:
+            return _response(url, 404)
+        return _response(url, 200, b"" if method == "HEAD" else content)
+
+
+def as_transport(transport):
+    """
+    Turn a transport specification into a Transport.
+
+    Args:
+        transport: Transport; None or "http" for HTTP; a directory path or
+                   "file://" URL for a DirectoryTransport; a dict of files
+                   for a MemoryTransport
+
+    Returns:
+        Transport, or None for plain HTTP
+    """
+    if transport is None or transport == "http":
+        return None
+    if isinstance(transport, Transport):
+        return transport
+    if isinstance(transport, dict):
+        return MemoryTransport(transport)
+    if isinstance(transport, (str, os.PathLike)):
+        return DirectoryTransport(transport)
+    raise ValueError(f"Invalid transport: {transport!r}. Use a Transport, a directory, a dict of files or None")
+
+
+def set_transport(transport):
+    """
+    Serve every download through `transport` from now on, in every thread.
+
+    Args:
+        transport: Anything accepted by `as_transport`
+
+    Returns:
+        The previously installed Transport, or None
+    """
+    return utils.set_transport(as_transport(transport))
+
+
+@contextlib.contextmanager
+def use_transport(transport):
+    """
+    Serve the downloads made by this thread through `transport` for the block.
+
+    Thread pools started by the download functions inherit it.
+
+    Args:
+        transport: Anything accepted by `as_transport` ("http" forces HTTP
+                   even when a global transport is installed)
+
+    Example:
+        with use_transport("/shared/pysoi-mirror"):
+            oni = download_oni()
+    """
+    installed = as_transport(transport)
+    if installed is None:
+        installed = HTTPTransport()
+    previous = utils.set_transport(installed, local=True)
+    try:
+        yield installed
+    finally:
+        utils.set_transport(previous, local=True)
+
+
+def sync(directory, names=None, max_workers=8, revalidate=True):
+    """
+    Mirror every source into a directory that DirectoryTransport can serve.
+
+    Files are fetched in parallel through the installed transport, so rate
+    limits and hedging apply, and are written atomically as
+    "<directory>/<host>/<path>". Each file's mtime is set to the server's
+    Last-Modified, so later syncs only transfer files that changed.
+
+    A failing source does not stop the others: every source that can be
+    fetched is written, then the failures are raised together.
+
+    Args:
+        directory: Mirror directory
+        names: Source names to mirror (defaults to every source, including
+               each asymsam level)
+        max_workers: Maximum number of concurrent downloads
+        revalidate: Send If-Modified-Since for files already mirrored
+
+    Returns:
+        Dict of source name to mirrored file path
+
+    Raises:
+        SyncError: If any source could not be mirrored (its `paths` holds the
+                   sources that were)
+    """
+    names = list(SOURCES) if names is None else list(names)
+    urls = [get_source(name).resolve() for name in names]
+
+    def _sync(url):
+        path = os.path.join(directory, *url_path(url).split("/"))
+        headers = {}
+        if revalidate and os.path.isfile(path):
+            headers["If-Modified-Since"] = formatdate(os.path.getmtime(path), usegmt=True)
+
+        response = utils.fetch(url, headers=headers)
+        if response.status_code == 304:
+            response.close()
+            return path
+        if response.status_code != 200:
+            response.close()
+            raise ValueError(f"Non successful http request for {url}. "
+                             f"Target server returning a {response.status_code} error code")
+
+        mtime = None
+        if response.headers.get("Last-Modified"):
+            try:
+                mtime = parsedate_to_datetime(response.headers["Last-Modified"]).timestamp()
+            except (TypeError, ValueError):
+                pass
+        _write_atomic(path, response.content, mtime)
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+        sync_url = utils.carry_transport(_sync)
+        futures = {executor.submit(sync_url, url): name for name, url in zip(names, urls)}
+        paths, errors = {}, {}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                paths[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    paths = {name: paths[name] for name in names if name in paths}
+    if errors:
+        raise SyncError(paths, {name: errors[name] for name in names if name in errors})
+    return paths
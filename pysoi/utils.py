@@ -4,6 +4,32 @@ import pandas as pd
 import numpy as np
 import requests
 import calendar
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from .ratelimit import get_scheduler
+from .hedge import HedgePolicy
+from .sources import mirror_urls
+
+
+# One pooled session per thread; requests.Session is not guaranteed thread-safe
+_local = threading.local()
+
+# Optional pysoi.tailsync.TailCache used by check_response
+_tail_cache = None
+
+# Optional function mapping a source URL to the URL actually requested
+_url_rewriter = None
+
+# Hedging policy for sources with mirrors (None to always use the primary)
+_hedge_policy = HedgePolicy()
+
+# Optional pysoi.transport.Transport replacing HTTP for every fetch
+_transport = None
+
+MONTH_ABBRS = [calendar.month_abbr[i] for i in range(1, 13)]
+ENSO_PHASES = ["Cool Phase/La Nina", "Neutral Phase", "Warm Phase/El Nino"]
+OUTPUT_FORMATS = ("pandas", "arrow", "numpy")
 
 
 def abbr_month(date):
@@ -19,10 +45,195 @@ def abbr_month(date):
     if not pd.api.types.is_datetime64_any_dtype(date):
         raise TypeError("Not a pandas datetime object")
     
-    month_abbrs = [calendar.month_abbr[i] for i in range(1, 13)]
     month_series = pd.Series(date.dt.strftime('%b'), index=date.index)
     
-    return pd.Categorical(month_series, categories=month_abbrs, ordered=True)
+    return pd.Categorical(month_series, categories=MONTH_ABBRS, ordered=True)
+
+
+def get_session():
+    """
+    Return the pooled requests.Session for the current thread.
+
+    Returns:
+        requests.Session reused across calls so connections are kept alive
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        _local.session = session
+    return session
+
+
+def set_url_rewriter(rewriter):
+    """
+    Install a function that maps each source URL to the URL actually requested.
+    
+    Rate limits still apply per original host. Used to point downloads at a
+    local replay server; pass None to restore direct requests.
+    
+    Returns:
+        The previously installed rewriter
+    """
+    global _url_rewriter
+    previous = _url_rewriter
+    _url_rewriter = rewriter
+    return previous
+
+
+def set_hedge_policy(policy):
+    """
+    Install the pysoi.hedge.HedgePolicy used for sources with mirrors.
+    
+    Pass None to always request the URL given, without hedging.
+    
+    Returns:
+        The previously installed policy
+    """
+    global _hedge_policy
+    previous = _hedge_policy
+    _hedge_policy = policy
+    return previous
+
+
+def get_hedge_policy():
+    """Return the installed HedgePolicy, or None."""
+    return _hedge_policy
+
+
+def _send(url, method, on_admit=None, **kwargs):
+    host = urlsplit(url).hostname
+    if _url_rewriter is not None:
+        url = _url_rewriter(url)
+    return get_scheduler().request(get_session(), method, url, host=host, on_admit=on_admit, **kwargs)
+
+
+def set_transport(transport, local=False):
+    """
+    Install a pysoi.transport.Transport that serves every `fetch`.
+    
+    Pass None to restore HTTP requests.
+    
+    Args:
+        transport: Transport, or None
+        local: Install for the current thread only, overriding the global one
+    
+    Returns:
+        The previously installed transport at the same scope
+    """
+    global _transport
+    if local:
+        previous = getattr(_local, "transport", None)
+        _local.transport = transport
+        return previous
+    previous = _transport
+    _transport = transport
+    return previous
+
+
+def get_transport():
+    """Return the transport serving the current thread, or None for HTTP."""
+    transport = getattr(_local, "transport", None)
+    return _transport if transport is None else transport
+
+
+def carry_transport(function):
+    """
+    Wrap a function so it runs with the calling thread's transport.
+    
+    Thread-local transports do not follow work handed to a thread pool, so
+    functions submitted to one are wrapped with this first.
+    """
+    transport = getattr(_local, "transport", None)
+    if transport is None:
+        return function
+
+    def run(*args, **kwargs):
+        previous = set_transport(transport, local=True)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            set_transport(previous, local=True)
+
+    return run
+
+
+def fetch(url, method="GET", **kwargs):
+    """
+    Issue a request through the installed transport.
+
+    Without a transport (see `set_transport`) this is `fetch_http`.
+
+    Args:
+        url: URL to request
+        method: HTTP method
+        **kwargs: Passed through to the transport
+
+    Returns:
+        requests.Response
+    """
+    transport = get_transport()
+    if transport is not None:
+        return transport.send(url, method, **kwargs)
+    return fetch_http(url, method, **kwargs)
+
+
+def fetch_http(url, method="GET", **kwargs):
+    """
+    Issue a request through the shared per-host scheduler.
+
+    Every download goes through here so the per-host rate limits and
+    in-flight caps in `pysoi.ratelimit` apply across all downloaders. GET
+    requests for a source with mirrors are hedged across them (see
+    `pysoi.hedge.HedgePolicy`).
+
+    Args:
+        url: URL to request
+        method: HTTP method
+        **kwargs: Passed through to `requests.Session.request`
+
+    Returns:
+        requests.Response
+    """
+    policy = _hedge_policy
+    if policy is not None and method == "GET":
+        urls = mirror_urls(url)
+        if len(urls) > 1:
+            # Stream so a losing mirror can be closed before its body arrives
+            kwargs["stream"] = True
+            return policy.request(urls, lambda mirror, on_admit: _send(mirror, method, on_admit=on_admit,
+                                                                     **kwargs))
+    return _send(url, method, **kwargs)
+
+
+def set_tail_cache(cache):
+    """
+    Install a TailCache used by `check_response`, or None to disable it.
+
+    Returns:
+        The previously installed cache
+    """
+    global _tail_cache
+    previous = _tail_cache
+    _tail_cache = cache
+    return previous
+
+
+def _checked(url, **kwargs):
+    """Fetch `url` and raise the package's errors for unusable responses."""
+    try:
+        response = fetch(url, **kwargs)
+    except requests.ConnectionError:
+        raise ConnectionError("A working internet connection is required to download and import the climate indices.")
+    
+    if response.status_code != 200:
+        response.close()
+        raise ValueError(f"Non successful http request. Target server returning a {response.status_code} error code")
+    
+    if "shutdown" in response.url:
+        response.close()
+        raise RuntimeError("Data source is currently unavailable due to a US government shutdown")
+    
+    return response
 
 
 def check_response(url):
@@ -38,15 +249,301 @@ def check_response(url):
     Raises:
         Exception: If response status code is not 200 or if server is unavailable
     """
+    if _tail_cache is not None:
+        # Only the bytes appended since the last sync are transferred
+        return _tail_cache.fetch(url).content.decode("utf-8", errors="replace")
+    
+    response = _checked(url)
     try:
-        response = requests.get(url)
-        
-        if response.status_code != 200:
-            raise ValueError(f"Non successful http request. Target server returning a {response.status_code} error code")
-        
-        if "shutdown" in response.url:
-            raise RuntimeError("Data source is currently unavailable due to a US government shutdown")
-        
         return response.text
     except requests.ConnectionError:
         raise ConnectionError("A working internet connection is required to download and import the climate indices.")
+
+
+def open_stream(url):
+    """
+    Check the response from server and return it unread for streaming.
+    
+    The body is not downloaded up front; read it from `response.raw` (which
+    transparently decompresses gzip) and close the response when done so the
+    connection returns to the pool.
+    
+    Args:
+        url: URL to open
+        
+    Returns:
+        requests.Response opened with stream=True
+        
+    Raises:
+        Exception: If response status code is not 200 or if server is unavailable
+    """
+    response = _checked(url, stream=True)
+    response.raw.decode_content = True
+    return response
+
+
+def check_responses(urls, max_workers=8):
+    """
+    Fetch several URLs concurrently with `check_response`.
+
+    Concurrency is still bounded per host by the shared scheduler, so
+    `max_workers` only caps the total number of threads.
+
+    Args:
+        urls: Iterable of URLs
+        max_workers: Maximum number of worker threads
+
+    Returns:
+        List of response texts in the same order as `urls`
+    """
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [check_response(url) for url in urls]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(carry_transport(check_response), urls))
+
+
+def check_output(output):
+    """
+    Validate an `output` argument.
+
+    Args:
+        output: One of "pandas", "arrow" or "numpy"
+
+    Raises:
+        ValueError: If the output format is not supported
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"output must be one of {list(OUTPUT_FORMATS)}")
+
+
+def month_dates(years, months):
+    """
+    Build first-of-month dates from year and month number arrays.
+
+    Args:
+        years: Array of years
+        months: Array of month numbers (1-12)
+
+    Returns:
+        numpy.ndarray of datetime64[ns]
+    """
+    years = np.asarray(years, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    return ((years - 1970) * 12 + months - 1).astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def parse_year_table(lines, missing=None, skip_invalid=False):
+    """
+    Parse a "year followed by twelve monthly values" text table.
+
+    Rows with fewer than thirteen fields (headers, trailers and incomplete
+    years) are skipped.
+
+    Args:
+        lines: Iterable of text lines
+        missing: Missing value indicator to convert to NaN
+        skip_invalid: If True, values that are not numbers are dropped instead
+                      of being converted to NaN
+
+    Returns:
+        Tuple of (years, months, values) numpy arrays sorted by date
+    """
+    years = []
+    months = []
+    values = []
+
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 13:  # Need year + 12 months
+            continue
+
+        try:
+            year = int(parts[0])
+        except ValueError:
+            continue
+
+        for month, token in enumerate(parts[1:13], 1):
+            try:
+                value = float(token)
+            except ValueError:
+                if skip_invalid:
+                    continue
+                value = np.nan
+
+            if missing is not None and value == missing:
+                value = np.nan
+
+            years.append(year)
+            months.append(month)
+            values.append(value)
+
+    years = np.array(years, dtype=np.int64)
+    months = np.array(months, dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
+
+    order = np.lexsort((months, years))
+    return years[order], months[order], values[order]
+
+
+def centered_mean(values, window=3):
+    """
+    Centered moving average, NaN wherever the window is incomplete.
+
+    Equivalent to `Series.rolling(window, center=True).mean()` for odd windows.
+
+    Args:
+        values: 1-D array of values
+        window: Odd window length
+
+    Returns:
+        numpy.ndarray of float64
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+
+    half = window // 2
+    total = np.zeros(len(values) - window + 1)
+    for offset in range(window):
+        total += values[offset:len(values) - window + 1 + offset]
+    result[half:len(values) - half] = total / window
+    return result
+
+
+def enso_phase_codes(values):
+    """
+    Classify index values into ENSO phases.
+
+    Args:
+        values: Array of index values
+
+    Returns:
+        numpy.ndarray of int8 codes into ENSO_PHASES (-1 where values are NaN)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.full(len(values), -1, dtype=np.int8)
+    codes[values <= -0.5] = 0
+    codes[(values > -0.5) & (values < 0.5)] = 1
+    codes[values >= 0.5] = 2
+    return codes
+
+
+def pandas_column(values, category=None, tz=None):
+    """
+    Convert one parsed column array to what a DataFrame column is built from.
+
+    Args:
+        values: Column array as returned by a parser
+        category: (categories, ordered) if `values` holds category codes
+        tz: Optional time zone of a datetime column
+
+    Returns:
+        Categorical, Series, DatetimeIndex or numpy array
+    """
+    if category is not None:
+        labels, ordered = category
+        return pd.Categorical.from_codes(values, categories=labels, ordered=ordered)
+    if values.dtype.kind == "U":
+        return pd.Series(np.where(values == "", np.nan, values.astype(object)), dtype=object)
+    if values.dtype.kind == "M" and tz is not None:
+        return pd.DatetimeIndex(values).tz_localize(tz)
+    return values
+
+
+def build_output(columns, categories=None, output="pandas", tz=None, copy=True):
+    """
+    Assemble parsed column arrays into the requested output format.
+
+    Parsers fill plain NumPy arrays; this is the only place a DataFrame or
+    Arrow table gets built, so "arrow" and "numpy" outputs never go through
+    pandas.
+
+    Args:
+        columns: Dict of column name to numpy array, in output order. String
+                 columns use "" for missing values.
+        categories: Dict of column name to (categories, ordered) for columns
+                    holding integer category codes (-1 for missing)
+        output: "pandas" for a DataFrame, "arrow" for a pyarrow.Table with
+                dictionary-encoded categoricals, or "numpy" for a dict of arrays
+                with categoricals decoded to strings
+        tz: Optional time zone of datetime columns
+        copy: False to let a DataFrame use the column arrays without copying
+              them (only for arrays nothing else holds on to)
+
+    Returns:
+        DataFrame, pyarrow.Table or dict of numpy arrays
+    """
+    check_output(output)
+    categories = categories or {}
+
+    if output == "pandas":
+        return pd.DataFrame({name: pandas_column(values, categories.get(name), tz)
+                             for name, values in columns.items()}, copy=copy)
+
+    if output == "arrow":
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError('output="arrow" requires pyarrow. Install it with "pip install pyarrow".')
+
+        arrays = []
+        for name, values in columns.items():
+            if name in categories:
+                labels, ordered = categories[name]
+                indices = pa.array(values.astype(np.int32), mask=values < 0)
+                arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(labels, type=pa.string()),
+                                                             ordered=ordered))
+            elif values.dtype.kind == "U":
+                arrays.append(pa.array(values, type=pa.string(), mask=values == ""))
+            elif values.dtype.kind == "M":
+                arrays.append(pa.array(values, type=pa.timestamp("ns", tz=tz)))
+            else:
+                arrays.append(pa.array(values))
+        return pa.Table.from_arrays(arrays, names=list(columns))
+
+    data = {}
+    for name, values in columns.items():
+        if name in categories:
+            labels, _ = categories[name]
+            lookup = np.array(list(labels) + [""])
+            data[name] = lookup[values]
+        else:
+            data[name] = values
+    return data
+
+
+def frame_to_output(frame, output="pandas"):
+    """
+    Convert a DataFrame into the requested output format.
+
+    Used where results are inherently assembled in pandas (e.g. merges).
+
+    Args:
+        frame: DataFrame
+        output: "pandas", "arrow" or "numpy"
+
+    Returns:
+        DataFrame, pyarrow.Table or dict of numpy arrays
+    """
+    check_output(output)
+    if output == "pandas":
+        return frame
+
+    columns = {}
+    categories = {}
+    for name in frame.columns:
+        series = frame[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[name] = series.cat.codes.to_numpy()
+            categories[name] = ([str(c) for c in series.cat.categories], series.cat.ordered)
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            columns[name] = series.fillna("").to_numpy().astype(str)
+        elif isinstance(series.dtype, pd.DatetimeTZDtype):
+            columns[name] = series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()
+        else:
+            columns[name] = series.to_numpy()
+
+    return build_output(columns, categories, output)
@@ -0,0 +1,327 @@
+"""Vintage store: every fetched version of the monthly indices, queryable as of any time."""
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .parsers import PARSERS
+from .store import MONTHLY_INDICES, month_keys
+
+
+# valid_to of the rows in the latest vintage
+_OPEN = np.iinfo(np.int64).max
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vintages (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    fetched INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    revised INTEGER NOT NULL,
+    removed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    name TEXT NOT NULL,
+    month INTEGER NOT NULL,
+    value REAL,
+    phase TEXT,
+    valid_from INTEGER NOT NULL,
+    valid_to INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS observations_as_of ON observations (name, valid_to, valid_from);
+CREATE INDEX IF NOT EXISTS observations_month ON observations (name, month, valid_from);
+CREATE INDEX IF NOT EXISTS vintages_name ON vintages (name, fetched);
+"""
+
+
+def _ns(when):
+    """Convert a timestamp (naive means UTC) to integer nanoseconds since the epoch."""
+    if when is None:
+        return pd.Timestamp.now(tz="UTC").value
+    when = pd.Timestamp(when)
+    if when.tz is not None:
+        when = when.tz_convert("UTC").tz_localize(None)
+    return when.value
+
+
+def _timestamps(ns):
+    """Convert nanosecond columns back to UTC timestamps (NaT for still-valid rows)."""
+    ns = np.asarray(ns, dtype=np.int64)
+    return pd.to_datetime(np.where(ns == _OPEN, np.iinfo(np.int64).min, ns), utc=True)
+
+
+def _month_dates(months):
+    return np.asarray(months, dtype=np.int64).astype("datetime64[M]").astype("datetime64[ns]")
+
+
+class VintageStore:
+    """
+    SQLite-backed history of every fetched version (vintage) of the monthly indices.
+
+    Each observation is stored once per distinct value with the interval
+    [valid_from, valid_to) during which it was the published value, so a
+    vintage that only appends a month or revises the last few adds only
+    those rows. `as_of` is a single indexed range query; `as_of_many`
+    reconstructs thousands of vintages from one read of the index's history.
+
+    Timestamps may be anything pandas.Timestamp accepts; naive ones are UTC.
+
+    Args:
+        path: SQLite database file (":memory:" for a private in-memory store)
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._history = {}
+        self._data_version = None
+        with self._lock, self._conn:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"VintageStore({self.path!r}, names={self.names})"
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def names(self):
+        """Index names with at least one recorded vintage."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT name FROM vintages ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _check_name(name):
+        if name not in MONTHLY_INDICES:
+            raise ValueError(f"Invalid index: {name}\nValid indices are: {', '.join(MONTHLY_INDICES)}")
+
+    def record(self, name, frame=None, fetched=None):
+        """
+        Record a fetched version of an index.
+
+        Only months that are new, revised (value or phase changed) or no
+        longer published produce rows; an unchanged vintage is logged in the
+        vintages table but stores no observations.
+
+        Args:
+            name: Index name, e.g. "ONI"
+            frame: DataFrame returned by the index's download function
+                   (downloaded now if not given)
+            fetched: Time the version was fetched (defaults to now). Vintages
+                     of an index must be recorded in time order.
+
+        Returns:
+            Dict with the number of months added, revised and removed
+        """
+        self._check_name(name)
+        downloader, value_col, phase_col = MONTHLY_INDICES[name]
+        if frame is None:
+            frame = downloader()
+        fetched = _ns(fetched)
+
+        months = month_keys(frame).tolist()
+        values = frame[value_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        values = [None if np.isnan(value) else float(value) for value in values]
+        if phase_col is not None:
+            phases = [None if pd.isna(phase) else str(phase) for phase in frame[phase_col]]
+        else:
+            phases = [None] * len(months)
+        new = dict(zip(months, zip(values, phases)))
+
+        with self._lock, self._conn:
+            last = self._conn.execute("SELECT MAX(fetched) FROM vintages WHERE name = ?", (name,)).fetchone()[0]
+            if last is not None and fetched < last:
+                raise ValueError(f"Vintages of {name} must be recorded in time order: "
+                                 f"{pd.Timestamp(fetched, tz='UTC')} is before {pd.Timestamp(last, tz='UTC')}")
+
+            current = {
+                month: (rowid, (value, phase))
+                for rowid, month, value, phase in self._conn.execute(
+                    "SELECT rowid, month, value, phase FROM observations WHERE name = ? AND valid_to = ?",
+                    (name, int(_OPEN)))
+            }
+
+            closed = [rowid for month, (rowid, _) in current.items() if month not in new]
+            removed = len(closed)
+            inserted = []
+            revised = 0
+            for month, observation in new.items():
+                if month in current:
+                    rowid, old = current[month]
+                    if old == observation:
+                        continue
+                    closed.append(rowid)
+                    revised += 1
+                inserted.append((name, month, observation[0], observation[1], fetched, int(_OPEN)))
+
+            self._conn.executemany("UPDATE observations SET valid_to = ? WHERE rowid = ?",
+                                   [(fetched, rowid) for rowid in closed])
+            self._conn.executemany("INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?)", inserted)
+            summary = {"added": len(inserted) - revised, "revised": revised, "removed": removed}
+            self._conn.execute("INSERT INTO vintages (name, fetched, added, revised, removed) VALUES (?, ?, ?, ?, ?)",
+                               (name, fetched, summary["added"], revised, removed))
+            self._history.pop(name, None)
+        return summary
+
+    def on_change(self, event):
+        """
+        Record a pysoi.poll.ChangeEvent; subscribe this to a Poller.
+
+        Events for sources that are not monthly indices are ignored.
+        """
+        name = event.name.upper()
+        if name in MONTHLY_INDICES:
+            self.record(name, event.frame, fetched=event.detected)
+
+    def vintages(self, name=None):
+        """
+        Return the log of recorded vintages.
+
+        Args:
+            name: Index name (defaults to every index)
+
+        Returns:
+            DataFrame with name, fetched (UTC) and the months added, revised and removed
+        """
+        query = "SELECT name, fetched, added, revised, removed FROM vintages"
+        params = ()
+        if name is not None:
+            query += " WHERE name = ?"
+            params = (name,)
+        with self._lock:
+            frame = pd.read_sql_query(query + " ORDER BY fetched, id", self._conn, params=params)
+        frame["fetched"] = _timestamps(frame["fetched"])
+        return frame
+
+    def as_of(self, name, when=None):
+        """
+        Reconstruct an index as it was published at a point in time.
+
+        Args:
+            name: Index name, e.g. "ONI"
+            when: Point in time (defaults to now, i.e. the latest vintage)
+
+        Returns:
+            DataFrame with Date, the value column and, for ONI and MEI, the
+            phase column, as returned by the download function at the time
+        """
+        self._check_name(name)
+        _, value_col, phase_col = MONTHLY_INDICES[name]
+        when = _ns(when)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT month, value, phase FROM observations "
+                "WHERE name = ? AND valid_to > ? AND valid_from <= ? ORDER BY month",
+                (name, when, when)).fetchall()
+
+        months = np.array([row[0] for row in rows], dtype=np.int64)
+        frame = pd.DataFrame({
+            "Date": _month_dates(months),
+            value_col: np.array([np.nan if row[1] is None else row[1] for row in rows], dtype=np.float64),
+        })
+        if phase_col is not None:
+            # The phase categories of a fresh download, including their order
+            labels, ordered = PARSERS[name.lower()].categories[phase_col]
+            frame[phase_col] = pd.Categorical([row[2] for row in rows], categories=labels, ordered=ordered)
+        return frame
+
+    def revisions(self, name, date=None):
+        """
+        Return the revision history of an index.
+
+        Args:
+            name: Index name
+            date: Only return the history of this month (defaults to all months)
+
+        Returns:
+            DataFrame with Date, value, phase, valid_from and valid_to (UTC;
+            NaT while the value is still the published one), one row per
+            distinct published value, ordered by month and time
+        """
+        self._check_name(name)
+        query = "SELECT month, value, phase, valid_from, valid_to FROM observations WHERE name = ?"
+        params = [name]
+        if date is not None:
+            query += " AND month = ?"
+            params.append(int(np.datetime64(pd.Timestamp(date).to_datetime64(), "M").astype(np.int64)))
+        with self._lock:
+            frame = pd.read_sql_query(query + " ORDER BY month, valid_from", self._conn, params=params)
+
+        frame.insert(0, "Date", _month_dates(frame.pop("month")))
+        frame["value"] = frame["value"].astype(np.float64)
+        frame["valid_from"] = _timestamps(frame["valid_from"])
+        frame["valid_to"] = _timestamps(frame["valid_to"])
+        return frame
+
+    def _load_history(self, name):
+        """Return (months, values, valid_from, valid_to) arrays for an index, cached."""
+        with self._lock:
+            # Another connection may have recorded vintages since we cached
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._history.clear()
+                self._data_version = data_version
+
+            history = self._history.get(name)
+            if history is None:
+                rows = self._conn.execute(
+                    "SELECT month, value, valid_from, valid_to FROM observations WHERE name = ?",
+                    (name,)).fetchall()
+                history = (
+                    np.array([row[0] for row in rows], dtype=np.int64),
+                    np.array([np.nan if row[1] is None else row[1] for row in rows], dtype=np.float64),
+                    np.array([row[2] for row in rows], dtype=np.int64),
+                    np.array([row[3] for row in rows], dtype=np.int64),
+                )
+                self._history[name] = history
+            return history
+
+    def as_of_many(self, name, whens, chunk_size=512):
+        """
+        Reconstruct an index at many points in time at once.
+
+        The index's history is read once and cached; each point in time is
+        then a vectorized interval test, so thousands of reconstructions cost
+        about as much as one query.
+
+        Args:
+            name: Index name
+            whens: Sequence of points in time
+            chunk_size: Points in time evaluated per block (bounds memory)
+
+        Returns:
+            DataFrame indexed by Date with one column per point in time
+            (NaN where a month was not published at that time)
+        """
+        self._check_name(name)
+        months, values, valid_from, valid_to = self._load_history(name)
+        whens = list(whens)
+        times = np.array([_ns(when) for when in whens], dtype=np.int64)
+
+        axis, position = np.unique(months, return_inverse=True)
+        result = np.full((len(axis), len(times)), np.nan)
+        for start in range(0, len(times), chunk_size):
+            block = times[start:start + chunk_size]
+            # At most one row per month is valid at any time
+            rows, cols = np.nonzero((valid_from[:, None] <= block) & (valid_to[:, None] > block))
+            result[position[rows], cols + start] = values[rows]
+
+        # Drop months that were never published by any of the requested times
+        keep = ~np.isnan(result).all(axis=1) if len(times) else np.zeros(len(axis), dtype=bool)
+        return pd.DataFrame(result[keep], index=pd.DatetimeIndex(_month_dates(axis[keep]), name="Date"),
+                            columns=whens)
@@ -7,8 +7,14 @@ setup(
     install_requires=[
         "pandas>=1.0.0",
         "requests>=2.24.0",
-        "numpy>=1.19.0",
+        "numpy>=1.20.0",
     ],
+    extras_require={
+        "arrow": ["pyarrow>=7.0.0"],
+    },
+    entry_points={
+        "console_scripts": ["pysoi=pysoi.__main__:main"],
+    },
     author="Sam Albers",
     author_email="sam.albers@gmail.com",
     description="Import Various Northern and Southern Hemisphere Climate Indices",
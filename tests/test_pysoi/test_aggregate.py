@@ -0,0 +1,99 @@
+"""Tests for seasonal aggregation and anomalies."""
+
+import pytest
+import numpy as np
+import pandas as pd
+import pysoi.aggregate
+from pysoi import download_soi, use_transport
+from pysoi.aggregate import (season_months, seasonal_mean, annual_mean, anomalies,
+                             climatology, clear_climatology_cache, _CLIMATOLOGY_CACHE)
+
+
+SOI_TABLE = """STANDARDIZED    DATA
+ YEAR   JAN   FEB   MAR   APR   MAY   JUN   JUL   AUG   SEP   OCT   NOV   DEC
+ 2000   1.0   2.0   3.0   4.0   5.0   6.0   7.0   8.0   9.0  10.0  11.0  12.0
+ 2001   3.0   4.0   5.0   6.0   7.0   8.0   9.0  10.0  11.0  12.0  13.0  14.0
+"""
+
+
+def make_frame():
+    """Three years of a monthly index whose value is the month number plus year offset."""
+    dates = pd.date_range("2000-01-01", "2002-12-01", freq="MS")
+    return pd.DataFrame({
+        "Date": dates,
+        "Year": dates.year,
+        "IDX": dates.month + (dates.year - 2000) * 12.0,
+    })
+
+
+def test_season_months():
+    """Test that season strings resolve to calendar months."""
+    assert season_months("DJF") == [12, 1, 2]
+    assert season_months("JJA") == [6, 7, 8]
+    assert season_months([11, 12, 1]) == [11, 12, 1]
+    with pytest.raises(ValueError):
+        season_months("DJA")
+
+
+def test_seasonal_mean_wraps_year():
+    """Test that DJF is labelled by the year of February and needs all months."""
+    result = seasonal_mean(make_frame(), "IDX", "DJF")
+
+    djf = result.set_index("Year")["IDX"]
+    assert np.isnan(djf[2000])  # December 1999 is missing
+    assert djf[2001] == pytest.approx((12 + 13 + 14) / 3)
+
+
+def test_annual_mean_water_year():
+    """Test October-September years labelled by their end year."""
+    result = annual_mean(make_frame(), "IDX", start_month=10).set_index("Year")["IDX"]
+
+    assert result[2001] == pytest.approx(np.mean(np.arange(10, 22)))
+    assert np.isnan(result[2000])
+
+
+def test_anomalies_and_climatology():
+    """Test anomalies and the climatology against a base period."""
+    frame = make_frame()
+
+    anom = anomalies(frame, "IDX", base_period=(2000, 2002))
+    np.testing.assert_allclose(anom["IDX"].to_numpy()[:12], -12.0)
+
+    clim = climatology(frame, "IDX", base_period=(2000, 2002))
+    assert clim.loc["Jan", "IDX_mean"] == pytest.approx(13.0)
+
+    z = anomalies(frame, "IDX", base_period=(2000, 2002), standardize=True)
+    np.testing.assert_allclose(z["IDX"].to_numpy()[:12], -1.0)
+
+
+def test_climatology_cache(monkeypatch):
+    """Test that climatologies of downloaded columns are cached by revision."""
+    clear_climatology_cache()
+    with use_transport({"soi": SOI_TABLE}):
+        soi = download_soi()
+
+    anom = anomalies(soi, "SOI", base_period=(2000, 2001))
+    np.testing.assert_allclose(anom["SOI"].to_numpy()[:12], -1.0)
+    assert len(_CLIMATOLOGY_CACHE) == 1
+
+    # A hit neither reads the values nor recomputes anything
+    def fail(*args):
+        raise AssertionError("climatology recomputed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pysoi.aggregate, "_series", fail)
+        patch.setattr(pysoi.aggregate, "_climatology", fail)
+        clim = climatology(soi.copy(), "SOI", base_period=(2000, 2001))
+    assert clim.loc["Jan", "SOI_mean"] == pytest.approx(2.0)
+
+    # Other options, filtered frames and columns added later are new entries or not cached
+    climatology(soi, "SOI", base_period=(2000, 2001), ddof=0)
+    climatology(soi[soi["Year"] == 2000], "SOI", base_period=(2000, 2001))
+    assert len(_CLIMATOLOGY_CACHE) == 3
+    soi["SOI_x2"] = soi["SOI"] * 2
+    climatology(soi, "SOI_x2", base_period=(2000, 2001))
+    climatology(make_frame(), "IDX", base_period=(2000, 2002))
+    assert len(_CLIMATOLOGY_CACHE) == 3
+
+    clear_climatology_cache()
+    assert len(_CLIMATOLOGY_CACHE) == 0
@@ -0,0 +1,71 @@
+"""Tests for timestamp annotation."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.annotate import annotate
+from pysoi.store import write_store
+
+
+def make_frames():
+    """Build small frames shaped like the download_* outputs."""
+    oni = pd.DataFrame({
+        "Year": [2020, 2020, 2020],
+        "Date": pd.to_datetime(["2020-01-01", "2020-02-01", "2020-03-01"]),
+        "ONI": [0.6, 0.1, -0.7],
+        "phase": pd.Categorical(["Warm Phase/El Nino", "Neutral Phase", "Cool Phase/La Nina"]),
+    })
+    soi = pd.DataFrame({
+        "Date": pd.to_datetime(["2020-02-01", "2020-03-01"]),
+        "SOI": [1.0, 2.0],
+    })
+    return {"ONI": oni, "SOI": soi}
+
+
+TIMESTAMPS = pd.to_datetime(["2020-01-31 23:59", "2020-02-15 00:00", "2020-03-01 00:00", "2019-12-31 00:00", None])
+
+
+def test_annotate_month():
+    result = annotate(TIMESTAMPS, source=make_frames())
+
+    np.testing.assert_allclose(result["ONI"], [0.6, 0.1, -0.7, np.nan, np.nan])
+    np.testing.assert_allclose(result["SOI"], [np.nan, 1.0, 2.0, np.nan, np.nan])
+    assert list(result["ONI_phase"].astype(object)[:3]) == ["Warm Phase/El Nino", "Neutral Phase",
+                                                            "Cool Phase/La Nina"]
+    assert result["ONI_phase"].isna()[3:].all()
+    assert "SOI_phase" not in result
+
+
+def test_annotate_lagged():
+    result = annotate(TIMESTAMPS, ["ONI"], how="lagged", lag=[1, 2], source=make_frames())
+
+    np.testing.assert_allclose(result["ONI_lag1"], [np.nan, 0.6, 0.1, np.nan, np.nan])
+    np.testing.assert_allclose(result["ONI_lag2"], [np.nan, np.nan, 0.6, np.nan, np.nan])
+
+
+def test_annotate_interp():
+    times = pd.to_datetime(["2020-01-16", "2020-02-01", "2020-02-15", "2020-03-31"])
+    result = annotate(times, ["ONI"], how="interp", source=make_frames(), phases=False)
+
+    # Values sit at mid-month (Jan 16 12:00, Feb 15 12:00) and days are taken at midday
+    assert result["ONI"][0] == pytest.approx(0.6)
+    assert result["ONI"][1] == pytest.approx(0.6 - 0.5 * 16 / 30)
+    assert result["ONI"][2] == pytest.approx(0.1)
+    assert np.isnan(result["ONI"][3])
+    assert list(result) == ["ONI"]
+
+
+def test_annotate_store_and_enso_frame(tmp_path):
+    store = write_store(tmp_path / "store", frames=make_frames())
+    from_store = annotate(TIMESTAMPS.tz_localize("UTC"), source=store)
+    np.testing.assert_allclose(from_store["SOI"], [np.nan, 1.0, 2.0, np.nan, np.nan])
+
+    enso = make_frames()["ONI"].merge(make_frames()["SOI"], on="Date", how="left")
+    from_frame = annotate(TIMESTAMPS.to_numpy(), source=enso)
+    np.testing.assert_allclose(from_frame["ONI"], from_store["ONI"])
+    np.testing.assert_allclose(from_frame["SOI"], from_store["SOI"])
+
+    with pytest.raises(ValueError):
+        annotate(TIMESTAMPS, ["NAO"], source=enso)
+    with pytest.raises(ValueError):
+        annotate(TIMESTAMPS, ["ONI"], how="nearest", source=enso)
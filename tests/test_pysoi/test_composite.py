@@ -0,0 +1,82 @@
+"""Tests for phase composites."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.composite import composite
+from pysoi.utils import ENSO_PHASES
+
+
+def make_data(n=120, n_series=5, seed=0):
+    rng = np.random.default_rng(seed)
+    phases = pd.Categorical(rng.choice(ENSO_PHASES, n), categories=ENSO_PHASES)
+    responses = rng.normal(size=(n, n_series))
+    # Only the first series responds to El Nino
+    responses[phases == ENSO_PHASES[2], 0] += 2.0
+    return responses, phases
+
+
+def test_composite_means_match_groupby():
+    responses, phases = make_data()
+    result = composite(responses, phases, n_resamples=500, seed=1)
+
+    expected = pd.DataFrame(responses).groupby(np.asarray(phases), observed=True).mean()
+    np.testing.assert_allclose(result.mean, expected.loc[ENSO_PHASES].to_numpy())
+    assert result.counts.tolist() == [int((phases == phase).sum()) for phase in ENSO_PHASES]
+    assert np.all(result.lower <= result.mean) and np.all(result.mean <= result.upper)
+
+    assert result.significant()[2, 0]
+    assert result.p_value[2, 0] < result.p_value[2, 1:].min()
+
+
+def test_permutation_and_gridded_responses():
+    responses, phases = make_data(n_series=6)
+    grid = responses.reshape(len(responses), 2, 3)
+    result = composite(grid, phases.codes, categories=ENSO_PHASES, method="permutation",
+                       n_resamples=500, seed=1)
+
+    assert result.mean.shape == (3, 2, 3)
+    assert result.p_value[2, 0, 0] < 0.01
+    # The permutation envelope is centred on the overall mean, not the composite
+    assert not (result.lower[2, 0, 0] <= result.mean[2, 0, 0] <= result.upper[2, 0, 0])
+    assert len(result.to_frame()) == 18
+
+
+def test_chunking_and_missing_values():
+    responses, phases = make_data(n_series=7)
+    responses[::10, 3] = np.nan
+    whole = composite(responses, phases, n_resamples=200, seed=3)
+    # One series per chunk draws the same resamples
+    chunked = composite(responses, phases, n_resamples=200, seed=3, chunk_bytes=8 * 200)
+    # The resampled means are float32 products, so compare at that precision
+    np.testing.assert_allclose(whole.lower, chunked.lower, rtol=1e-6)
+    np.testing.assert_allclose(whole.mean[:, 3], pd.DataFrame(responses[:, 3]).groupby(
+        np.asarray(phases), observed=True).mean().loc[ENSO_PHASES, 0])
+
+    with pytest.raises(ValueError):
+        composite(responses, phases[:-1])
+    with pytest.raises(ValueError):
+        composite(responses, phases, method="jackknife")
+
+
+def test_permutation_indicators_in_blocks():
+    responses, phases = make_data(n_series=4)
+    responses[::7, 1] = np.nan
+    whole = composite(responses, phases, method="permutation", n_resamples=300, seed=5)
+    # Too small for the indicators of every permutation, so they are built in blocks
+    blocked = composite(responses, phases, method="permutation", n_resamples=300, seed=5,
+                        chunk_bytes=4 * 3 * len(responses) * 50)
+    np.testing.assert_allclose(whole.lower, blocked.lower, rtol=1e-6)
+    np.testing.assert_allclose(whole.p_value, blocked.p_value)
+
+
+def test_bootstrap_weights_in_blocks():
+    responses, phases = make_data(n_series=3)
+    whole = composite(responses, phases, n_resamples=600, seed=2)
+    # Room for only 256 resamples of counts at a time, drawn in the workers
+    small = 2 * 4 * len(responses) * 256
+    for processes in (None, 2):
+        blocked = composite(responses, phases, n_resamples=600, seed=2, chunk_bytes=small,
+                            processes=processes)
+        np.testing.assert_allclose(whole.lower, blocked.lower, rtol=1e-6)
+        np.testing.assert_allclose(whole.p_value, blocked.p_value, atol=2 / 600)
@@ -0,0 +1,126 @@
+"""Tests for the streaming ASYMSAM ingestion."""
+
+import io
+import pytest
+import numpy as np
+import pandas as pd
+import pysoi.download_asymsam as asymsam
+
+
+DAILY_CSV = """Lev,Date,Index,Value,R.squared,dump
+700,1979-01-01,sam,0.1,0.5,x
+700,1979-01-01,ssam,0.2,0.4,x
+700,1979-01-01,asam,0.3,0.3,x
+700,1979-01-02,sam,0.4,0.5,x
+700,1979-01-02,ssam,0.5,0.4,x
+700,1979-01-02,asam,0.6,0.3,x
+700,1979-01-03,sam,0.7,0.5,x
+"""
+
+
+class FakeStream:
+    def __init__(self, text):
+        self.raw = io.BytesIO(text.encode())
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    streams = []
+
+    def open_stream(url):
+        stream = FakeStream(DAILY_CSV.replace("700,", f"{url.split('_')[-1][:-7]},"))
+        streams.append(stream)
+        return stream
+
+    monkeypatch.setattr(asymsam, "open_stream", open_stream)
+    return streams
+
+
+def test_iter_asymsam_daily_filters(fake_stream):
+    """Test that unwanted index types and dates are dropped while reading."""
+    chunks = list(asymsam.iter_asymsam_daily([700], indices=["sam"], start="1979-01-02", chunksize=2))
+
+    data = pd.concat(chunks, ignore_index=True)
+    assert list(data["Value"]) == [0.4, 0.7]
+    assert list(data["Index"].cat.categories) == ["sam", "ssam", "asam"]
+    assert all(stream.closed for stream in fake_stream)
+
+
+def test_download_asymsam_daily_stream(fake_stream):
+    """Test that stream mode appends every level into one result."""
+    data = asymsam.download_asymsam_daily([700, 850], stream=True, end="1979-01-02")
+
+    assert isinstance(data, pd.DataFrame)
+    assert list(data.columns) == ["Lev", "Date", "Index", "Value", "R.squared"]
+    assert len(data) == 12
+    assert list(np.unique(data["Lev"])) == [700, 850]
+    assert data["Lev"].dtype == np.int32
+
+
+def test_stream_skips_failed_level(fake_stream, monkeypatch, capsys):
+    """Test that a level failing part way is dropped, as without streaming."""
+    iter_daily = asymsam.iter_asymsam_daily
+
+    def failing(level, **kwargs):
+        for chunk in iter_daily(level, chunksize=2, **kwargs):
+            yield chunk
+            if level == 850:
+                raise ConnectionError("dropped")
+
+    monkeypatch.setattr(asymsam, "iter_asymsam_daily", failing)
+    data = asymsam.download_asymsam_daily([700, 850], stream=True)
+    assert list(np.unique(data["Lev"])) == [700]
+    assert len(data) == 7
+    assert "Error downloading level 850: dropped" in capsys.readouterr().out
+
+    cube = asymsam.download_asymsam_daily([700, 850], output="cube", stream=True)
+    assert list(cube.levels) == [700]
+    assert int((~np.isnan(cube.values)).sum()) == 7
+
+
+def test_column_buffer_grows():
+    """Test that the column buffer keeps earlier rows when it grows and hands over trimmed columns."""
+    buffer = asymsam._ColumnBuffer({"x": np.float64}, capacity=2)
+    buffer.append({"x": np.array([1.0, 2.0])})
+    buffer.append({"x": np.array([3.0, 4.0, 5.0])})
+    buffer.append({"x": np.array([6.0])})
+
+    column = buffer.take()["x"]
+    np.testing.assert_array_equal(column, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    assert column.flags.owndata and column.base is None
+
+
+def test_invalid_indices():
+    """Test that unknown index types raise a ValueError."""
+    with pytest.raises(ValueError):
+        asymsam.iter_asymsam_daily([700], indices=["bad"]).__next__()
+
+
+def test_download_asymsam_daily_cube(fake_stream):
+    """Test the dense time x level x index representation."""
+    cube = asymsam.download_asymsam_daily([700, 850], output="cube", stream=True)
+
+    assert cube.shape == (3, 2, 3)
+    assert cube.values.dtype == np.float32
+    assert list(cube.levels) == [700, 850]
+    np.testing.assert_allclose(cube.series(850, "ssam"), [0.2, 0.5, np.nan])
+    np.testing.assert_allclose(cube.profile("1979-01-02", "asam"), [0.6, 0.6])
+    np.testing.assert_allclose(cube.r_squared[0, 0], [0.5, 0.4, 0.3])
+
+    # Date ranges and contiguous selections are views
+    part = cube.sel(start="1979-01-02", levels=[850], indices=["ssam", "asam"])
+    assert part.shape == (2, 1, 2)
+    assert np.shares_memory(part.values, cube.values)
+    with pytest.raises(ValueError):
+        cube.sel(levels=[500])
+
+    # Round trip back to the long format, dropping the missing cells
+    frame = cube.to_frame()
+    expected = asymsam.download_asymsam_daily([700, 850], stream=True)
+    assert len(frame) == len(expected)
+    np.testing.assert_allclose(frame["Value"], expected["Value"], rtol=1e-6)
+    assert list(frame["Index"].astype(str)) == list(expected["Index"].astype(str))
@@ -0,0 +1,58 @@
+"""Tests for the lagged feature-matrix builder."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.features import FeatureBuilder, build_features
+from pysoi.store import write_store
+
+
+def make_frames():
+    dates = pd.date_range("2000-01-01", periods=24, freq="MS")
+    oni = pd.DataFrame({"Date": dates, "ONI": np.arange(24, dtype=float),
+                        "phase": pd.Categorical(["Neutral Phase"] * 24)})
+    soi = pd.DataFrame({"Date": dates[6:], "SOI": -np.arange(18, dtype=float)})
+    return {"ONI": oni, "SOI": soi}
+
+
+def test_lags_match_shift():
+    features = build_features(lags=[0, 1, 3], windows=3, source=make_frames())
+    assert features.columns == ["ONI", "ONI_lag1", "ONI_lag3", "ONI_mean3",
+                                "SOI", "SOI_lag1", "SOI_lag3", "SOI_mean3"]
+
+    frame = features.to_frame()
+    oni = make_frames()["ONI"].set_index("Date")["ONI"]
+    np.testing.assert_allclose(frame["ONI_lag3"], oni.shift(3))
+    np.testing.assert_allclose(frame["ONI_mean3"], oni.rolling(3).mean())
+    soi = make_frames()["SOI"].set_index("Date")["SOI"].reindex(frame.index)
+    np.testing.assert_allclose(frame["SOI_mean3"], soi.rolling(3).mean())
+
+    # SOI starts six months later and needs three months of lags on top
+    assert features.valid.sum() == 24 - 9
+    assert features.to_frame(valid_only=True).index[0] == pd.Timestamp("2000-10-01")
+
+
+def test_range_keeps_history_and_per_index_specs(tmp_path):
+    store = write_store(tmp_path / "store", frames=make_frames())
+    builder = FeatureBuilder(["ONI"], source=store)
+    features = builder.build(lags={"oni": 2}, start="2001-01", end="2001-03", dtype=np.float32)
+
+    assert features.values.dtype == np.float32
+    assert features.columns == ["ONI", "ONI_lag1", "ONI_lag2"]
+    np.testing.assert_allclose(features.values[0], [12, 11, 10])
+    assert features.valid.all()
+
+    with pytest.raises(ValueError):
+        builder.build(lags=[-1])
+    with pytest.raises(ValueError):
+        builder.build(windows={"SOI": 3})
+
+
+def test_builder_reuses_base_matrix():
+    builder = FeatureBuilder(source=make_frames())
+    base = builder.base
+    first = builder.build(lags=2)
+    second = builder.build(windows=3)
+    # Builds only fill new outputs from the one aligned, read-only base
+    assert builder.base is base and not base.flags.writeable
+    assert not np.shares_memory(first.values, second.values)
@@ -0,0 +1,132 @@
+"""Tests for hedged requests across mirrors."""
+
+import threading
+import time
+import pytest
+import pysoi.utils
+from pysoi.hedge import HedgePolicy, LatencyTracker
+from pysoi.sources import mirror_urls, source_url
+
+
+class FakeResponse:
+    def __init__(self, url, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class Mirrors:
+    """send() stand-in answering each URL after a configured delay."""
+
+    def __init__(self, delays, status=None, queued=None):
+        self.delays = delays
+        self.status = status or {}
+        self.queued = queued or {}
+        self.responses = {}
+        self.calls = []
+
+    def __call__(self, url, on_admit):
+        self.calls.append(url)
+        # Time spent waiting on the rate limiter, then the request itself
+        time.sleep(self.queued.get(url, 0.0))
+        on_admit()
+        time.sleep(self.delays[url])
+        if self.status.get(url) == "error":
+            raise ConnectionError(url)
+        response = FakeResponse(url, self.status.get(url, 200))
+        self.responses[url] = response
+        return response
+
+
+def test_mirror_urls():
+    mei = mirror_urls(source_url("mei"))
+    assert [url.split("/")[2] for url in mei] == ["psl.noaa.gov", "www.esrl.noaa.gov"]
+    assert mirror_urls(source_url("oni")) == [source_url("oni")]
+    assert mirror_urls("https://example.org/file") == ["https://example.org/file"]
+
+
+def test_fast_primary_is_not_hedged():
+    policy = HedgePolicy(budget=0.5)
+    send = Mirrors({"http://a/f": 0.0, "http://b/f": 0.0})
+    assert policy.request(["http://a/f", "http://b/f"], send).url == "http://a/f"
+    assert send.calls == ["http://a/f"]
+    assert policy.hedged == 0
+
+
+def test_slow_primary_is_hedged_and_loser_closed():
+    policy = HedgePolicy(budget=0.05)
+    send = Mirrors({"http://slow/f": 0.5, "http://fast/f": 0.0})
+
+    response = policy.request(["http://slow/f", "http://fast/f"], send)
+    assert response.url == "http://fast/f"
+    assert policy.hedged == 1
+    # The loser is closed once it returns
+    time.sleep(0.6)
+    assert send.responses["http://slow/f"].closed.is_set()
+    assert not response.closed.is_set()
+
+    # Latency statistics now put the fast mirror first
+    assert policy.tracker.order(["http://slow/f", "http://fast/f"]) == ["http://fast/f", "http://slow/f"]
+
+
+def test_queueing_and_same_host_mirrors_are_not_hedged():
+    # Waiting on the limiter doesn't count against the budget or the latency
+    policy = HedgePolicy(budget=0.1)
+    send = Mirrors({"http://a/f": 0.0, "http://b/f": 0.0}, queued={"http://a/f": 0.4})
+    assert policy.request(["http://a/f", "http://b/f"], send).url == "http://a/f"
+    assert send.calls == ["http://a/f"]
+    assert policy.tracker.estimate("http://a/f") < 0.1
+
+    # Another scheme on the same host is the same server
+    policy = HedgePolicy(budget=0.05)
+    send = Mirrors({"http://a/f": 0.3, "https://a/f": 0.0})
+    assert policy.request(["http://a/f", "https://a/f"], send).url == "http://a/f"
+    assert send.calls == ["http://a/f"]
+    assert policy.hedged == 0
+
+
+def test_failures_fall_through_to_mirrors():
+    policy = HedgePolicy(budget=5.0)
+    send = Mirrors({"http://a/f": 0.0, "http://b/f": 0.0}, status={"http://a/f": "error"})
+    # A quick failure moves straight on without waiting out the budget
+    start = time.monotonic()
+    assert policy.request(["http://a/f", "http://b/f"], send).url == "http://b/f"
+    assert time.monotonic() - start < 1.0
+
+    # With every mirror failing the primary's outcome is returned
+    send = Mirrors({"http://a/f": 0.0, "http://b/f": 0.0}, status={"http://a/f": 404, "http://b/f": "error"})
+    assert HedgePolicy(budget=5.0).request(["http://a/f", "http://b/f"], send).status_code == 404
+    send = Mirrors({"http://a/f": 0.0, "http://b/f": 0.0}, status={"http://a/f": "error", "http://b/f": "error"})
+    with pytest.raises(ConnectionError):
+        HedgePolicy(budget=5.0).request(["http://a/f", "http://b/f"], send)
+
+
+def test_latency_tracker_ewma():
+    tracker = LatencyTracker(alpha=0.5)
+    tracker.record("https://a.org/x", 1.0)
+    tracker.record("https://a.org/y", 3.0)
+    assert tracker.estimate("https://a.org/z") == pytest.approx(2.0)
+    assert tracker.estimate("http://a.org/z") is None
+
+
+def test_fetch_hedges_sources_with_mirrors(monkeypatch):
+    requested = []
+
+    def send(url, method, **kwargs):
+        requested.append((url, kwargs.get("stream")))
+        return FakeResponse(url)
+
+    monkeypatch.setattr(pysoi.utils, "_send", send)
+    pysoi.utils.fetch(source_url("mei"))
+    pysoi.utils.fetch(source_url("npgo"))
+    assert requested == [(source_url("mei"), True), (source_url("npgo"), None)]
+
+    previous = pysoi.utils.set_hedge_policy(None)
+    try:
+        pysoi.utils.fetch(source_url("mei"))
+        assert requested[-1] == (source_url("mei"), None)
+    finally:
+        pysoi.utils.set_hedge_policy(previous)
@@ -0,0 +1,85 @@
+"""Tests for the parsed-result cache."""
+
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pysoi.download_ao import download_ao
+from pysoi.parsecache import (ParseCache, cached_parse, enable_parse_cache, disable_parse_cache,
+                              PARSER_VERSION)
+
+
+AO_TABLE = """        Jan     Feb     Mar     Apr     May     Jun     Jul     Aug     Sep     Oct     Nov     Dec
+  1950  -0.060   0.627  -0.008   0.555   0.072   0.539  -0.802  -0.851   0.358  -0.379  -0.515  -1.928
+  1951  -0.086  -0.267  -0.447   0.318   0.389  -0.129  -0.390   0.256  -0.085  -0.567  -0.011  -0.030
+"""
+
+
+@pytest.fixture
+def parse_cache(tmp_path):
+    cache = enable_parse_cache(tmp_path)
+    yield cache
+    disable_parse_cache()
+
+
+def test_cached_parse_skips_identical_payloads(parse_cache):
+    calls = []
+
+    def parse(payload):
+        calls.append(payload)
+        return {"a": np.arange(3), "b": np.array(["x", "y", ""])}
+
+    first = cached_parse("test", "payload", parse)
+    second = cached_parse("test", "payload", parse)
+    cached_parse("test", "other payload", parse)
+    cached_parse("test", "payload", parse, version=PARSER_VERSION + 1)
+
+    assert calls == ["payload", "other payload", "payload"]
+    assert list(second) == ["a", "b"]
+    np.testing.assert_array_equal(first["b"], second["b"])
+
+    # Returned arrays are copies, so callers can't corrupt the cache
+    second["a"][0] = 99
+    assert cached_parse("test", "payload", parse)["a"][0] == 0
+
+
+def test_parse_cache_reads_from_disk(tmp_path):
+    columns = {"Date": np.array(["2000-01-01"], dtype="datetime64[ns]"), "dSST3.4": np.array([0.5])}
+    key = ParseCache.key("oni", b"payload")
+    ParseCache(tmp_path).put(key, columns)
+
+    # A fresh cache has an empty memory layer and loads the .npz file
+    loaded = ParseCache(tmp_path).get(key)
+    assert list(loaded) == ["Date", "dSST3.4"]
+    assert loaded["Date"].dtype == np.dtype("datetime64[ns]")
+    assert ParseCache(tmp_path).get(ParseCache.key("oni", b"changed")) is None
+
+
+def test_download_uses_parse_cache(parse_cache, monkeypatch):
+    monkeypatch.setattr(sys.modules["pysoi.download_ao"], "check_response", lambda url: AO_TABLE)
+
+    first = download_ao()
+    second = download_ao()
+
+    assert parse_cache.misses == 1
+    assert parse_cache.hits == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_asymsam_downloads_use_parse_cache(parse_cache, monkeypatch):
+    monthly = "lev,index,time,mean_estimated,mean_r.squared\n700,sam,1979-01-01,-0.376,0.883\n700,asam,1979-01-01,0.1,0.2\n"
+    daily = "Lev,Date,Index,Value,R.squared,dump\n700,1979-01-01,ssam,-0.969,0.644,x\n"
+    module = sys.modules["pysoi.download_asymsam"]
+    monkeypatch.setattr(module, "check_response", lambda url: monthly if "monthly" in url else daily)
+
+    first = module.download_asymsam_monthly(indices="sam")
+    second = module.download_asymsam_monthly(indices="sam")
+    module.download_asymsam_daily(700)
+    daily_frame = module.download_asymsam_daily(700)
+
+    assert parse_cache.misses == 2
+    assert parse_cache.hits == 2
+    pd.testing.assert_frame_equal(first, second)
+    assert first["Index"].tolist() == ["sam"]
+    assert list(daily_frame["Index"].cat.categories) == ["sam", "ssam", "asam"]
+    assert list(daily_frame.columns) == ["Lev", "Date", "Index", "Value", "R.squared"]
@@ -0,0 +1,85 @@
+"""Tests for lazily derived columns."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pysoi import download_npgo, download_oni, use_transport
+from pysoi.parsers import LazyColumns, Derived
+
+
+ONI_TABLE = """YR   MON  TOTAL ClimAdjust ANOM
+1950   1   24.56   26.18   -1.62
+1950   2   25.07   26.39   -1.32
+1950   3   25.88   26.95   -1.07
+1950   4   26.29   27.39   -1.11
+1950   5   26.19   27.56   -0.37
+1950   6   26.47   27.21    0.26
+1950   7   26.28   26.72    0.56
+1950   8   25.88   26.30    0.58
+"""
+
+
+def test_lazy_columns_compute_once():
+    calls = []
+
+    def double(values):
+        calls.append(1)
+        return values * 2
+
+    columns = LazyColumns({"a": np.arange(3)}, {"b": Derived("b", double, ["a"])})
+    assert list(columns) == ["a", "b"]
+    assert list(columns.select(False)) == ["a"]
+    assert calls == []
+    np.testing.assert_array_equal(columns["b"], [0, 2, 4])
+    columns.select(True)
+    assert calls == [1]
+    with pytest.raises(ValueError):
+        columns.select(["c"])
+
+
+def test_raw_download_derives_on_access():
+    with use_transport({"oni": ONI_TABLE}):
+        eager = download_oni()
+        raw = download_oni(derived=False)
+        some = download_oni(derived=["phase"])
+        arrays = download_oni(output="numpy", derived=False)
+
+    assert list(raw.columns) == ["Year", "Month", "Date", "dSST3.4"]
+    assert list(some.columns) == ["Year", "Month", "Date", "dSST3.4", "phase"]
+    assert list(arrays) == ["Year", "Month", "Date", "dSST3.4"]
+    assert raw.pysoi.available() == ["ONI", "ONI_month_window", "phase"]
+
+    pd.testing.assert_series_equal(raw.pysoi["phase"], eager["phase"])
+    assert "ONI" not in raw.columns
+    raw.pysoi.derive()
+    pd.testing.assert_frame_equal(raw[eager.columns], eager)
+
+    with pytest.raises(ValueError):
+        pd.DataFrame({"x": [1]}).pysoi.derive()
+
+
+def test_filtered_frame_derives_from_full_download():
+    with use_transport({"oni": ONI_TABLE}):
+        eager = download_oni()
+        raw = download_oni(derived=False)
+
+    # The centered windows need the neighbouring months the filter removed
+    filtered = raw[raw["Month"].isin(["Feb", "May", "Jul"])]
+    pd.testing.assert_series_equal(filtered.pysoi["ONI"], eager.loc[filtered.index, "ONI"])
+    pd.testing.assert_series_equal(filtered.pysoi["phase"], eager.loc[filtered.index, "phase"])
+    assert "ONI" not in raw.columns
+
+    with pytest.raises(ValueError):
+        raw[raw["Month"] == "Jul"].reset_index(drop=True).pysoi.derive("ONI")
+    with pytest.raises(ValueError):
+        raw.set_index("Date").pysoi.derive("ONI")
+    with pytest.raises(ValueError):
+        raw.pysoi.derive("SOI")
+
+
+def test_npgo_skips_short_lines():
+    table = "# NPGO index\n1950  1  -1.5\n\n1950  2\n   \n1950  3  0.25  extra\n"
+    with use_transport({"npgo": table}):
+        npgo = download_npgo()
+    assert npgo["NPGO"].tolist() == [-1.5, 0.25]
+    assert npgo["Month"].tolist() == ["Jan", "Mar"]
@@ -0,0 +1,126 @@
+"""Tests for the publication-aware poller."""
+
+import pandas as pd
+import pytest
+import pysoi.utils
+from pysoi.poll import Poller, new_rows
+from pysoi.sources import MONTHLY, DAILY
+
+
+AO_HEADER = "        Jan     Feb     Mar     Apr     May     Jun     Jul     Aug     Sep     Oct     Nov     Dec\n"
+AO_1950 = "  1950  -0.060   0.627  -0.008   0.555   0.072   0.539  -0.802  -0.851   0.358  -0.379  -0.515  -1.928\n"
+AO_1951 = "  1951  -0.086  -0.267  -0.447   0.318   0.389  -0.129  -0.390   0.256  -0.085  -0.567  -0.011  -0.030\n"
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode("utf-8")
+        self.headers = headers or {}
+        self.url = "https://example.org/ao"
+
+
+class FakeServer:
+    """Answers conditional requests for a single file."""
+
+    def __init__(self, content, etag='"v1"'):
+        self.content = content
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, url, method="GET", headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == self.etag:
+            return FakeResponse(304, headers={"ETag": self.etag})
+        return FakeResponse(200, self.content.encode("utf-8"), {"ETag": self.etag})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer(AO_HEADER + AO_1950)
+    monkeypatch.setattr(pysoi.utils, "fetch", server)
+    return server
+
+
+def test_new_rows():
+    previous = pd.DataFrame({"Date": pd.to_datetime(["2000-01-01", "2000-02-01"]), "X": [1.0, 2.0]})
+    frame = pd.DataFrame({"Date": pd.to_datetime(["2000-01-01", "2000-02-01", "2000-03-01"]),
+                          "X": [1.0, 2.5, 3.0]})
+    assert new_rows(frame, previous)["X"].tolist() == [3.0]
+    assert len(new_rows(frame, None)) == 3
+
+
+def test_poller_conditional_requests_and_backoff(server):
+    clock = FakeClock()
+    poller = Poller(["ao"], clock=clock)
+    events = []
+    poller.subscribe(events.append)
+
+    # First poll loads the data and reports every row as new
+    assert poller.run_pending()[0].name == "ao"
+    assert len(events[0].new_rows) == 12
+    assert poller.state("ao")["next_poll"] == pytest.approx(MONTHLY / 30)
+
+    # Unchanged polls are 304s and the interval grows up to half the cadence
+    intervals = []
+    for _ in range(6):
+        clock.now = poller.state("ao")["next_poll"]
+        assert poller.run_pending() == []
+        intervals.append(poller.state("ao")["interval"])
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    assert intervals[1] == 2 * intervals[0]
+    assert intervals[-1] == MONTHLY / 2
+
+    # A new year of data fires the callback with just the new rows
+    server.content, server.etag = AO_HEADER + AO_1950 + AO_1951, '"v2"'
+    clock.now = poller.state("ao")["next_poll"]
+    event = poller.poll("ao")
+    assert events[-1] is event
+    assert event.new_rows["Year"].unique().tolist() == [1951]
+    # Nothing new is expected for most of a month
+    assert poller.state("ao")["next_poll"] == pytest.approx(clock.now + 0.8 * MONTHLY)
+
+
+def test_poller_errors_back_off(server, monkeypatch):
+    clock = FakeClock()
+    poller = Poller(["asymsam_monthly"], clock=clock)
+    monkeypatch.setattr(pysoi.utils, "fetch", lambda url, **kwargs: FakeResponse(500))
+
+    assert poller.poll("asymsam_monthly") is None
+    state = poller.state("asymsam_monthly")
+    assert "500" in state["error"]
+    assert state["interval"] == pytest.approx(2 * DAILY / 30)
+
+
+def test_callback_filtering(server):
+    poller = Poller(["ao"], clock=FakeClock())
+    seen = []
+    poller.subscribe(seen.append, names=["oni"])
+    poller.poll("ao")
+    assert seen == []
+
+
+def test_failing_callback_warns(server):
+    poller = Poller(["ao"], clock=FakeClock())
+    seen = []
+
+    def broken(event):
+        raise KeyError("missing")
+
+    poller.subscribe(broken)
+    poller.subscribe(seen.append)
+    with pytest.warns(RuntimeWarning, match="Error in callback for ao"):
+        event = poller.poll("ao")
+    # The other subscribers still hear about the change
+    assert seen == [event]
+    assert poller.state("ao")["changes"] == 1
@@ -0,0 +1,91 @@
+"""Tests for the per-host rate limiter."""
+
+import pytest
+from datetime import datetime, timezone
+from pysoi.ratelimit import TokenBucket, RequestScheduler, parse_retry_after
+
+
+class FakeClock:
+    """Manually advanced clock whose sleep moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        return self.responses.pop(0)
+
+
+def test_parse_retry_after():
+    """Test that both delta-seconds and HTTP dates are understood."""
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+
+    now = datetime(2024, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("Mon, 01 Jan 2024 00:00:30 GMT", now=now) == 30.0
+
+
+def test_token_bucket_rate():
+    """Test that requests beyond the burst are spaced at the sustained rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        bucket.acquire()
+
+    # Two free tokens, then one every half second
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_token_bucket_rejects_bad_rate():
+    """Test that a non-positive rate raises a ValueError."""
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+
+
+def test_scheduler_honours_retry_after():
+    """Test that a 429 pauses the host for the Retry-After interval before retrying."""
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep)
+    session = FakeSession([FakeResponse(429, {"Retry-After": "10"}), FakeResponse(200)])
+
+    response = scheduler.request(session, "GET", "https://www.cpc.ncep.noaa.gov/data/indices/soi")
+
+    assert response.status_code == 200
+    assert len(session.calls) == 2
+    assert clock.now == pytest.approx(10.0)
+
+
+def test_scheduler_configure_host():
+    """Test that per-host limits can be overridden."""
+    scheduler = RequestScheduler()
+    scheduler.configure_host("example.com", rate=1.0, max_in_flight=1)
+
+    limits = scheduler.limits("example.com")
+    assert limits["rate"] == 1.0
+    assert limits["max_in_flight"] == 1
+    assert scheduler.limiter("example.com").max_in_flight == 1
@@ -0,0 +1,68 @@
+"""Tests for the local replay server."""
+
+import os
+import pytest
+import requests
+import pandas as pd
+from pysoi import download_ao
+from pysoi.replay import ReplayServer, redirect, benchmark
+from pysoi.sources import source_url, url_path
+from pysoi.utils import check_response
+
+
+AO_TABLE = """        Jan   Feb   Mar   Apr   May   Jun   Jul   Aug   Sep   Oct   Nov   Dec
+1950 -0.060 0.627 -0.008 0.555 0.072 0.539 -0.802 -0.851 0.358 -0.379 -0.515 -1.928
+1951 -0.085 -0.400 -1.934 -0.776 -0.863 -0.918 0.090 -0.377 -0.818 -0.213 -0.069 1.987
+"""
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    path = tmp_path / url_path(source_url("ao"))
+    os.makedirs(path.parent)
+    path.write_text(AO_TABLE)
+    return tmp_path
+
+
+def test_download_through_replay(recordings):
+    """Test that a download function reads the recorded copy."""
+    with ReplayServer(recordings) as server, redirect(server):
+        ao = download_ao()
+
+    assert isinstance(ao, pd.DataFrame)
+    assert len(ao) == 24
+    assert server.stats["requests"] == 1
+
+
+def test_replay_conditional_and_range(recordings):
+    """Test ETag revalidation and byte ranges."""
+    with ReplayServer(recordings) as server:
+        url = f"{server.url}/{url_path(source_url('ao'))}"
+        first = requests.get(url)
+        assert first.status_code == 200
+
+        etag = first.headers["ETag"]
+        assert requests.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        partial = requests.get(url, headers={"Range": "bytes=10-19", "If-Range": etag})
+        assert partial.status_code == 206
+        assert partial.content == AO_TABLE.encode()[10:20]
+
+        stale = requests.get(url, headers={"Range": "bytes=10-19", "If-Range": '"other"'})
+        assert stale.status_code == 200
+
+
+def test_replay_error_injection(recordings):
+    """Test that injected errors surface as failed downloads."""
+    with ReplayServer(recordings, error_rate=1.0, retry_after=0) as server, redirect(server):
+        with pytest.raises(ValueError):
+            check_response(source_url("ao"))
+
+
+def test_benchmark(recordings):
+    """Test that the benchmark runner reports timings per case."""
+    result = benchmark(recordings, repeat=2, cases=["download_ao"])
+
+    assert list(result["case"]) == ["download_ao"]
+    assert result["requests_per_run"].iloc[0] == 1
+    assert result["mean_s"].iloc[0] > 0
@@ -0,0 +1,102 @@
+"""Tests for the local index server."""
+
+import gzip
+import io
+import pytest
+import numpy as np
+import pandas as pd
+import requests
+import pysoi.serve
+from pysoi.serve import IndexServer, filter_months
+
+
+def make_frame():
+    dates = pd.date_range("2000-01-01", periods=36, freq="MS")
+    return pd.DataFrame({"Date": dates, "SOI": np.arange(36, dtype=float)})
+
+
+@pytest.fixture
+def server():
+    # Started without the initial refresh so no test downloads from NOAA
+    with IndexServer(["soi", "oni"], refresh_interval=None, port=0,
+                     gzip_min_size=100).start(refresh=False) as server:
+        server.set_frame("soi", make_frame())
+        yield server
+
+
+def test_started_server_is_not_refreshed_on_enter(monkeypatch):
+    monkeypatch.setattr(IndexServer, "refresh", lambda self, names=None: pytest.fail("downloaded"))
+    with IndexServer(["soi"], refresh_interval=None, port=0).start(refresh=False) as server:
+        assert requests.get(server.url + "/").status_code == 200
+
+
+def test_filter_months():
+    frame = filter_months(make_frame(), start="2001", end="2001-03-15")
+    assert frame["SOI"].tolist() == [12.0, 13.0, 14.0]
+    with pytest.raises(ValueError):
+        filter_months(make_frame(), start="soon")
+
+
+def test_serve_formats_and_ranges(server):
+    records = requests.get(f"{server.url}/soi", params={"start": "2002-11"}).json()
+    assert [record["SOI"] for record in records] == [34.0, 35.0]
+
+    csv = requests.get(f"{server.url}/soi.csv", params={"end": "2000-02"}).text
+    assert pd.read_csv(io.StringIO(csv))["SOI"].tolist() == [0.0, 1.0]
+
+    assert requests.get(f"{server.url}/soi", params={"format": "xml"}).status_code == 400
+    assert requests.get(f"{server.url}/nino").status_code == 404
+    # Served but not downloaded yet
+    assert requests.get(f"{server.url}/oni").status_code == 503
+
+    summary = requests.get(server.url).json()["indices"]
+    assert summary["soi"]["rows"] == 36
+    assert summary["soi"]["last"] == "2002-12"
+
+
+def test_serve_etag_and_gzip(server):
+    plain = requests.get(f"{server.url}/soi.csv", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    revalidated = requests.get(f"{server.url}/soi.csv", headers={"Accept-Encoding": "identity",
+                                                                 "If-None-Match": plain.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    raw = requests.get(f"{server.url}/soi.csv", headers={"Accept-Encoding": "gzip"}, stream=True).raw
+    assert raw.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(raw.read()) == plain.content
+
+    # New data changes the validator
+    server.set_frame("soi", make_frame().iloc[:12])
+    changed = requests.get(f"{server.url}/soi.csv", headers={"Accept-Encoding": "identity",
+                                                             "If-None-Match": plain.headers["ETag"]})
+    assert changed.status_code == 200
+
+
+def test_serve_arrow(server):
+    pa = pytest.importorskip("pyarrow")
+    response = requests.get(f"{server.url}/soi.arrow")
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 36
+
+
+def test_refresh_keeps_previous_frame(server, monkeypatch):
+    def fail():
+        raise ConnectionError("offline")
+
+    monkeypatch.setitem(pysoi.serve.SERVED_INDICES, "soi", fail)
+    assert server.refresh(["soi"]) == {"soi": "offline"}
+    assert requests.get(f"{server.url}/soi").status_code == 200
+    assert requests.get(server.url).json()["indices"]["soi"]["error"] == "offline"
+
+
+def test_serve_daily_asymsam():
+    dates = pd.date_range("2000-01-30", periods=5, freq="D")
+    frame = pd.DataFrame({"Date": dates, "Index": "sam", "Value": np.arange(5, dtype=float)})
+    with IndexServer(["asymsam_daily"], refresh_interval=None, port=0).start(refresh=False) as server:
+        server.set_frame("asymsam_daily", frame)
+        # Daily ranges are matched by day, with a bare month meaning its first day
+        records = requests.get(f"{server.url}/asymsam_daily", params={"start": "2000-01-31", "end": "2000-02"}).json()
+        assert [record["Value"] for record in records] == [1.0, 2.0]
+
+        summary = requests.get(server.url).json()["indices"]["asymsam_daily"]
+        assert (summary["first"], summary["last"]) == ("2000-01-30", "2000-02-03")
@@ -0,0 +1,74 @@
+"""Tests for spectral and wavelet analysis."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.spectral import (periodogram, welch, cwt, chi2_quantile, red_noise_spectrum,
+                            index_matrix, _morlet_kernels)
+
+
+def make_series(n=480, seed=0):
+    """A 4-year cycle and white noise, sampled monthly."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    return pd.DataFrame({"cycle": np.sin(2 * np.pi * t / 48) + 0.2 * rng.normal(size=n),
+                         "noise": rng.normal(size=n)})
+
+
+def test_chi2_quantile():
+    assert chi2_quantile(0.95, 2) == pytest.approx(5.9915, rel=1e-4)
+    assert chi2_quantile(0.95, 10) == pytest.approx(18.307, rel=1e-2)
+
+
+def test_periodogram_peak_and_parseval():
+    values = make_series()
+    spectrum = periodogram(values, dt=1 / 12, detrend="constant")
+
+    assert spectrum.names == ["cycle", "noise"]
+    peak = spectrum.periods[np.argmax(spectrum.power[:, 0])]
+    assert peak == pytest.approx(4.0)
+    df = spectrum.frequencies[1]
+    np.testing.assert_allclose(spectrum.power.sum(axis=0) * df, values.var(ddof=0), rtol=1e-2)
+    significant = spectrum.power > spectrum.significance()
+    assert significant[np.argmin(np.abs(spectrum.periods - 4)), 0]
+    # White noise exceeds the 95% level about 5% of the time
+    assert significant[:, 1].mean() < 0.1
+
+    red = red_noise_spectrum(np.linspace(0, 6, 20001), [0.7], [2.0], dt=1 / 12)
+    assert red[:-1, 0].sum() * 6 / 20000 == pytest.approx(2.0, rel=1e-3)
+
+
+def test_welch_white_noise():
+    values = make_series(n=4096)
+    spectrum = welch(values[["noise"]], dt=1.0, segment_length=256)
+    assert spectrum.power.shape == (129, 1)
+    # White noise is flat at twice the variance
+    assert spectrum.power[1:-1, 0].mean() == pytest.approx(2.0, rel=0.1)
+    n_segments = (4096 - 256) // 128 + 1
+    assert n_segments < spectrum.dof < 2 * n_segments
+
+
+def test_cwt_batches_match_and_find_cycle():
+    values = make_series()
+    result = cwt(values, dt=1 / 12)
+    chunked = cwt(values, dt=1 / 12, chunk_bytes=1)
+    np.testing.assert_allclose(result.power, chunked.power)
+    assert _morlet_kernels.cache_info().hits >= 1
+
+    spectrum = result.global_spectrum(inside_coi=True)
+    assert result.periods[np.nanargmax(spectrum[:, 0])] == pytest.approx(4.0, rel=0.1)
+    assert result.power.shape == (len(result.scales), 480, 2)
+    significant = result.power[:, 240, 0] > result.significance()[:, 0]
+    assert significant[np.argmin(np.abs(result.periods - 4))]
+
+
+def test_index_matrix_common_span():
+    dates = pd.date_range("2000-01-01", periods=12, freq="MS")
+    frames = {
+        "SOI": pd.DataFrame({"Date": dates, "SOI": np.arange(12.0)}),
+        "PDO": pd.DataFrame({"Date": dates[3:], "PDO": np.arange(9.0)}),
+    }
+    matrix = index_matrix(source=frames)
+    assert list(matrix.columns) == ["SOI", "PDO"]
+    assert matrix.index[0] == pd.Timestamp("2000-04-01")
+    assert len(periodogram(matrix).frequencies) == 5
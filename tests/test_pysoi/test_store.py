@@ -0,0 +1,93 @@
+"""Tests for the memory-mapped index store."""
+
+import os
+import threading
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.store import write_store, open_store
+
+
+def make_frames():
+    """Build small frames shaped like the download_* outputs."""
+    oni = pd.DataFrame({
+        "Year": [2020, 2020, 2020],
+        "Date": pd.to_datetime(["2020-01-01", "2020-02-01", "2020-03-01"]),
+        "ONI": [0.6, 0.1, -0.7],
+        "phase": pd.Categorical(["Warm Phase/El Nino", "Neutral Phase", "Cool Phase/La Nina"]),
+    })
+    nao = pd.DataFrame({
+        "Year": [2020, 2020],
+        "Month": pd.Categorical(["Mar", "Apr"], categories=["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                                            "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
+                                ordered=True),
+        "NAO": [1.5, -0.5],
+    })
+    return {"ONI": oni, "NAO": nao}
+
+
+def test_store_round_trip(tmp_path):
+    """Test that values are aligned on a shared month axis."""
+    store = write_store(tmp_path / "store", frames=make_frames())
+
+    assert store.names == ["ONI", "NAO"]
+    assert len(store) == 4
+    assert isinstance(store.values, np.memmap)
+    np.testing.assert_allclose(store.column("ONI"), [0.6, 0.1, -0.7, np.nan])
+    np.testing.assert_allclose(store.column("NAO"), [np.nan, np.nan, 1.5, -0.5])
+
+
+def test_store_phases(tmp_path):
+    """Test that phase categories survive the round trip."""
+    write_store(tmp_path / "store", frames=make_frames())
+    store = open_store(tmp_path / "store")
+
+    phase = store.phase("ONI")
+    assert list(phase[:3]) == ["Warm Phase/El Nino", "Neutral Phase", "Cool Phase/La Nina"]
+    assert pd.isna(phase[3])
+
+    with pytest.raises(KeyError):
+        store.phase("NAO")
+
+
+def test_store_frame_is_view(tmp_path):
+    """Test that to_frame does not copy the memory-mapped values."""
+    store = write_store(tmp_path / "store", frames=make_frames())
+    frame = store.to_frame()
+
+    assert list(frame.columns) == ["ONI", "NAO"]
+    assert np.shares_memory(frame.to_numpy(), store.values)
+
+
+def test_store_overwrite(tmp_path):
+    """Test that rewriting a store replaces it in place."""
+    frames = make_frames()
+    write_store(tmp_path / "store", frames=frames)
+    store = write_store(tmp_path / "store", frames={"NAO": frames["NAO"]})
+
+    assert store.names == ["NAO"]
+    assert "ONI" not in store
+    assert sorted(os.listdir(tmp_path / "store"))[0] == "CURRENT"
+    assert len(os.listdir(tmp_path / "store")) == 2
+
+
+def test_store_readers_see_complete_versions(tmp_path):
+    """Test that opening while a store is rewritten always finds a whole version."""
+    frames = make_frames()
+    path = tmp_path / "store"
+    first = write_store(path, frames=frames)
+    done = threading.Event()
+
+    def rewrite():
+        for i in range(30):
+            write_store(path, frames=frames if i % 2 else {"NAO": frames["NAO"]})
+        done.set()
+
+    writer = threading.Thread(target=rewrite)
+    writer.start()
+    while not done.is_set():
+        store = open_store(path)
+        assert store.names in (["ONI", "NAO"], ["NAO"])
+    writer.join()
+    # Stores opened on a replaced version keep their data
+    assert first.values.shape == (4, 2)
@@ -0,0 +1,94 @@
+"""Tests for surrogate generation."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.surrogates import block_bootstrap, phase_randomize, markov, spawn_seeds
+from pysoi.download_oni import ONI_PHASES
+
+
+def make_frame(n=240, seed=0):
+    """An AR(1) index and a correlated second index, in download_enso layout."""
+    rng = np.random.default_rng(seed)
+    oni = np.zeros(n)
+    for t in range(1, n):
+        oni[t] = 0.9 * oni[t - 1] + 0.3 * rng.normal()
+    codes = np.digitize(oni, [-0.5, 0.5]) + 1
+    codes[[0, -1]] = 0
+    return pd.DataFrame({
+        "Date": pd.date_range("1950-01-01", periods=n, freq="MS"),
+        "ONI": oni,
+        "phase": pd.Categorical.from_codes(codes, categories=ONI_PHASES),
+        "SOI": -oni + 0.2 * rng.normal(size=n),
+    })
+
+
+def test_block_bootstrap_keeps_years_and_correlation():
+    frame = make_frame()
+    result = block_bootstrap(frame, 50, length=60, seed=1)
+
+    assert result.values.shape == (50, 60, 2)
+    assert result.names == ["ONI", "SOI"]
+    # Rows are whole observed months, so both indices move together
+    pairs = set(map(tuple, frame[["ONI", "SOI"]].to_numpy()))
+    assert all(tuple(row) in pairs for row in result.values[0])
+    # Each block starts in January
+    starts = [int(np.flatnonzero(frame["ONI"].to_numpy() == value)[0]) for value in result.values[:, 0, 0]]
+    assert all(start % 12 == 0 for start in starts)
+
+    with pytest.raises(ValueError):
+        block_bootstrap(frame, 5, block_length=1000)
+
+
+@pytest.mark.parametrize("block_length", [5, 6, 7])
+def test_block_bootstrap_keeps_calendar_months(block_length):
+    # Row i of a ramp is in calendar month i % 12
+    ramp = np.arange(48.0)
+    result = block_bootstrap(ramp, 100, block_length=block_length, seed=4)
+    months = result.values[:, :, 0] % 12
+    np.testing.assert_array_equal(months, np.broadcast_to(np.arange(48) % 12, months.shape))
+    # Blocks still start anywhere in the series, not only in its first months
+    assert len(np.unique(result.values[:, 0, 0])) > 1
+
+    free = block_bootstrap(ramp, 100, block_length=block_length, by_year=False, seed=4)
+    assert not np.array_equal(free.values[:, :, 0] % 12, months)
+
+
+def test_phase_randomize_keeps_spectrum_and_is_reproducible():
+    frame = make_frame()
+    result = phase_randomize(frame, 20, seed=2, chunk_size=7)
+    data = frame[["ONI", "SOI"]].to_numpy()
+
+    spectrum = np.abs(np.fft.rfft(data - data.mean(axis=0), axis=0))
+    surrogate = np.abs(np.fft.rfft(result.values[3] - result.values[3].mean(axis=0), axis=0))
+    np.testing.assert_allclose(surrogate, spectrum, atol=1e-8)
+    assert np.corrcoef(result.values[3].T)[0, 1] == pytest.approx(np.corrcoef(data.T)[0, 1])
+
+    again = phase_randomize(frame, 20, seed=result.seed, chunk_size=7, processes=2)
+    np.testing.assert_allclose(again.values, result.values)
+    first, second = spawn_seeds(2, 2)
+    assert not np.allclose(phase_randomize(frame, 1, seed=first).values,
+                           phase_randomize(frame, 1, seed=second).values)
+
+
+def test_markov_phases_follow_observed_transitions():
+    frame = make_frame(n=600)
+    result = markov(frame, 500, seed=3)
+
+    # The empty category of unclassified months is not a state
+    assert result.categories == ONI_PHASES[1:]
+    assert result.phases.shape == (500, 600)
+    observed = frame["phase"].cat.codes.to_numpy()[1:-1] - 1
+    np.testing.assert_allclose(np.bincount(result.phases.ravel()) / result.phases.size,
+                               np.bincount(observed) / len(observed), atol=0.03)
+    # Persistence of the observed phases is kept
+    persistence = np.mean(observed[1:] == observed[:-1])
+    assert np.mean(result.phases[:, 1:] == result.phases[:, :-1]) == pytest.approx(persistence, abs=0.03)
+
+    realization = result.realization(0)
+    labels = np.asarray(ONI_PHASES)[frame["phase"].cat.codes.to_numpy()]
+    months = dict(zip(frame["ONI"], labels))
+    assert all(months[value] == phase for value, phase in zip(realization["ONI"], realization["phase"]))
+
+    with pytest.raises(ValueError):
+        markov(frame[["ONI", "SOI"]].to_numpy(), 5)
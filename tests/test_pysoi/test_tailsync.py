@@ -0,0 +1,146 @@
+"""Tests for byte-range tail fetching."""
+
+import pytest
+import pandas as pd
+import pysoi.utils
+from pysoi.tailsync import TailCache
+from pysoi.download_asymsam import sync_asymsam_daily, level_link
+
+
+class FakeResponse:
+    def __init__(self, status_code, content, headers=None, url=""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+
+class RangeServer:
+    """In-memory server honouring Range and If-Range like a static file server."""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+
+    def __call__(self, url, method="GET", headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        content, etag = self.files[url]
+        range_header = headers.get("Range")
+        if range_header and headers.get("If-Range", etag) == etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(content):
+                return FakeResponse(416, b"", url=url)
+            body = content[start:]
+            return FakeResponse(206, body, {"ETag": etag,
+                                            "Content-Range": f"bytes {start}-{len(content) - 1}/{len(content)}"},
+                                url=url)
+        return FakeResponse(200, content, {"ETag": etag}, url=url)
+
+
+class GzipServer(RangeServer):
+    """Compresses unless told not to, ignoring Range as servers compressing on the fly do."""
+
+    def __call__(self, url, method="GET", headers=None, **kwargs):
+        headers = headers or {}
+        if headers.get("Accept-Encoding") != "identity":
+            self.requests.append(headers)
+            content, etag = self.files[url]
+            return FakeResponse(200, content, {"ETag": etag, "Content-Encoding": "gzip"}, url=url)
+        return super().__call__(url, method, headers, **kwargs)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = RangeServer()
+    monkeypatch.setattr(pysoi.utils, "fetch", server)
+    return server
+
+
+def test_tail_fetch_appends(server, tmp_path):
+    """Test that only the appended bytes are transferred on refresh."""
+    url = "https://example.com/data.csv"
+    cache = TailCache(tmp_path, overlap=4)
+
+    server.files[url] = (b"a,b\n1,2\n", '"v1"')
+    first = cache.fetch(url)
+    assert first.full
+
+    server.files[url] = (b"a,b\n1,2\n3,4\n", '"v1"')
+    second = cache.fetch(url)
+    assert not second.full
+    assert second.appended == b"3,4\n"
+    assert second.transferred == 8
+    assert cache.content(url) == b"a,b\n1,2\n3,4\n"
+
+
+def test_tail_fetch_falls_back_on_changed_prefix(server, tmp_path):
+    """Test that a rewritten prefix triggers a full download."""
+    url = "https://example.com/data.csv"
+    cache = TailCache(tmp_path, overlap=4)
+
+    server.files[url] = (b"a,b\n1,2\n", '"v1"')
+    cache.fetch(url)
+
+    server.files[url] = (b"a,b\n9,9\n3,4\n", '"v1"')
+    result = cache.fetch(url)
+    assert result.full
+    assert result.content == b"a,b\n9,9\n3,4\n"
+
+
+def test_sync_asymsam_daily_parses_appended_rows(server, tmp_path):
+    """Test that incremental syncs extend the stored rows."""
+    url = level_link(700)
+    header = b"Lev,Date,Index,Value,R.squared,dump\n"
+    rows = b"700,1979-01-01,sam,0.1,0.5,x\n700,1979-01-01,ssam,0.2,0.4,x\n"
+    server.files[url] = (header + rows, '"v1"')
+    cache = TailCache(tmp_path)
+
+    first = sync_asymsam_daily(cache, levels=700)
+    assert len(first) == 2
+
+    server.files[url] = (header + rows + b"700,1979-01-02,sam,0.3,0.5,x\n", '"v1"')
+    second = sync_asymsam_daily(cache, levels=700)
+    assert len(second) == 3
+    assert second["Date"].iloc[-1] == pd.Timestamp("1979-01-02")
+    assert list(second["Index"].cat.categories) == ["sam", "ssam", "asam"]
+
+
+def test_sync_asymsam_daily_ignores_stale_sidecar(server, tmp_path, capsys):
+    """Test that parsed rows not matching the stored bytes are reparsed, and failed levels skipped."""
+    url = level_link(700)
+    header = b"Lev,Date,Index,Value,R.squared,dump\n"
+    rows = [b"700,1979-01-0%d,sam,0.%d,0.5,x\n" % (day, day) for day in range(1, 5)]
+    cache = TailCache(tmp_path)
+    sidecar = cache.sidecar(url, ".parsed.npz")
+
+    server.files[url] = (header + rows[0], '"v1"')
+    sync_asymsam_daily(cache, levels=700)
+    with open(sidecar, "rb") as f:
+        stale = f.read()
+    server.files[url] = (header + b"".join(rows[:2]), '"v1"')
+    sync_asymsam_daily(cache, levels=700)
+
+    # As if a sync had crashed after updating the data file but not the sidecar
+    with open(sidecar, "wb") as f:
+        f.write(stale)
+    server.files[url] = (header + b"".join(rows[:3]), '"v1"')
+    data = sync_asymsam_daily(cache, levels=[700, 850])
+    assert data["Value"].tolist() == [0.1, 0.2, 0.3]
+    assert "Error downloading level 850" in capsys.readouterr().out
+
+
+def test_tail_fetch_asks_for_identity_encoding(monkeypatch, tmp_path):
+    """Test that ranges are requested on the unencoded file."""
+    server = GzipServer()
+    monkeypatch.setattr(pysoi.utils, "fetch", server)
+    url = "https://example.com/data.csv"
+    cache = TailCache(tmp_path, overlap=4)
+
+    server.files[url] = (b"a,b\n1,2\n", '"v1"')
+    cache.fetch(url)
+    server.files[url] = (b"a,b\n1,2\n3,4\n", '"v1"')
+    result = cache.fetch(url)
+    assert not result.full
+    assert result.appended == b"3,4\n"
+    assert all(headers["Accept-Encoding"] == "identity" for headers in server.requests)
@@ -0,0 +1,99 @@
+"""Tests for the pluggable transports and mirror sync."""
+
+import os
+import threading
+import pytest
+import pandas as pd
+from pysoi import download_ao
+from pysoi.sources import source_url, url_path
+from pysoi.transport import DirectoryTransport, MemoryTransport, use_transport, set_transport, sync, SyncError
+from pysoi.utils import check_response, check_responses, get_transport
+
+
+AO_TABLE = """        Jan   Feb   Mar   Apr   May   Jun   Jul   Aug   Sep   Oct   Nov   Dec
+1950 -0.060 0.627 -0.008 0.555 0.072 0.539 -0.802 -0.851 0.358 -0.379 -0.515 -1.928
+1951 -0.085 -0.400 -1.934 -0.776 -0.863 -0.918 0.090 -0.377 -0.818 -0.213 -0.069 1.987
+"""
+
+
+def test_memory_transport():
+    with use_transport({"ao": AO_TABLE}) as transport:
+        assert isinstance(transport, MemoryTransport)
+        ao = download_ao()
+        # Files are keyed by host and path, so the http mirror finds it too
+        assert check_response(source_url("ao").replace("https://", "http://")) == AO_TABLE
+        with pytest.raises(ValueError):
+            check_response(source_url("nao"))
+
+    assert isinstance(ao, pd.DataFrame)
+    assert len(ao) == 24
+    assert get_transport() is None
+
+
+def test_thread_local_transport_is_carried_into_pools():
+    seen = []
+    with use_transport({"ao": AO_TABLE, "aao": "aao"}):
+        assert check_responses([source_url("ao"), source_url("aao")]) == [AO_TABLE, "aao"]
+
+        # Other threads keep the global transport
+        thread = threading.Thread(target=lambda: seen.append(get_transport()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
+
+
+def test_sync_and_directory_transport(tmp_path):
+    memory = MemoryTransport({"ao": AO_TABLE, "nao": "nao table"})
+    with use_transport(memory):
+        paths = sync(tmp_path / "first", ["ao", "nao"])
+    assert paths["ao"] == os.path.join(tmp_path / "first", *url_path(source_url("ao")).split("/"))
+
+    previous = set_transport(tmp_path / "first")
+    try:
+        assert isinstance(get_transport(), DirectoryTransport)
+        assert len(download_ao()) == 24
+
+        # Mirroring a mirror keeps the modification times, so a second pass
+        # is answered with 304 and leaves the files alone
+        paths = sync(tmp_path / "second", ["ao"])
+        mtime = os.path.getmtime(paths["ao"])
+        assert mtime == int(os.path.getmtime(tmp_path / "first" / url_path(source_url("ao"))))
+        sync(tmp_path / "second", ["ao"])
+        assert os.path.getmtime(paths["ao"]) == mtime
+    finally:
+        set_transport(previous)
+
+
+def test_sync_collects_failures(tmp_path, capsys):
+    from pysoi.__main__ import main
+
+    # nao is missing, so it fails while ao is still mirrored
+    with use_transport({"ao": AO_TABLE}):
+        with pytest.raises(SyncError) as excinfo:
+            sync(tmp_path, ["nao", "ao"])
+        assert list(excinfo.value.paths) == ["ao"]
+        assert list(excinfo.value.errors) == ["nao"]
+        assert os.path.isfile(excinfo.value.paths["ao"])
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(["sync", str(tmp_path), "--source", "ao", "--source", "nao"])
+    assert exit_info.value.code == 1
+    captured = capsys.readouterr()
+    assert "Mirrored 1 sources" in captured.out
+    assert "nao:" in captured.err
+
+
+def test_directory_transport_conditional_and_stream(tmp_path):
+    path = tmp_path / url_path(source_url("ao"))
+    os.makedirs(path.parent)
+    path.write_text(AO_TABLE)
+    transport = DirectoryTransport(f"file://{tmp_path}")
+
+    first = transport.send(source_url("ao"))
+    assert first.status_code == 200
+    assert transport.send(source_url("ao"), headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    streamed = transport.send(source_url("ao"), stream=True)
+    assert streamed.raw.read() == AO_TABLE.encode()
+    streamed.close()
+    assert transport.send(source_url("nao")).status_code == 404
@@ -4,7 +4,8 @@ import pytest
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from pysoi.utils import abbr_month, check_response
+from pysoi.utils import (abbr_month, check_response, parse_year_table, centered_mean,
+                         build_output, MONTH_ABBRS)
 
 
 def test_abbr_month():
@@ -61,3 +62,47 @@ def test_check_response_error():
             check_response(url)
     except Exception:
         pytest.skip("Could connect to non-existent URL")
+
+
+def test_parse_year_table():
+    """Test parsing of year x month tables with headers, trailers and missing values."""
+    lines = [
+        "YEAR JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC",
+        "1951 1 2 3 4 5 6 7 8 9 10 11 -999.9",
+        "1950 1 2 3 4 5 6 7 8 9 10 11 12",
+        "1952 1 2 3",
+    ]
+    years, months, values = parse_year_table(lines, missing=-999.9)
+
+    assert list(years) == [1950] * 12 + [1951] * 12
+    assert list(months[:3]) == [1, 2, 3]
+    assert np.isnan(values[-1])
+
+
+def test_centered_mean():
+    """Test that centered_mean matches a centered pandas rolling mean."""
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0, 7.0])
+    expected = pd.Series(values).rolling(window=3, center=True).mean().to_numpy()
+
+    np.testing.assert_allclose(centered_mean(values, window=3), expected)
+
+
+def test_build_output_formats():
+    """Test that parsed columns are assembled into each output format."""
+    columns = {
+        "Year": np.array([2020, 2020]),
+        "Month": np.array([0, 1], dtype=np.int8),
+        "Window": np.array(["", "JFM"]),
+    }
+    categories = {"Month": (MONTH_ABBRS, True)}
+
+    frame = build_output(columns, categories, "pandas")
+    assert isinstance(frame, pd.DataFrame)
+    assert list(frame["Month"]) == ["Jan", "Feb"]
+    assert pd.isna(frame["Window"].iloc[0])
+
+    arrays = build_output(columns, categories, "numpy")
+    assert list(arrays["Month"]) == ["Jan", "Feb"]
+
+    with pytest.raises(ValueError):
+        build_output(columns, categories, "polars")
@@ -0,0 +1,86 @@
+"""Tests for the vintage store."""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pysoi.download_oni import ONI_PHASES
+from pysoi.utils import ENSO_PHASES
+from pysoi.vintage import VintageStore
+
+
+def make_oni(values, phases=None):
+    n = len(values)
+    dates = pd.date_range("2020-01-01", periods=n, freq="MS")
+    return pd.DataFrame({
+        "Year": dates.year,
+        "Date": dates,
+        "ONI": values,
+        "phase": pd.Categorical(phases or ["Neutral Phase"] * n),
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VintageStore(tmp_path / "vintages.sqlite")
+    store.record("ONI", make_oni([0.1, 0.2]), fetched="2020-03-10")
+    # Revises February, appends March
+    store.record("ONI", make_oni([0.1, 0.3, 0.6], ["Neutral Phase", "Neutral Phase", "Warm Phase/El Nino"]),
+                 fetched="2020-04-10")
+    # Unchanged
+    store.record("ONI", make_oni([0.1, 0.3, 0.6], ["Neutral Phase", "Neutral Phase", "Warm Phase/El Nino"]),
+                 fetched="2020-04-20")
+    yield store
+    store.close()
+
+
+def test_record_stores_only_changes(store):
+    log = store.vintages("ONI")
+    assert log[["added", "revised", "removed"]].values.tolist() == [[2, 0, 0], [1, 1, 0], [0, 0, 0]]
+    assert len(store.revisions("ONI")) == 4
+
+    history = store.revisions("ONI", "2020-02-01")
+    assert history["value"].tolist() == [0.2, 0.3]
+    assert history["valid_to"].iloc[0] == pd.Timestamp("2020-04-10", tz="UTC")
+    assert pd.isna(history["valid_to"].iloc[1])
+
+    with pytest.raises(ValueError):
+        store.record("ONI", make_oni([0.1]), fetched="2020-01-01")
+
+
+def test_as_of(store):
+    assert len(store.as_of("ONI", "2020-03-01")) == 0
+    march = store.as_of("ONI", "2020-03-15")
+    assert march["ONI"].tolist() == [0.1, 0.2]
+    latest = store.as_of("ONI")
+    assert latest["ONI"].tolist() == [0.1, 0.3, 0.6]
+    assert latest["phase"].tolist()[-1] == "Warm Phase/El Nino"
+    assert latest["Date"].tolist()[-1] == pd.Timestamp("2020-03-01")
+
+
+def test_as_of_keeps_phase_categories(store):
+    phase = store.as_of("ONI")["phase"]
+    assert list(phase.cat.categories) == ONI_PHASES
+    assert not phase.cat.ordered
+
+    dates = pd.date_range("2020-01-01", periods=2, freq="MS")
+    mei = pd.DataFrame({"Date": dates, "MEI": [0.7, 0.9],
+                        "Phase": pd.Categorical(["Warm Phase/El Nino"] * 2, categories=ENSO_PHASES, ordered=True)})
+    store.record("MEI", mei, fetched="2020-03-10")
+    phase = store.as_of("MEI")["Phase"]
+    # Phases that were never published are still categories, in order
+    assert list(phase.cat.categories) == ENSO_PHASES
+    assert phase.cat.ordered and (phase > "Neutral Phase").all()
+
+
+def test_as_of_many_matches_as_of(store, tmp_path):
+    whens = pd.date_range("2020-03-01", "2020-05-01", freq="5D")
+    many = store.as_of_many("ONI", whens)
+    for when in whens:
+        expected = store.as_of("ONI", when).set_index("Date")["ONI"]
+        np.testing.assert_allclose(many[when].dropna(), expected.reindex(many.index).dropna())
+
+    # Vintages recorded through another connection invalidate the cache
+    other = VintageStore(tmp_path / "vintages.sqlite")
+    other.record("ONI", make_oni([0.1, 0.3, 0.7]), fetched="2020-05-10")
+    other.close()
+    assert store.as_of_many("ONI", ["2020-06-01"]).iloc[-1, 0] == 0.7